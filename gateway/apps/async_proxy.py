@@ -0,0 +1,219 @@
+"""
+Async proxy engine for the ASGI deployment mode
+Forwards requests through one shared httpx.AsyncClient so a single gateway
+process can hold thousands of in-flight upstream calls without tying up threads
+"""
+import asyncio
+import itertools
+import logging
+import time
+import httpx
+from django.conf import settings
+from django.http import JsonResponse
+from smartbin_common.tracing import start_span
+from .proxy import (
+    build_upstream_headers,
+    build_upstream_body,
+    build_json_response,
+    build_streaming_response,
+    build_circuit_open_response,
+    get_upstream_timeouts,
+    is_upstream_failure
+)
+from .cache import response_cache, SAFE_METHODS
+from .coalesce import single_flight
+from .breaker import circuit_breakers
+from .balancer import load_balancers
+from .identity import identity_verifier
+from .metrics import record_upstream
+
+logger = logging.getLogger(__name__)
+
+# httpx clients are bound to the event loop they were first used on.
+# The shared client is split into a few shards because httpcore's pool scheduler
+# scans every connection for every queued request, which gets quadratic once
+# hundreds of calls are in flight on a single client.
+_clients = []
+_clients_loop = None
+_next_shard = itertools.count()
+
+
+def get_async_client():
+    """Return a shard of the shared AsyncClient for the running event loop"""
+    global _clients, _clients_loop
+
+    loop = asyncio.get_running_loop()
+    if not _clients or _clients_loop is not loop or _clients[0].is_closed:
+        shards = max(1, settings.ASYNC_CLIENT_SHARDS)
+        connections_per_shard = max(1, settings.ASYNC_MAX_CONNECTIONS // shards)
+        ssl_context = httpx.create_ssl_context()  # Loading CA certs is slow; do it once for all shards
+        _clients = [
+            httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=connections_per_shard,
+                    max_keepalive_connections=connections_per_shard,
+                    keepalive_expiry=settings.UPSTREAM_POOL['IDLE_TIMEOUT']
+                ),
+                timeout=settings.SERVICE_TIMEOUT,
+                verify=ssl_context,
+                follow_redirects=False
+            )
+            for _ in range(shards)
+        ]
+        _clients_loop = loop
+        logger.info(
+            f"Created shared async upstream client "
+            f"({shards} shards, max {settings.ASYNC_MAX_CONNECTIONS} connections)"
+        )
+    return _clients[next(_next_shard) % len(_clients)]
+
+
+async def close_async_client():
+    """Close the shared AsyncClient shards (shutdown / benchmarks)"""
+    global _clients, _clients_loop
+    for client in _clients:
+        await client.aclose()
+    _clients = []
+    _clients_loop = None
+
+
+async def aiter_upstream_body(response, service_url):
+    """Yield the raw (still encoded) upstream body and release the connection when done"""
+    try:
+        async for chunk in response.aiter_raw(settings.PROXY_CHUNK_SIZE):
+            yield chunk
+    except Exception as e:
+        # Headers are already sent, so the client just sees a truncated body
+        logger.error(f"Error streaming response from {service_url}: {e}")
+    finally:
+        await response.aclose()
+
+
+async def async_proxy_request(request, service_url, path='', service=None):
+    """
+    Async counterpart of proxy_request
+
+    Args:
+        request: Django request object
+        service_url: Base URL of the service (used when SERVICE_INSTANCES has no list for it)
+        path: Additional path to append
+        service: Service name used to pick the instances and cache namespace (defaults to service_url)
+
+    Returns:
+        StreamingHttpResponse relaying the service's body (PROXY_PASSTHROUGH),
+        otherwise JsonResponse with the service's response.
+        Cached and coalesced routes return a buffered HttpResponse.
+    """
+    service = service or service_url
+
+    if request.method not in SAFE_METHODS:
+        try:
+            return await async_forward_request(request, service_url, path, service)
+        finally:
+            await response_cache.ainvalidate(service)
+
+    cache_ttl = response_cache.get_ttl(request, path)
+    if cache_ttl:
+        cache_key = await response_cache.amake_key(request, service, path)
+        cached = await response_cache.aget(service, cache_key)
+        if cached is not None:
+            return cached
+
+    async def fetch():
+        response = await async_forward_request(request, service_url, path, service)
+        if cache_ttl:
+            response = await response_cache.astore(service, cache_key, response, cache_ttl)
+        return response
+
+    if cache_ttl or single_flight.applies(request, path):
+        return await single_flight.ado(service, single_flight.make_key(request, service, path), fetch)
+    return await fetch()
+
+
+async def async_forward_request(request, service_url, path, service):
+    """Async counterpart of forward_request"""
+    breaker = circuit_breakers.get(service)
+    if not breaker.allow():
+        return build_circuit_open_response(service, breaker)
+
+    balancer = load_balancers.get(service, service_url)
+    instance = balancer.acquire()
+    started = time.monotonic()
+    response = None
+    with start_span(f"upstream {service}", kind='client', instance=instance.url) as span:
+        try:
+            response = await async_send_upstream_request(request, instance.url, path, service)
+            return response
+        finally:
+            duration = time.monotonic() - started
+            success = not is_upstream_failure(response)
+            status = response.status_code if response is not None else 500
+            balancer.release(instance, success)
+            breaker.record(success, duration)
+            record_upstream(service, status, duration)
+            span.set('status_code', status)
+            if not success:
+                span.status = 'error'
+
+
+async def async_send_upstream_request(request, service_url, path, service):
+    """Async counterpart of send_upstream_request"""
+    passthrough = settings.PROXY_PASSTHROUGH
+
+    try:
+        target_url = f"{service_url}/{path}"
+        method = request.method
+
+        headers = build_upstream_headers(
+            request,
+            passthrough=passthrough,
+            identity=await identity_verifier.aidentity_header(request)
+        )
+        data = build_upstream_body(request)
+        params = request.GET.dict()
+
+        logger.info(f"Proxying {method} request to {target_url} (async)")
+
+        connect_timeout, read_timeout = get_upstream_timeouts(path)
+        client = get_async_client()
+        upstream_request = client.build_request(
+            method,
+            target_url,
+            headers=headers,
+            content=data,
+            params=params,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        response = await client.send(upstream_request, stream=passthrough)
+
+        if passthrough:
+            return build_streaming_response(
+                response.status_code,
+                response.headers,
+                aiter_upstream_body(response, service_url)
+            )
+
+        return build_json_response(
+            response.status_code,
+            response.json,
+            lambda: response.text
+        )
+
+    except httpx.TimeoutException:
+        logger.error(f"Timeout calling {service_url}")
+        return JsonResponse(
+            {'error': 'Service timeout'},
+            status=504
+        )
+    except httpx.TransportError:
+        logger.error(f"Connection error calling {service_url}")
+        return JsonResponse(
+            {'error': 'Service unavailable'},
+            status=503
+        )
+    except Exception as e:
+        logger.error(f"Error proxying request: {e}")
+        return JsonResponse(
+            {'error': 'Internal gateway error'},
+            status=500
+        )
@@ -0,0 +1,166 @@
+"""
+Client-side load balancing across service instances
+Each service can list several instances (e.g. BIN_SERVICE_URLS); the gateway picks
+one per request (round-robin or least outstanding requests) and passively ejects
+instances that keep failing, so replicas need no extra proxy in front of them.
+"""
+import itertools
+import logging
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+
+class UpstreamInstance:
+    """One replica of a service"""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def is_ejected(self, now):
+        return self.ejected_until > now
+
+    def stats(self, now):
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'ejections': self.ejections,
+            'ejected_for': round(self.ejected_until - now, 1) if self.is_ejected(now) else 0,
+        }
+
+
+class ServiceBalancer:
+    """Picks an instance of one service for each request"""
+
+    def __init__(self, service, urls, strategy, config):
+        self.service = service
+        self.instances = [UpstreamInstance(url) for url in urls]
+        self.strategy = strategy
+        self.config = config
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _candidates(self, now):
+        """
+        Instances eligible for traffic
+        If every instance is ejected, all of them are used again: a possibly
+        broken instance is better than failing every request outright
+        """
+        healthy = [instance for instance in self.instances if not instance.is_ejected(now)]
+        return healthy or self.instances
+
+    def acquire(self):
+        """Choose an instance and count the request as outstanding on it"""
+        with self._lock:
+            candidates = self._candidates(time.monotonic())
+            start = next(self._next) % len(candidates)
+            # Rotate so ties are broken round-robin
+            ordered = candidates[start:] + candidates[:start]
+            if self.strategy == LEAST_OUTSTANDING:
+                instance = min(ordered, key=lambda candidate: candidate.outstanding)
+            else:
+                instance = ordered[0]
+            instance.outstanding += 1
+            instance.requests += 1
+            return instance
+
+    def release(self, instance, success):
+        """
+        Finish a request on an instance
+
+        Args:
+            instance: Instance returned by acquire()
+            success: False for transport errors, timeouts and 5xx responses
+        """
+        with self._lock:
+            instance.outstanding = max(0, instance.outstanding - 1)
+            if success:
+                instance.consecutive_failures = 0
+                return
+
+            instance.failures += 1
+            instance.consecutive_failures += 1
+            now = time.monotonic()
+            if (
+                len(self.instances) > 1
+                and not instance.is_ejected(now)
+                and instance.consecutive_failures >= self.config['EJECT_AFTER_FAILURES']
+                and self._can_eject(now)
+            ):
+                self._eject(instance, now)
+
+    def _can_eject(self, now):
+        """Keep at least (100 - MAX_EJECTED_PERCENT)% of the instances in rotation"""
+        ejected = sum(1 for instance in self.instances if instance.is_ejected(now))
+        return (ejected + 1) * 100 <= len(self.instances) * self.config['MAX_EJECTED_PERCENT']
+
+    def _eject(self, instance, now):
+        # Instances that keep coming back broken stay out longer
+        duration = min(
+            self.config['EJECT_SECONDS'] * (2 ** instance.ejections),
+            self.config['MAX_EJECT_SECONDS']
+        )
+        instance.ejections += 1
+        instance.ejected_until = now + duration
+        instance.consecutive_failures = 0
+        logger.warning(f"⛔ Ejected {self.service} instance {instance.url} for {duration:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'strategy': self.strategy,
+                'instances': [instance.stats(now) for instance in self.instances],
+            }
+
+
+class LoadBalancerRegistry:
+    """One balancer per service, built from SERVICE_INSTANCES"""
+
+    def __init__(self):
+        self._balancers = {}
+        self._lock = threading.Lock()
+
+    def get(self, service, default_url):
+        """
+        Balancer for a service
+
+        Args:
+            service: Service name (key of SERVICE_INSTANCES)
+            default_url: Single instance used when the service has no instance list
+        """
+        balancer = self._balancers.get(service)
+        if balancer is None:
+            with self._lock:
+                balancer = self._balancers.get(service)
+                if balancer is None:
+                    config = settings.LOAD_BALANCER
+                    urls = settings.SERVICE_INSTANCES.get(service) or [default_url]
+                    strategy = config['STRATEGIES'].get(service, config['STRATEGY'])
+                    balancer = self._balancers[service] = ServiceBalancer(service, urls, strategy, config)
+                    logger.info(f"Balancing {service} across {len(urls)} instance(s) ({strategy})")
+        return balancer
+
+    def stats(self):
+        """Instance state per service"""
+        with self._lock:
+            balancers = list(self._balancers.values())
+        return {balancer.service: balancer.stats() for balancer in balancers}
+
+
+# Global balancers shared by both proxy engines in this process
+load_balancers = LoadBalancerRegistry()
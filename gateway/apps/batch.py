@@ -0,0 +1,197 @@
+"""
+Batch execution of gateway sub-requests
+A batch is a list of {method, path, body} items. Each item is resolved through the
+gateway's own URL routing table and dispatched to the matching proxy view, so it gets
+the same caching, coalescing, circuit breaking and load balancing as a direct call.
+Items run in parallel; results come back in request order with per-item status and timing.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve, Resolver404
+
+logger = logging.getLogger(__name__)
+
+# Only the service proxies may be called from a batch (no admin, stream or nested batches)
+BATCHABLE_ROUTES = ('auth-proxy', 'bin-proxy', 'detection-proxy', 'reclamation-proxy')
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class BatchError(ValueError):
+    """Invalid batch payload (reported as 400)"""
+
+
+def get_executor():
+    """Thread pool running sync sub-requests (shared by all batches in this process)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.BATCH_MAX_WORKERS,
+                    thread_name_prefix='gateway-batch'
+                )
+    return _executor
+
+
+def parse_batch(request):
+    """
+    Validate a batch payload
+
+    Returns:
+        List of item dicts with id, method, path and body
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise BatchError('Request body must be JSON')
+
+    items = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError("'requests' must be a non-empty list")
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise BatchError(f"A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests")
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f"Request {index} must be an object with a 'path'")
+        method = str(item.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            raise BatchError(f"Request {index} has unsupported method {method}")
+        parsed.append({
+            'id': item.get('id', index),
+            'method': method,
+            'path': item['path'],
+            'body': item.get('body'),
+        })
+    return parsed
+
+
+def build_sub_request(request, item):
+    """Build a Django request for one batch item, carrying the caller's credentials"""
+    url = urlsplit(item['path'])
+    path = url.path if url.path.startswith('/') else f"/{url.path}"
+
+    sub_request = HttpRequest()
+    sub_request.method = item['method']
+    sub_request.path = sub_request.path_info = path
+    sub_request.GET = QueryDict(url.query)
+    sub_request.META = {
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'SERVER_NAME': request.META.get('SERVER_NAME', 'localhost'),
+        'SERVER_PORT': request.META.get('SERVER_PORT', '80'),
+    }
+    auth_header = request.META.get('HTTP_AUTHORIZATION')
+    if auth_header:
+        sub_request.META['HTTP_AUTHORIZATION'] = auth_header
+    # Bodies are decoded into the batch result, so ask upstreams not to compress them
+    sub_request.META['HTTP_ACCEPT_ENCODING'] = 'identity'
+    sub_request._body = json.dumps(item['body']).encode('utf-8') if item['body'] is not None else b''
+    return sub_request
+
+
+def resolve_item(item):
+    """Match an item's path against the routing table; returns the resolver match or an error result"""
+    try:
+        match = resolve(urlsplit(item['path']).path or '/')
+    except Resolver404:
+        match = None
+    if match is None or match.url_name not in BATCHABLE_ROUTES:
+        return None, build_item_result(item, 404, {'error': 'No batchable route for this path'}, 0)
+    return match, None
+
+
+def decode_body(body):
+    """JSON bodies are embedded as JSON, anything else as text"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return body.decode('utf-8', errors='replace')
+
+
+def build_item_result(item, status, body, started):
+    return {
+        'id': item['id'],
+        'status': status,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1) if started else 0,
+        'body': body,
+    }
+
+
+def run_item(request, item):
+    """Dispatch one item to its (sync) proxy view and buffer the response"""
+    match, error = resolve_item(item)
+    if error:
+        return error
+
+    started = time.monotonic()
+    try:
+        response = match.func(build_sub_request(request, item), *match.args, **match.kwargs)
+        try:
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        finally:
+            response.close()
+        return build_item_result(item, response.status_code, decode_body(body), started)
+    except Exception as e:
+        logger.error(f"Error running batch item {item['id']}: {e}")
+        return build_item_result(item, 500, {'error': 'Internal gateway error'}, started)
+
+
+async def arun_item(request, item):
+    """Async counterpart of run_item (sync views run in a worker thread)"""
+    match, error = resolve_item(item)
+    if error:
+        return error
+
+    started = time.monotonic()
+    try:
+        sub_request = build_sub_request(request, item)
+        if iscoroutinefunction(match.func):
+            response = await match.func(sub_request, *match.args, **match.kwargs)
+        else:
+            response = await sync_to_async(match.func, thread_sensitive=False)(
+                sub_request, *match.args, **match.kwargs
+            )
+        try:
+            if response.streaming:
+                body = b''.join([chunk async for chunk in response.streaming_content])
+            else:
+                body = response.content
+        finally:
+            response.close()
+        return build_item_result(item, response.status_code, decode_body(body), started)
+    except Exception as e:
+        logger.error(f"Error running batch item {item['id']}: {e}")
+        return build_item_result(item, 500, {'error': 'Internal gateway error'}, started)
+
+
+def run_batch(request, items):
+    """Run all items in parallel on the batch thread pool, keeping their order"""
+    # Each item runs in a copy of the caller's context so its spans join the batch's trace
+    futures = [
+        get_executor().submit(contextvars.copy_context().run, run_item, request, item)
+        for item in items
+    ]
+    return [future.result() for future in futures]
+
+
+async def arun_batch(request, items):
+    """Run all items concurrently on the event loop, keeping their order"""
+    return list(await asyncio.gather(*(arun_item(request, item) for item in items)))
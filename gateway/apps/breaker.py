@@ -0,0 +1,177 @@
+"""
+Per-upstream circuit breakers for the gateway
+A service that keeps failing or answering slowly is cut off for a while, so
+requests to it fail fast with 503 instead of holding workers for the full timeout.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Breaker for one upstream service
+
+    closed    -> calls flow; outcomes are counted in a rolling window of 1s buckets
+    open      -> calls are rejected until OPEN_SECONDS have passed
+    half_open -> a few probe calls are let through; enough successes close the
+                 circuit again, any failure re-opens it
+    """
+
+    def __init__(self, service, config):
+        self.service = service
+        self.config = config
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._buckets = deque()  # [second, calls, failures, slow_calls]
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        horizon = int(now) - self.config['WINDOW_SECONDS']
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._buckets.popleft()
+
+    def _window(self):
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        slow_calls = sum(bucket[3] for bucket in self._buckets)
+        return calls, failures, slow_calls
+
+    def _open(self, now, reason):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._buckets.clear()
+        logger.warning(f"🔴 Circuit for {self.service} opened ({reason})")
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != OPEN:
+            return 0
+        remaining = self.opened_at + self.config['OPEN_SECONDS'] - time.monotonic()
+        return max(1, int(remaining + 0.999))
+
+    def allow(self):
+        """Whether a call may go to the upstream now (counts it as a probe when half-open)"""
+        if not self.config['ENABLED']:
+            return True
+
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.config['OPEN_SECONDS']:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                logger.info(f"🟡 Circuit for {self.service} half-open, probing")
+
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.config['HALF_OPEN_PROBES']:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+
+            return True
+
+    def record(self, success, latency):
+        """
+        Record the outcome of an allowed call
+
+        Args:
+            success: False for transport errors, timeouts and 5xx responses
+            latency: Seconds until the upstream answered (or failed)
+        """
+        if not self.config['ENABLED']:
+            return
+
+        now = time.monotonic()
+        slow = latency >= self.config['SLOW_CALL_SECONDS']
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not success or slow:
+                    self._open(now, 'probe failed' if not success else f'probe took {latency:.1f}s')
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.config['HALF_OPEN_PROBES']:
+                    self.state = CLOSED
+                    self.opened_at = None
+                    logger.info(f"🟢 Circuit for {self.service} closed")
+                return
+
+            if self.state == OPEN:
+                # A call allowed before the circuit opened finished late
+                return
+
+            self._prune(now)
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += 0 if success else 1
+            bucket[3] += 1 if slow else 0
+
+            calls, failures, slow_calls = self._window()
+            if calls < self.config['MIN_REQUESTS']:
+                return
+            if failures / calls >= self.config['ERROR_RATE']:
+                self._open(now, f'{failures}/{calls} calls failed')
+            elif slow_calls / calls >= self.config['SLOW_CALL_RATE']:
+                self._open(now, f'{slow_calls}/{calls} calls slower than {self.config["SLOW_CALL_SECONDS"]}s')
+
+    def stats(self):
+        """Breaker state for the health endpoint"""
+        with self._lock:
+            self._prune(time.monotonic())
+            calls, failures, slow_calls = self._window()
+            return {
+                'state': self.state,
+                'retry_after': self.retry_after(),
+                'window_calls': calls,
+                'window_failures': failures,
+                'window_slow_calls': slow_calls,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per upstream service, created on first use"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, service):
+        breaker = self._breakers.get(service)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(service)
+                if breaker is None:
+                    breaker = self._breakers[service] = CircuitBreaker(service, settings.CIRCUIT_BREAKER)
+        return breaker
+
+    def stats(self):
+        """Breaker state per service"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.service: breaker.stats() for breaker in breakers}
+
+
+# Global breakers shared by both proxy engines in this process
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,201 @@
+"""
+Gateway response cache for idempotent GETs
+Keyed by path, normalized query and auth scope, with per-route TTLs.
+Entries are versioned by a per-service generation number; any write
+(POST/PUT/PATCH/DELETE) through a service prefix bumps its generation,
+which invalidates every cached entry for that service at once.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Headers stored with a cached body and replayed on hits
+CACHED_HEADERS = (
+    'Content-Type',
+    'Content-Encoding',
+    'Cache-Control',
+    'ETag',
+    'Last-Modified',
+    'Vary',
+)
+
+
+class ResponseCache:
+    """Per-route TTL cache in front of proxy_request"""
+
+    def __init__(self):
+        self._routes = None
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0})
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[settings.GATEWAY_CACHE_ALIAS]
+
+    @property
+    def routes(self):
+        """Compiled (pattern, ttl) pairs from GATEWAY_CACHE_ROUTES"""
+        if self._routes is None:
+            self._routes = [(re.compile(pattern), ttl) for pattern, ttl in settings.GATEWAY_CACHE_ROUTES]
+        return self._routes
+
+    def _count(self, service, counter):
+        with self._lock:
+            self._counters[service][counter] += 1
+
+    def get_ttl(self, request, path):
+        """TTL in seconds for a cacheable GET, or None if the route isn't cached"""
+        if not settings.GATEWAY_CACHE_ENABLED or request.method != 'GET':
+            return None
+        for pattern, ttl in self.routes:
+            if pattern.match(path):
+                return ttl
+        return None
+
+    def _generation_key(self, service):
+        return f"gw:gen:{service}"
+
+    def _build_key(self, request, service, path, generation):
+        """Cache key from path, sorted query params, auth scope and encoding"""
+        query = sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+        # Responses can differ per user, so the (hashed) token is part of the key
+        auth_scope = request.headers.get('Authorization') or 'anonymous'
+        raw = '|'.join([
+            path,
+            repr(query),
+            auth_scope,
+            request.headers.get('Accept-Encoding', ''),
+        ])
+        digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        return f"gw:resp:{service}:{generation}:{digest}"
+
+    def make_key(self, request, service, path):
+        """
+        Key for the current generation of a service
+        Taken before the upstream call, so a response fetched while a write
+        was invalidating the service is stored under the stale generation
+        """
+        generation = self.backend.get_or_set(self._generation_key(service), 1, timeout=None)
+        return self._build_key(request, service, path, generation)
+
+    async def amake_key(self, request, service, path):
+        """Async counterpart of make_key"""
+        generation = await self.backend.aget_or_set(self._generation_key(service), 1, timeout=None)
+        return self._build_key(request, service, path, generation)
+
+    def _to_response(self, service, entry):
+        if entry is None:
+            self._count(service, 'misses')
+            return None
+        self._count(service, 'hits')
+        response = HttpResponse(entry['body'], status=entry['status'])
+        for name, value in entry['headers'].items():
+            response[name] = value
+        response['X-Gateway-Cache'] = 'HIT'
+        return response
+
+    def get(self, service, key):
+        """Cached HttpResponse or None"""
+        return self._to_response(service, self.backend.get(key))
+
+    async def aget(self, service, key):
+        return self._to_response(service, await self.backend.aget(key))
+
+    def _build_entry(self, response, body):
+        return {
+            'status': response.status_code,
+            'headers': {name: response[name] for name in CACHED_HEADERS if response.has_header(name)},
+            'body': body,
+        }
+
+    def _materialize(self, response, body):
+        """Replace a consumed streaming response with a plain one carrying the same headers"""
+        if not response.streaming:
+            return response
+        buffered = HttpResponse(body, status=response.status_code)
+        for name, value in response.items():
+            buffered[name] = value
+        buffered['Content-Length'] = str(len(body))
+        return buffered
+
+    def store(self, service, key, response, ttl):
+        """Cache a 200 response (buffering it if it was streamed) and return a usable response"""
+        if response.status_code != 200:
+            return response
+
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        self.backend.set(key, self._build_entry(response, body), ttl)
+        self._count(service, 'stores')
+
+        response = self._materialize(response, body)
+        response['X-Gateway-Cache'] = 'MISS'
+        return response
+
+    async def astore(self, service, key, response, ttl):
+        """Async counterpart of store"""
+        if response.status_code != 200:
+            return response
+
+        if response.streaming:
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        else:
+            body = response.content
+        await self.backend.aset(key, self._build_entry(response, body), ttl)
+        self._count(service, 'stores')
+
+        response = self._materialize(response, body)
+        response['X-Gateway-Cache'] = 'MISS'
+        return response
+
+    def _targets(self, service):
+        """A write to one service may also change data served by others"""
+        return [service] + list(settings.GATEWAY_CACHE_INVALIDATES.get(service, ()))
+
+    def invalidate(self, service):
+        """Drop every cached entry for a service (and its dependents) by bumping the generation"""
+        for target in self._targets(service):
+            key = self._generation_key(target)
+            try:
+                self.backend.incr(key)
+            except ValueError:
+                # No generation yet means nothing has been cached for this service
+                self.backend.add(key, 1, timeout=None)
+            self._count(target, 'invalidations')
+            logger.info(f"Invalidated gateway cache for {target}")
+
+    async def ainvalidate(self, service):
+        """Async counterpart of invalidate"""
+        for target in self._targets(service):
+            key = self._generation_key(target)
+            try:
+                await self.backend.aincr(key)
+            except ValueError:
+                await self.backend.aadd(key, 1, timeout=None)
+            self._count(target, 'invalidations')
+            logger.info(f"Invalidated gateway cache for {target}")
+
+    def stats(self):
+        """Hit/miss counters per service (this process only)"""
+        with self._lock:
+            counters = {service: dict(values) for service, values in self._counters.items()}
+        for values in counters.values():
+            lookups = values['hits'] + values['misses']
+            values['hit_ratio'] = round(values['hits'] / lookups, 3) if lookups else None
+        return {
+            'enabled': settings.GATEWAY_CACHE_ENABLED,
+            'backend': settings.GATEWAY_CACHE_BACKEND,
+            'services': counters,
+        }
+
+
+# Global response cache shared by all proxy views in this process
+response_cache = ResponseCache()
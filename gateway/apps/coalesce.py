@@ -0,0 +1,176 @@
+"""
+Single-flight coalescing for identical concurrent gateway GETs
+While one upstream call for a request is in flight, identical requests wait
+for it and receive a copy of its response instead of hitting the service again.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Request headers that can change the upstream response, so they are part of the key
+KEY_HEADERS = (
+    'Authorization',
+    'Accept-Encoding',
+    'If-None-Match',
+    'If-Modified-Since',
+)
+
+
+class Flight:
+    """One in-flight upstream call (sync/WSGI)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None  # Buffered response, None if the leader failed
+
+
+def snapshot_response(response):
+    """Buffer a response into a plain dict that can be replayed any number of times"""
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return {
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'body': body,
+    }
+
+
+async def asnapshot_response(response):
+    """Async counterpart of snapshot_response"""
+    if response.streaming:
+        body = b''.join([chunk async for chunk in response.streaming_content])
+    else:
+        body = response.content
+    return {
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'body': body,
+    }
+
+
+def restore_response(entry, coalesced=False):
+    """Build a fresh HttpResponse from a snapshot"""
+    response = HttpResponse(entry['body'], status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    response['Content-Length'] = str(len(entry['body']))
+    if coalesced:
+        response['X-Gateway-Coalesced'] = 'true'
+    return response
+
+
+class SingleFlight:
+    """Collapses identical concurrent GETs into one upstream call per gateway process"""
+
+    def __init__(self):
+        self._routes = None
+        self._flights = {}
+        self._async_flights = {}
+        self._counters = defaultdict(lambda: {'upstream_calls': 0, 'collapsed': 0})
+        self._lock = threading.Lock()
+
+    @property
+    def routes(self):
+        """Compiled patterns from GATEWAY_COALESCE_ROUTES"""
+        if self._routes is None:
+            self._routes = [re.compile(pattern) for pattern in settings.GATEWAY_COALESCE_ROUTES]
+        return self._routes
+
+    def applies(self, request, path):
+        """Only GETs on coalesced routes share upstream calls"""
+        if not settings.GATEWAY_COALESCE_ENABLED or request.method != 'GET':
+            return False
+        return any(pattern.match(path) for pattern in self.routes)
+
+    def make_key(self, request, service, path):
+        """Identical requests: same service, path, query and response-shaping headers"""
+        query = sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+        raw = '|'.join([service, path, repr(query)] + [request.headers.get(name, '') for name in KEY_HEADERS])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, service, counter):
+        with self._lock:
+            self._counters[service][counter] += 1
+
+    def do(self, service, key, fetch):
+        """
+        Run fetch() once for all concurrent callers with the same key
+
+        Args:
+            service: Service name (for metrics)
+            key: Request key from make_key
+            fetch: Callable performing the upstream call and returning a response
+
+        Returns:
+            A buffered HttpResponse (each caller gets its own copy)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            self._count(service, 'collapsed')
+            flight.done.wait()
+            if flight.entry is not None:
+                return restore_response(flight.entry, coalesced=True)
+            # The leader failed without a response; make our own call
+            return fetch()
+
+        self._count(service, 'upstream_calls')
+        try:
+            flight.entry = snapshot_response(fetch())
+            return restore_response(flight.entry)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, service, key, fetch):
+        """Async counterpart of do (fetch is a coroutine function)"""
+        # Futures belong to one event loop, so flights are never shared across loops
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._async_flights.get(flight_key)
+
+        if flight is not None:
+            self._count(service, 'collapsed')
+            entry = await asyncio.shield(flight)
+            if entry is not None:
+                return restore_response(entry, coalesced=True)
+            return await fetch()
+
+        flight = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+        self._count(service, 'upstream_calls')
+        entry = None
+        try:
+            entry = await asnapshot_response(await fetch())
+            return restore_response(entry)
+        finally:
+            del self._async_flights[flight_key]
+            flight.set_result(entry)
+
+    def stats(self):
+        """Coalescing counters per service (this process only)"""
+        with self._lock:
+            counters = {service: dict(values) for service, values in self._counters.items()}
+            in_flight = len(self._flights)
+        in_flight += len(self._async_flights)
+        for values in counters.values():
+            requests = values['upstream_calls'] + values['collapsed']
+            values['collapse_ratio'] = round(values['collapsed'] / requests, 3) if requests else None
+        return {
+            'enabled': settings.GATEWAY_COALESCE_ENABLED,
+            'in_flight': in_flight,
+            'services': counters,
+        }
+
+
+# Global single-flight group shared by all proxy views in this process
+single_flight = SingleFlight()
@@ -0,0 +1,189 @@
+"""
+Gateway-side JWT verification
+The bearer token is verified once per gateway process and its claims are cached
+until the token expires. Upstream calls carry a compact HMAC-signed identity header
+(X-Gateway-Identity) that services can trust without decoding the JWT again.
+
+Header format: base64url(JSON claims) + "." + base64url(HMAC-SHA256 of the first part)
+Claims: sub (user id), src ('jwt' for auth service tokens, 'clerk' for Clerk tokens),
+adm (admin flag) and exp (token expiry, epoch seconds).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_HEADER = 'X-Gateway-Identity'
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def sign_identity(claims, secret):
+    """Encode identity claims as a signed header value"""
+    payload = b64encode(json.dumps(claims, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+    signature = hmac.new(secret.encode('utf-8'), payload.encode('ascii'), hashlib.sha256).digest()
+    return f"{payload}.{b64encode(signature)}"
+
+
+class IdentityVerifier:
+    """Verifies bearer tokens and caches the signed identity per token until exp"""
+
+    def __init__(self):
+        self._cache = OrderedDict()  # sha256(token) -> (header value, exp)
+        self._jwks_client = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.verified = 0
+        self.rejected = 0
+
+    @property
+    def jwks_client(self):
+        """Clerk signing keys (fetched lazily, cached by PyJWKClient)"""
+        if self._jwks_client is None and settings.CLERK_JWKS_URL:
+            self._jwks_client = jwt.PyJWKClient(settings.CLERK_JWKS_URL)
+        return self._jwks_client
+
+    def identity_header(self, request):
+        """
+        Signed identity for the request's bearer token, or None
+        (no token, unverifiable token, or identity headers disabled)
+        """
+        token = self._bearer_token(request)
+        if token is None:
+            return None
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        header = self._cached(key)
+        if header is not None:
+            return header
+        return self._verify_and_cache(token, key)
+
+    async def aidentity_header(self, request):
+        """
+        identity_header for the async engine
+        Cache hits are answered on the event loop; verification runs on a worker thread,
+        since a Clerk token may need its signing keys fetched over HTTPS first
+        """
+        token = self._bearer_token(request)
+        if token is None:
+            return None
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        header = self._cached(key)
+        if header is not None:
+            return header
+        return await sync_to_async(self._verify_and_cache, thread_sensitive=False)(token, key)
+
+    def _bearer_token(self, request):
+        """Bearer token of the request, or None (also when identity headers are disabled)"""
+        if not settings.GATEWAY_IDENTITY_SECRET:
+            return None
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+        return auth_header[7:].strip() or None
+
+    def _cached(self, key):
+        """Cached identity header for a token hash, unless it expired"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._cache[key]
+        return None
+
+    def _verify_and_cache(self, token, key):
+        claims = self.verify(token)
+        if claims is None:
+            self.rejected += 1
+            return None
+
+        header = sign_identity(claims, settings.GATEWAY_IDENTITY_SECRET)
+        with self._lock:
+            self.verified += 1
+            self._cache[key] = (header, claims['exp'])
+            if len(self._cache) > settings.GATEWAY_IDENTITY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return header
+
+    def verify(self, token):
+        """
+        Verify a bearer token's signature and expiry
+
+        Returns:
+            Identity claims dict, or None if the token can't be verified here
+            (the Authorization header is still forwarded, so services can decide)
+        """
+        try:
+            algorithm = jwt.get_unverified_header(token).get('alg')
+            if algorithm == 'HS256':
+                return self._verify_auth_service_token(token)
+            if algorithm == 'RS256' and self.jwks_client is not None:
+                return self._verify_clerk_token(token)
+        except jwt.PyJWTError as e:
+            logger.info(f"Bearer token not verified at the gateway: {e}")
+        return None
+
+    def _verify_auth_service_token(self, token):
+        """Access tokens issued by the auth service (simplejwt, HS256)"""
+        decoded = jwt.decode(
+            token,
+            settings.JWT_SIGNING_KEY,
+            algorithms=['HS256'],
+            options={'require': ['exp']}
+        )
+        if decoded.get('token_type', 'access') != 'access' or not decoded.get('user_id'):
+            return None
+        return {
+            'sub': str(decoded['user_id']),
+            'src': 'jwt',
+            'adm': False,
+            'exp': int(decoded['exp']),
+        }
+
+    def _verify_clerk_token(self, token):
+        """Session tokens issued by Clerk (RS256, keys from CLERK_JWKS_URL)"""
+        signing_key = self.jwks_client.get_signing_key_from_jwt(token)
+        decoded = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=['RS256'],
+            options={'require': ['exp', 'sub'], 'verify_aud': False}
+        )
+        metadata = decoded.get('metadata') or {}
+        public_metadata = metadata.get('public') or decoded.get('public_metadata') or {}
+        role = public_metadata.get('role') or decoded.get('role')
+        return {
+            'sub': str(decoded['sub']),
+            'src': 'clerk',
+            'adm': role == 'admin',
+            'exp': int(decoded['exp']),
+        }
+
+    def stats(self):
+        """Cache statistics for the health endpoint"""
+        with self._lock:
+            cached = len(self._cache)
+        return {
+            'enabled': bool(settings.GATEWAY_IDENTITY_SECRET),
+            'cached_tokens': cached,
+            'hits': self.hits,
+            'verified': self.verified,
+            'rejected': self.rejected,
+        }
+
+
+# Global verifier shared by both proxy engines in this process
+identity_verifier = IdentityVerifier()
@@ -0,0 +1,25 @@
+"""
+Prometheus metrics for the gateway
+Per-upstream call counts and latency; the request metrics come from
+smartbin_common.metrics. Exposed at /metrics.
+"""
+from prometheus_client import Counter, Histogram
+from smartbin_common.metrics import LATENCY_BUCKETS
+
+UPSTREAM_REQUESTS = Counter(
+    'gateway_upstream_requests_total',
+    'Calls made to upstream services',
+    ['service', 'status']
+)
+UPSTREAM_LATENCY = Histogram(
+    'gateway_upstream_duration_seconds',
+    'Time until an upstream service answered (or failed)',
+    ['service'],
+    buckets=LATENCY_BUCKETS
+)
+
+
+def record_upstream(service, status, duration):
+    """Record one upstream call (status is the gateway's response status)"""
+    UPSTREAM_REQUESTS.labels(service, status).inc()
+    UPSTREAM_LATENCY.labels(service).observe(duration)
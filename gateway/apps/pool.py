@@ -0,0 +1,158 @@
+"""
+Connection pooling for upstream microservices
+Keeps one keep-alive requests.Session per service so proxied calls reuse TCP connections
+"""
+import threading
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamPool:
+    """Keep-alive session for a single upstream service"""
+
+    def __init__(self, service, pool_connections, pool_maxsize, pool_block, idle_timeout):
+        self.service = service
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.idle_timeout = idle_timeout
+        self.session = None
+        self.last_used = 0.0
+        self.requests_sent = 0
+        self.sessions_created = 0
+        self.idle_recycles = 0
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        """Create a session whose adapters share the configured pool limits"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.sessions_created += 1
+        return session
+
+    def get_session(self):
+        """
+        Return the pooled session, recycling it if it sat idle longer than idle_timeout
+        (upstream servers usually drop idle keep-alive sockets before we notice)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.session is not None and self.idle_timeout and now - self.last_used > self.idle_timeout:
+                logger.info(f"Recycling idle connection pool for {self.service}")
+                # Not closed: a streamed response may still be reading from one of its
+                # connections. Its sockets are closed once the last response lets go of it.
+                self.session = None
+                self.idle_recycles += 1
+
+            if self.session is None:
+                self.session = self._build_session()
+
+            self.last_used = now
+            self.requests_sent += 1
+            return self.session
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+    def stats(self):
+        """Snapshot of pool usage for health/metrics endpoints"""
+        with self._lock:
+            hosts = []
+            if self.session is not None:
+                adapter = self.session.get_adapter('http://')
+                for key in adapter.poolmanager.pools.keys():
+                    connection_pool = adapter.poolmanager.pools.get(key)
+                    if connection_pool is None:
+                        continue
+                    hosts.append({
+                        'host': f"{connection_pool.host}:{connection_pool.port}",
+                        'connections_opened': connection_pool.num_connections,
+                        'requests': connection_pool.num_requests,
+                        # The queue is pre-filled with None placeholders; only real sockets count as idle
+                        'idle_connections': sum(
+                            1 for conn in list(connection_pool.pool.queue) if conn is not None
+                        ) if connection_pool.pool else 0,
+                    })
+
+            return {
+                'pool_maxsize': self.pool_maxsize,
+                'pool_block': self.pool_block,
+                'idle_timeout': self.idle_timeout,
+                'requests_sent': self.requests_sent,
+                'sessions_created': self.sessions_created,
+                'idle_recycles': self.idle_recycles,
+                'idle_seconds': round(time.monotonic() - self.last_used, 1) if self.last_used else None,
+                'hosts': hosts,
+            }
+
+
+class UpstreamPoolManager:
+    """Registry of per-service connection pools"""
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool_config(self, service):
+        """Merge the global UPSTREAM_POOL settings with per-service overrides"""
+        config = dict(settings.UPSTREAM_POOL)
+        config.update(settings.UPSTREAM_POOL_OVERRIDES.get(service, {}))
+        # One urllib3 host pool per instance, so none get evicted when balancing across replicas
+        config['POOL_CONNECTIONS'] = max(config['POOL_CONNECTIONS'], len(settings.SERVICE_INSTANCES.get(service, ())))
+        return config
+
+    def get_pool(self, service):
+        """Return (and lazily create) the pool for a service"""
+        pool = self._pools.get(service)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(service)
+            if pool is None:
+                config = self._pool_config(service)
+                pool = UpstreamPool(
+                    service,
+                    pool_connections=config['POOL_CONNECTIONS'],
+                    pool_maxsize=config['MAX_CONNECTIONS'],
+                    pool_block=config['POOL_BLOCK'],
+                    idle_timeout=config['IDLE_TIMEOUT']
+                )
+                self._pools[service] = pool
+                logger.info(f"Created connection pool for {service} (max {pool.pool_maxsize} connections)")
+            return pool
+
+    def get_session(self, service):
+        """Shortcut for get_pool(service).get_session()"""
+        return self.get_pool(service).get_session()
+
+    def close_all(self):
+        """Close every pool (used on shutdown and in benchmarks)"""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools = {}
+
+    def stats(self):
+        """Per-service pool statistics"""
+        return {service: pool.stats() for service, pool in list(self._pools.items())}
+
+
+# Global pool manager shared by all proxy views in this process
+pool_manager = UpstreamPoolManager()
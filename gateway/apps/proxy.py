@@ -1,81 +1,301 @@
 """
 Proxy utility for forwarding requests to microservices
 """
+import re
+import time
 import requests
 import logging
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from smartbin_common.tracing import start_span, inject_headers
+from .pool import pool_manager
+from .cache import response_cache, SAFE_METHODS
+from .coalesce import single_flight
+from .breaker import circuit_breakers
+from .balancer import load_balancers
+from .identity import identity_verifier, IDENTITY_HEADER
+from .metrics import record_upstream
 
 logger = logging.getLogger(__name__)
 
+# Upstream response headers kept in pass-through mode
+PASSTHROUGH_RESPONSE_HEADERS = (
+    'Content-Type',
+    'Content-Encoding',
+    'Content-Length',
+    'Cache-Control',
+    'ETag',
+    'Last-Modified',
+    'Expires',
+    'Vary',
+    'Location',
+)
 
-def proxy_request(request, service_url, path=''):
+# Conditional GET headers forwarded in pass-through mode (so upstream 304s reach the client)
+PASSTHROUGH_REQUEST_HEADERS = (
+    'If-None-Match',
+    'If-Modified-Since',
+)
+
+
+def build_upstream_headers(request, passthrough=False, identity=None):
+    """
+    Build the headers sent to a microservice
+    Shared by the sync (requests) and async (httpx) proxy engines, which each verify
+    the bearer token their own way and pass in the signed identity header (or None)
+    """
+    # Prepare headers (minimal headers to avoid Django ALLOWED_HOSTS issues)
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Host': 'localhost'  # Override Host header to avoid Django ALLOWED_HOSTS validation
+    }
+
+    # Only forward Authorization header
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        headers['Authorization'] = auth_header
+        # Verified once at the gateway (cached until exp) so services can skip decoding the token
+        if identity:
+            headers[IDENTITY_HEADER] = identity
+
+    # Lets services recognise retried writes (replayed instead of applied twice)
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        headers['Idempotency-Key'] = idempotency_key
+
+    # Continue the gateway's trace in the service (traceparent of the upstream span)
+    headers = inject_headers(headers)
+
+    if passthrough:
+        # The body is relayed untouched, so the upstream may only compress it
+        # if the client accepts that encoding
+        headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
+        for name in PASSTHROUGH_REQUEST_HEADERS:
+            value = request.headers.get(name)
+            if value:
+                headers[name] = value
+
+    return headers
+
+
+def build_upstream_body(request):
+    """Return the body to forward (only for methods that carry one)"""
+    if request.method in ['POST', 'PUT', 'PATCH']:
+        return request.body
+    return None
+
+
+def build_json_response(status_code, parse_json, text):
+    """
+    Re-encode an upstream response as JsonResponse
+
+    Args:
+        status_code: Upstream status code
+        parse_json: Callable returning the decoded JSON body (raises ValueError if not JSON)
+        text: Callable returning the body as text
+    """
+    try:
+        return JsonResponse(
+            parse_json(),
+            status=status_code,
+            safe=False
+        )
+    except ValueError:
+        # If response is not JSON, return text
+        return JsonResponse(
+            {'detail': text()},
+            status=status_code
+        )
+
+
+def build_streaming_response(status_code, upstream_headers, chunks):
+    """
+    Relay an upstream body chunk by chunk, keeping its content and cache headers
+
+    Args:
+        status_code: Upstream status code
+        upstream_headers: Case-insensitive upstream header mapping
+        chunks: Iterator (or async iterator) of raw body bytes
+    """
+    response = StreamingHttpResponse(chunks, status=status_code)
+    # StreamingHttpResponse defaults to text/html; only keep what the upstream sent
+    del response['Content-Type']
+    for name in PASSTHROUGH_RESPONSE_HEADERS:
+        value = upstream_headers.get(name)
+        if value is not None:
+            response[name] = value
+    return response
+
+
+def iter_upstream_body(response, service_url):
+    """Yield the raw (still encoded) upstream body and release the connection when done"""
+    try:
+        yield from response.raw.stream(settings.PROXY_CHUNK_SIZE, decode_content=False)
+    except Exception as e:
+        # Headers are already sent, so the client just sees a truncated body
+        logger.error(f"Error streaming response from {service_url}: {e}")
+    finally:
+        response.close()
+
+
+_route_timeouts = None
+
+
+def get_upstream_timeouts(path):
+    """(connect, read) timeouts in seconds for an upstream path (GATEWAY_ROUTE_TIMEOUTS)"""
+    global _route_timeouts
+    if _route_timeouts is None:
+        _route_timeouts = [
+            (re.compile(pattern), (connect, read))
+            for pattern, connect, read in settings.GATEWAY_ROUTE_TIMEOUTS
+        ]
+    for pattern, timeouts in _route_timeouts:
+        if pattern.match(path):
+            return timeouts
+    return settings.SERVICE_CONNECT_TIMEOUT, settings.SERVICE_READ_TIMEOUT
+
+
+def build_circuit_open_response(service, breaker):
+    """Immediate 503 while a service's circuit is open"""
+    response = JsonResponse(
+        {'error': 'Service unavailable', 'detail': f'Circuit open for {service} service'},
+        status=503
+    )
+    response['Retry-After'] = str(breaker.retry_after() or 1)
+    return response
+
+
+def is_upstream_failure(response):
+    """Outcomes that count against the circuit breaker"""
+    return response is None or response.status_code >= 500
+
+
+def proxy_request(request, service_url, path='', service=None):
     """
     Forward request to a microservice
-    
+
     Args:
         request: Django request object
-        service_url: Base URL of the service
+        service_url: Base URL of the service (used when SERVICE_INSTANCES has no list for it)
         path: Additional path to append
-    
+        service: Service name used to pick the instances, connection pool and cache namespace
+                 (defaults to service_url)
+
     Returns:
-        JsonResponse with the service's response
+        StreamingHttpResponse relaying the service's body (PROXY_PASSTHROUGH),
+        otherwise JsonResponse with the service's response.
+        Cached and coalesced routes return a buffered HttpResponse.
+    """
+    service = service or service_url
+
+    if request.method not in SAFE_METHODS:
+        try:
+            return forward_request(request, service_url, path, service)
+        finally:
+            # Writes invalidate the service's cached reads (even on errors, the write may have applied)
+            response_cache.invalidate(service)
+
+    # Serve idempotent GETs on cached routes from the gateway cache
+    cache_ttl = response_cache.get_ttl(request, path)
+    if cache_ttl:
+        cache_key = response_cache.make_key(request, service, path)
+        cached = response_cache.get(service, cache_key)
+        if cached is not None:
+            return cached
+
+    def fetch():
+        response = forward_request(request, service_url, path, service)
+        if cache_ttl:
+            response = response_cache.store(service, cache_key, response, cache_ttl)
+        return response
+
+    # Identical concurrent GETs share one upstream call (cache misses always do)
+    if cache_ttl or single_flight.applies(request, path):
+        return single_flight.do(service, single_flight.make_key(request, service, path), fetch)
+    return fetch()
+
+
+def forward_request(request, service_url, path, service):
     """
+    Send one request to an instance of a microservice through its circuit breaker
+    (no caching; see proxy_request)
+    """
+    breaker = circuit_breakers.get(service)
+    if not breaker.allow():
+        return build_circuit_open_response(service, breaker)
+
+    balancer = load_balancers.get(service, service_url)
+    instance = balancer.acquire()
+    started = time.monotonic()
+    response = None
+    with start_span(f"upstream {service}", kind='client', instance=instance.url) as span:
+        try:
+            response = send_upstream_request(request, instance.url, path, service)
+            return response
+        finally:
+            duration = time.monotonic() - started
+            success = not is_upstream_failure(response)
+            status = response.status_code if response is not None else 500
+            balancer.release(instance, success)
+            breaker.record(success, duration)
+            record_upstream(service, status, duration)
+            span.set('status_code', status)
+            if not success:
+                span.status = 'error'
+
+
+def send_upstream_request(request, service_url, path, service):
+    """Send one request to a microservice and build the gateway response"""
+    passthrough = settings.PROXY_PASSTHROUGH
+
     try:
         # Build target URL
         target_url = f"{service_url}/{path}"
-        
+
         # Get request method
         method = request.method
-        
-        # Prepare headers (minimal headers to avoid Django ALLOWED_HOSTS issues)
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'Host': 'localhost'  # Override Host header to avoid Django ALLOWED_HOSTS validation
-        }
-        
-        # Only forward Authorization header
-        auth_header = request.headers.get('Authorization')
-        if auth_header:
-            headers['Authorization'] = auth_header
-        
-        # Prepare data
-        data = None
-        if request.method in ['POST', 'PUT', 'PATCH']:
-            data = request.body
-        
+
+        headers = build_upstream_headers(
+            request,
+            passthrough=passthrough,
+            identity=identity_verifier.identity_header(request)
+        )
+        data = build_upstream_body(request)
+
         # Prepare query parameters
         params = request.GET.dict()
-        
+
         logger.info(f"Proxying {method} request to {target_url}")
-        
-        # Make request to microservice
+
+        # Make request to microservice over the service's keep-alive pool
         # Use allow_redirects=False to prevent HOST header forwarding issues
-        response = requests.request(
+        session = pool_manager.get_session(service)
+        response = session.request(
             method=method,
             url=target_url,
             headers=headers,
             data=data,
             params=params,
-            timeout=settings.SERVICE_TIMEOUT,
-            allow_redirects=False
+            timeout=get_upstream_timeouts(path),
+            allow_redirects=False,
+            stream=passthrough
         )
-        
-        # Return response
-        try:
-            return JsonResponse(
-                response.json(),
-                status=response.status_code,
-                safe=False
-            )
-        except ValueError:
-            # If response is not JSON, return text
-            return JsonResponse(
-                {'detail': response.text},
-                status=response.status_code
+
+        if passthrough:
+            return build_streaming_response(
+                response.status_code,
+                response.headers,
+                iter_upstream_body(response, service_url)
             )
-    
+
+        # Return response
+        return build_json_response(
+            response.status_code,
+            response.json,
+            lambda: response.text
+        )
+
     except requests.exceptions.Timeout:
         logger.error(f"Timeout calling {service_url}")
         return JsonResponse(
@@ -0,0 +1,244 @@
+"""
+Shared MQTT fan-out hub for the detection SSE stream
+One MQTT subscription to the detection service's stream topic (bin/+/stored) per
+gateway process; events are pushed to per-bin subscriber queues instead of every SSE
+client polling the detection service. The detection service only publishes detections
+once they are committed, serialized without the user's NFC code.
+Recent events are kept in a per-bin ring buffer so reconnecting clients can resume
+from their Last-Event-ID.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+import paho.mqtt.client as mqtt
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSubscriber:
+    """Bounded queue of events for one SSE connection (sync/WSGI)"""
+
+    def __init__(self, bin_id, maxsize):
+        self.bin_id = bin_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.replay = []  # Buffered events the client missed, sent before live ones
+
+    def deliver(self, event):
+        """Called from the MQTT thread; drops the oldest event if the client is too slow"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            self.queue.put_nowait(event)
+        return True
+
+    def get(self, timeout):
+        """Block until an event arrives; returns None on timeout (time for a heartbeat)"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncStreamSubscriber:
+    """Bounded queue of events for one SSE connection (async/ASGI)"""
+
+    def __init__(self, bin_id, maxsize):
+        self.bin_id = bin_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.replay = []  # Buffered events the client missed, sent before live ones
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        """Called from the MQTT thread; hands the event over to the subscriber's event loop"""
+        if self.loop.is_closed():
+            return False
+        self.loop.call_soon_threadsafe(self._put, event)
+        return True
+
+    async def get(self, timeout):
+        """Wait for an event; returns None on timeout (time for a heartbeat)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class DetectionStreamHub:
+    """Process-wide MQTT subscription fanned out to per-bin subscribers"""
+
+    def __init__(self):
+        self.client = None
+        self.connected = False
+        self.messages_received = 0
+        self.events_delivered = 0
+        self.events_replayed = 0
+        # Event ids are "<epoch>-<sequence>"; the epoch changes whenever this process
+        # restarts, so ids handed out by a previous process are recognised as unknown
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._history = OrderedDict()  # bin_id -> deque of recent events (LRU over bins)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Connect to the broker once; paho's loop thread handles reconnects"""
+        with self._lock:
+            if self.client is not None:
+                return
+
+            # Unique client id so several gateway processes don't kick each other off the broker
+            client_id = f"gateway_stream_hub_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+            self.client = mqtt.Client(client_id=client_id)
+            self.client.on_connect = self._on_connect
+            self.client.on_disconnect = self._on_disconnect
+            self.client.on_message = self._on_message
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+
+            try:
+                self.client.connect_async(settings.MQTT_BROKER, settings.MQTT_PORT, keepalive=settings.MQTT_KEEPALIVE)
+                self.client.loop_start()
+                logger.info(f"Detection stream hub connecting to {settings.MQTT_BROKER}:{settings.MQTT_PORT}")
+            except Exception as e:
+                logger.error(f"Error starting detection stream hub: {e}")
+
+    def _on_connect(self, client, userdata, flags, rc):
+        """(Re)subscribe on every successful connect"""
+        if rc == 0:
+            self.connected = True
+            client.subscribe(settings.STREAM_MQTT_TOPIC, 0)
+            logger.info(f"Detection stream hub subscribed to: {settings.STREAM_MQTT_TOPIC}")
+        else:
+            self.connected = False
+            logger.error(f"Detection stream hub failed to connect. Return code: {rc}")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        if rc != 0:
+            logger.warning(f"Detection stream hub disconnected unexpectedly. Return code: {rc}")
+
+    def _on_message(self, client, userdata, msg):
+        """Turn a stored detection into an SSE event and push it to that bin's subscribers"""
+        self.messages_received += 1
+        try:
+            detection = json.loads(msg.payload)
+        except ValueError as e:
+            logger.error(f"Invalid stored detection on {msg.topic}: {e}")
+            return
+
+        bin_id = str(detection.get('bin_id') or msg.topic.split('/')[1]).strip()
+        event = {
+            'type': 'detection',
+            'data': detection,
+            'received_at': time.time(),
+        }
+        self.publish(bin_id, event)
+
+    def publish(self, bin_id, event):
+        """Assign an event id, remember the event and deliver it to every subscriber of a bin"""
+        with self._lock:
+            sequence = next(self._sequence)
+            event['id'] = f"{self.epoch}-{sequence}"
+            event['sequence'] = sequence
+
+            history = self._history.get(bin_id)
+            if history is None:
+                history = self._history[bin_id] = deque(maxlen=settings.STREAM_REPLAY_BUFFER_SIZE)
+                if len(self._history) > settings.STREAM_REPLAY_MAX_BINS:
+                    self._history.popitem(last=False)
+            else:
+                self._history.move_to_end(bin_id)
+            history.append(event)
+
+            # Taken under the same lock as the history append, so a subscriber
+            # gets each event either from its replay or live, never both
+            subscribers = list(self._subscribers.get(bin_id, ()))
+
+        for subscriber in subscribers:
+            if subscriber.deliver(event):
+                self.events_delivered += 1
+            else:
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, bin_id, last_event_id=None):
+        """Register a sync subscriber for a bin"""
+        return self._add(StreamSubscriber(bin_id, settings.STREAM_QUEUE_SIZE), last_event_id)
+
+    def subscribe_async(self, bin_id, last_event_id=None):
+        """Register an async subscriber for a bin (must be called inside the event loop)"""
+        return self._add(AsyncStreamSubscriber(bin_id, settings.STREAM_QUEUE_SIZE), last_event_id)
+
+    def _add(self, subscriber, last_event_id):
+        self.start()
+        with self._lock:
+            if last_event_id:
+                subscriber.replay = self._replay_after(subscriber.bin_id, last_event_id)
+                self.events_replayed += len(subscriber.replay)
+            self._subscribers[subscriber.bin_id].add(subscriber)
+        return subscriber
+
+    def _replay_after(self, bin_id, last_event_id):
+        """
+        Buffered events for a bin newer than last_event_id (caller holds the lock)
+        Ids from another epoch (gateway restart / other process) replay the whole
+        buffer: a possible duplicate is better than a lost deposit
+        """
+        history = self._history.get(bin_id)
+        if not history:
+            return []
+
+        epoch, _, sequence = last_event_id.strip().partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return list(history)
+
+        last_sequence = int(sequence)
+        return [event for event in history if event['sequence'] > last_sequence]
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber when its SSE connection closes"""
+        with self._lock:
+            bin_subscribers = self._subscribers.get(subscriber.bin_id)
+            if bin_subscribers is not None:
+                bin_subscribers.discard(subscriber)
+                if not bin_subscribers:
+                    del self._subscribers[subscriber.bin_id]
+
+    def stats(self):
+        """Hub statistics for the health endpoint"""
+        with self._lock:
+            subscribers = [s for bin_subscribers in self._subscribers.values() for s in bin_subscribers]
+            bins = len(self._subscribers)
+        return {
+            'connected': self.connected,
+            'bins': bins,
+            'subscribers': len(subscribers),
+            'messages_received': self.messages_received,
+            'events_delivered': self.events_delivered,
+            'events_replayed': self.events_replayed,
+            'events_dropped': sum(s.dropped for s in subscribers),
+            'buffered_bins': len(self._history),
+        }
+
+
+# Global hub shared by all SSE connections in this process
+stream_hub = DetectionStreamHub()
@@ -3,27 +3,45 @@ Gateway views - proxy requests to microservices
 """
 import json
 import time
-import threading
 from django.http import JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.conf import settings
 from .proxy import proxy_request
-import requests
+from .async_proxy import async_proxy_request
+from .pool import pool_manager
+from .stream_hub import stream_hub
+from .cache import response_cache
+from .coalesce import single_flight
+from .breaker import circuit_breakers
+from .balancer import load_balancers
+from .identity import identity_verifier
+from .batch import BatchError, parse_batch, run_batch, arun_batch
 
 
 class HealthCheckView(View):
     """Gateway health check"""
     
     def get(self, request):
+        breakers = circuit_breakers.stats()
+        # An open circuit means some routes are failing fast
+        degraded = any(breaker['state'] != 'closed' for breaker in breakers.values())
         return JsonResponse({
-            'status': 'healthy',
+            'status': 'degraded' if degraded else 'healthy',
             'service': 'gateway',
             'services': {
                 'auth': settings.AUTH_SERVICE_URL,
                 'bin': settings.BIN_SERVICE_URL,
                 'detection': settings.DETECTION_SERVICE_URL,
                 'reclamation': settings.RECLAMATION_SERVICE_URL,
-            }
+            },
+            'instances': settings.SERVICE_INSTANCES,
+            'load_balancers': load_balancers.stats(),
+            'pools': pool_manager.stats(),
+            'stream_hub': stream_hub.stats(),
+            'cache': response_cache.stats(),
+            'coalescing': single_flight.stats(),
+            'circuit_breakers': breakers,
+            'identity': identity_verifier.stats()
         })
 
 
@@ -32,7 +50,7 @@ class AuthProxyView(View):
     
     def dispatch(self, request, *args, **kwargs):
         path = kwargs.get('path', '')
-        return proxy_request(request, settings.AUTH_SERVICE_URL, f"api/auth/{path}")
+        return proxy_request(request, settings.AUTH_SERVICE_URL, f"api/auth/{path}", service='auth')
 
 
 class BinProxyView(View):
@@ -40,7 +58,7 @@ class BinProxyView(View):
     
     def dispatch(self, request, *args, **kwargs):
         path = kwargs.get('path', '')
-        return proxy_request(request, settings.BIN_SERVICE_URL, f"api/bins/{path}")
+        return proxy_request(request, settings.BIN_SERVICE_URL, f"api/bins/{path}", service='bin')
 
 
 class DetectionProxyView(View):
@@ -48,7 +66,7 @@ class DetectionProxyView(View):
     
     def dispatch(self, request, *args, **kwargs):
         path = kwargs.get('path', '')
-        return proxy_request(request, settings.DETECTION_SERVICE_URL, f"api/detections/{path}")
+        return proxy_request(request, settings.DETECTION_SERVICE_URL, f"api/detections/{path}", service='detection')
 
 
 class ReclamationProxyView(View):
@@ -56,13 +74,158 @@ class ReclamationProxyView(View):
     
     def dispatch(self, request, *args, **kwargs):
         path = kwargs.get('path', '')
-        return proxy_request(request, settings.RECLAMATION_SERVICE_URL, f"api/reclamations/{path}")
+        return proxy_request(request, settings.RECLAMATION_SERVICE_URL, f"api/reclamations/{path}", service='reclamation')
+
+
+class AsyncProxyView(View):
+    """
+    Base class for async proxy views (ASGI deployment mode)
+    Subclasses set service, service_url_setting and prefix
+    """
+    view_is_async = True
+    service = None
+    service_url_setting = None
+    prefix = None
+    
+    async def dispatch(self, request, *args, **kwargs):
+        path = kwargs.get('path', '')
+        service_url = getattr(settings, self.service_url_setting)
+        return await async_proxy_request(request, service_url, f"{self.prefix}{path}", service=self.service)
+
+
+class AsyncAuthProxyView(AsyncProxyView):
+    """Proxy all auth service requests (async)"""
+    service = 'auth'
+    service_url_setting = 'AUTH_SERVICE_URL'
+    prefix = 'api/auth/'
+
+
+class AsyncBinProxyView(AsyncProxyView):
+    """Proxy all bin service requests (async)"""
+    service = 'bin'
+    service_url_setting = 'BIN_SERVICE_URL'
+    prefix = 'api/bins/'
+
+
+class AsyncDetectionProxyView(AsyncProxyView):
+    """Proxy all detection service requests (async)"""
+    service = 'detection'
+    service_url_setting = 'DETECTION_SERVICE_URL'
+    prefix = 'api/detections/'
+
+
+class AsyncReclamationProxyView(AsyncProxyView):
+    """Proxy all reclamation service requests (async)"""
+    service = 'reclamation'
+    service_url_setting = 'RECLAMATION_SERVICE_URL'
+    prefix = 'api/reclamations/'
+
+
+class BatchView(View):
+    """
+    Run several gateway sub-requests in parallel and return all results at once
+    Body: {"requests": [{"id": "profile", "method": "GET", "path": "/api/auth/profile/"}, ...]}
+    """
+    
+    def post(self, request):
+        started = time.monotonic()
+        try:
+            items = parse_batch(request)
+        except BatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        responses = run_batch(request, items)
+        return JsonResponse({
+            'responses': responses,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        })
+
+
+class AsyncBatchView(View):
+    """Batch endpoint for the ASGI deployment mode (sub-requests run on the event loop)"""
+    view_is_async = True
+    
+    async def post(self, request):
+        started = time.monotonic()
+        try:
+            items = parse_batch(request)
+        except BatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        responses = await arun_batch(request, items)
+        return JsonResponse({
+            'responses': responses,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        })
+
+
+def sse_event(event):
+    """Format an event dict as an SSE frame (with its id so clients can resume)"""
+    return f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+
+def sse_retry():
+    """First frame of a stream: how long browsers wait before reconnecting"""
+    return f"retry: {settings.STREAM_RETRY_MS}\n\n"
+
+
+def get_last_event_id(request):
+    """Resume point sent by EventSource on reconnect (query param for polyfills)"""
+    return request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+
+class ClosingStream:
+    """
+    SSE generator with a close() hook
+    Django calls close() on the streaming content when the response is closed (the
+    client went away), even if the generator was never started or resumed again
+    """
+
+    def __init__(self, event_stream, on_close):
+        self.event_stream = event_stream
+        self.on_close = on_close
+
+    def __iter__(self):
+        return self.event_stream
+
+    def close(self):
+        try:
+            self.event_stream.close()
+        finally:
+            self.on_close()
+
+
+class AsyncClosingStream:
+    """ClosingStream for async generators (their own cleanup runs when the event loop finalizes them)"""
+
+    def __init__(self, event_stream, on_close):
+        self.event_stream = event_stream
+        self.on_close = on_close
+
+    def __aiter__(self):
+        return self.event_stream
+
+    def close(self):
+        self.on_close()
+
+
+def sse_response(event_stream, on_close=None):
+    """Wrap an SSE generator (sync or async) in a non-buffered streaming response"""
+    if on_close is not None:
+        wrapper = AsyncClosingStream if hasattr(event_stream, '__aiter__') else ClosingStream
+        event_stream = wrapper(event_stream, on_close)
+    response = StreamingHttpResponse(event_stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable buffering in nginx
+    return response
 
 
 class DetectionStreamView(View):
     """
     Server-Sent Events (SSE) endpoint for real-time detection updates
     GET /api/stream/detections/?bin_id=<uuid>
+    Events come from the process-wide MQTT hub, so idle streams cost no upstream calls.
+    Reconnects with a Last-Event-ID header are replayed from the hub's in-memory buffer.
     """
     
     def get(self, request):
@@ -70,43 +233,54 @@ class DetectionStreamView(View):
         if not bin_id:
             return JsonResponse({'error': 'bin_id parameter required'}, status=400)
         
+        subscriber = stream_hub.subscribe(bin_id.strip(), get_last_event_id(request))
+        
         def event_stream():
             """Generator function for SSE events"""
-            last_detection_id = None
-            while True:
-                try:
-                    # Poll detection service for new detections
-                    url = f"{settings.DETECTION_SERVICE_URL}api/detections/?bin_id={bin_id}&ordering=-created_at&limit=1"
-                    response = requests.get(url, timeout=5)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get('results') and len(data['results']) > 0:
-                            detection = data['results'][0]
-                            detection_id = detection.get('id')
-                            
-                            # Only send if this is a new detection
-                            if detection_id != last_detection_id:
-                                last_detection_id = detection_id
-                                event_data = {
-                                    'type': 'detection',
-                                    'data': detection
-                                }
-                                yield f"data: {json.dumps(event_data)}\n\n"
-                    
-                    # Wait before next poll
-                    time.sleep(0.5)  # Poll every 500ms
-                    
-                except Exception as e:
-                    # Send error event
-                    error_data = {
-                        'type': 'error',
-                        'message': str(e)
-                    }
-                    yield f"data: {json.dumps(error_data)}\n\n"
-                    time.sleep(1)  # Wait longer on error
+            try:
+                yield sse_retry()
+                for event in subscriber.replay:
+                    yield sse_event(event)
+                while True:
+                    event = subscriber.get(timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                    if event is None:
+                        # Comment frame keeps proxies from closing the idle connection
+                        yield ": keepalive\n\n"
+                        continue
+                    yield sse_event(event)
+            finally:
+                stream_hub.unsubscribe(subscriber)
+        
+        return sse_response(event_stream(), on_close=lambda: stream_hub.unsubscribe(subscriber))
+
+
+class AsyncDetectionStreamView(View):
+    """
+    SSE detection stream for the ASGI deployment mode
+    Waiting clients don't hold a thread each
+    """
+    view_is_async = True
+    
+    async def get(self, request):
+        bin_id = request.GET.get('bin_id')
+        if not bin_id:
+            return JsonResponse({'error': 'bin_id parameter required'}, status=400)
+        
+        subscriber = stream_hub.subscribe_async(bin_id.strip(), get_last_event_id(request))
+        
+        async def event_stream():
+            """Async generator for SSE events"""
+            try:
+                yield sse_retry()
+                for event in subscriber.replay:
+                    yield sse_event(event)
+                while True:
+                    event = await subscriber.get(timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                    if event is None:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield sse_event(event)
+            finally:
+                stream_hub.unsubscribe(subscriber)
         
-        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
-        response['Cache-Control'] = 'no-cache'
-        response['X-Accel-Buffering'] = 'no'  # Disable buffering in nginx
-        return response
+        return sse_response(event_stream(), on_close=lambda: stream_hub.unsubscribe(subscriber))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Benchmark the sync (WSGI) proxy_request path against the async (ASGI) engine
+at the same concurrency.
+
+By default a local fake upstream with a fixed latency is started, so the numbers
+only measure gateway overhead and how many calls each engine keeps in flight.
+
+Usage:
+    python benchmark_proxy.py --requests 2000 --concurrency 200 --latency-ms 50
+    python benchmark_proxy.py --upstream http://localhost:8002 --path api/bins/list/
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+# Setup Django
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gateway.settings')
+django.setup()
+
+from django.test import RequestFactory
+from apps.proxy import proxy_request
+from apps.async_proxy import async_proxy_request, close_async_client
+from apps.pool import pool_manager
+
+
+FAKE_BODY = json.dumps({'results': [{'id': i, 'status': 'active'} for i in range(20)]}).encode()
+
+
+async def handle_fake_connection(reader, writer, latency):
+    """Minimal keep-alive HTTP/1.1 handler: reply with FAKE_BODY after `latency` seconds"""
+    response = (
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: " + str(len(FAKE_BODY)).encode() + b"\r\n\r\n" + FAKE_BODY
+    )
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":", 1)[1]))
+            await asyncio.sleep(latency)
+            writer.write(response)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def serve_fake_upstream(latency, port_queue):
+    """Run the fake upstream in its own process so it doesn't compete for our GIL"""
+    async def serve():
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_fake_connection(reader, writer, latency),
+            '127.0.0.1', 0, backlog=4096
+        )
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def start_fake_upstream(latency):
+    """Start the fake upstream on a random local port and return its base URL"""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_fake_upstream, args=(latency, port_queue), daemon=True)
+    process.start()
+    return f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+
+class ThreadSampler:
+    """Track the peak number of live threads while an engine runs"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(name, latencies, elapsed, statuses, peak_threads):
+    """Print throughput and latency percentiles for one run"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    errors = sum(1 for code in statuses if code >= 400)
+
+    def percentile(p):
+        return latencies[min(count - 1, int(count * p))] * 1000
+
+    print(f"\n{name}")
+    print('-' * 60)
+    print(f"  requests:     {count} ({errors} errors)")
+    print(f"  elapsed:      {elapsed:.2f}s")
+    print(f"  throughput:   {count / elapsed:.1f} req/s")
+    print(f"  latency avg:  {statistics.mean(latencies) * 1000:.1f} ms")
+    print(f"  latency p50:  {percentile(0.50):.1f} ms")
+    print(f"  latency p95:  {percentile(0.95):.1f} ms")
+    print(f"  latency p99:  {percentile(0.99):.1f} ms")
+    print(f"  peak threads: {peak_threads}")
+
+
+def run_sync(factory, upstream, path, total, concurrency):
+    """Sync engine: one worker thread per in-flight call (WSGI threads model)"""
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+
+    def one_call(_):
+        request = factory.get(f"/{path}")
+        started = time.perf_counter()
+        response = proxy_request(request, upstream, path, service='benchmark')
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_call, range(total)))
+    elapsed = time.perf_counter() - started
+
+    summarize(f"WSGI proxy_request (sync, {concurrency} threads)", latencies, elapsed, statuses, sampler.peak)
+    pool_manager.close_all()
+
+
+async def run_async(factory, upstream, path, total, concurrency):
+    """Async engine: in-flight calls are bounded by a semaphore on a single thread"""
+    latencies = []
+    statuses = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_call():
+        async with semaphore:
+            request = factory.get(f"/{path}")
+            started = time.perf_counter()
+            response = await async_proxy_request(request, upstream, path, service='benchmark')
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler:
+        await asyncio.gather(*(one_call() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    summarize(f"ASGI async_proxy_request (httpx, concurrency {concurrency})", latencies, elapsed, statuses, sampler.peak)
+    await close_async_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync and async gateway proxy engines')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests per engine')
+    parser.add_argument('--concurrency', type=int, default=200, help='In-flight requests per engine')
+    parser.add_argument('--latency-ms', type=float, default=50, help='Fake upstream latency')
+    parser.add_argument('--upstream', default=None, help='Real upstream base URL (skips the fake upstream)')
+    parser.add_argument('--path', default='api/bins/list/', help='Path requested on the upstream')
+    args = parser.parse_args()
+
+    upstream = args.upstream or start_fake_upstream(args.latency_ms / 1000)
+    factory = RequestFactory()
+
+    print(f"Benchmarking {args.requests} GET {upstream}/{args.path} at concurrency {args.concurrency}")
+
+    run_sync(factory, upstream, args.path, args.requests, args.concurrency)
+    asyncio.run(run_async(factory, upstream, args.path, args.requests, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,5 +7,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gateway.settings')
+os.environ.setdefault('GATEWAY_ASYNC', 'True')  # Serve the async proxy views under ASGI
 
 application = get_asgi_application()
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartbin_common.metrics.HTTPMetricsMiddleware',  # Prometheus request metrics (first, to time everything)
+    'smartbin_common.tracing.TracingMiddleware',  # Starts (or continues) the request's trace
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -110,5 +112,168 @@ BIN_SERVICE_URL = os.environ.get('BIN_SERVICE_URL', 'http://localhost:8002')
 DETECTION_SERVICE_URL = os.environ.get('DETECTION_SERVICE_URL', 'http://localhost:8003')
 RECLAMATION_SERVICE_URL = os.environ.get('RECLAMATION_SERVICE_URL', 'http://localhost:8004')
 
+# Load balancing across service replicas, e.g. BIN_SERVICE_URLS=http://bin_1:8000,http://bin_2:8000
+# (services without a *_SERVICE_URLS list use their single *_SERVICE_URL)
+LOAD_BALANCER = {
+    'STRATEGY': os.environ.get('LOAD_BALANCER_STRATEGY', 'least_outstanding'),  # or round_robin
+    'STRATEGIES': {},  # Per-service strategy, e.g. BIN_LB_STRATEGY=round_robin
+    'EJECT_AFTER_FAILURES': int(os.environ.get('LOAD_BALANCER_EJECT_AFTER_FAILURES', 3)),  # Consecutive failures before an instance is ejected
+    'EJECT_SECONDS': float(os.environ.get('LOAD_BALANCER_EJECT_SECONDS', 30)),  # First ejection; doubles on each repeat
+    'MAX_EJECT_SECONDS': float(os.environ.get('LOAD_BALANCER_MAX_EJECT_SECONDS', 300)),
+    'MAX_EJECTED_PERCENT': int(os.environ.get('LOAD_BALANCER_MAX_EJECTED_PERCENT', 50)),  # Never eject more of a service's instances
+}
+
+SERVICE_INSTANCES = {}
+for _service, _url in (
+    ('auth', AUTH_SERVICE_URL),
+    ('bin', BIN_SERVICE_URL),
+    ('detection', DETECTION_SERVICE_URL),
+    ('reclamation', RECLAMATION_SERVICE_URL),
+):
+    _urls = os.environ.get(f"{_service.upper()}_SERVICE_URLS", '')
+    SERVICE_INSTANCES[_service] = [u.strip().rstrip('/') for u in _urls.split(',') if u.strip()] or [_url]
+    if os.environ.get(f"{_service.upper()}_LB_STRATEGY"):
+        LOAD_BALANCER['STRATEGIES'][_service] = os.environ[f"{_service.upper()}_LB_STRATEGY"]
+
 # Request timeout (seconds)
 SERVICE_TIMEOUT = 30
+
+# Upstream connect / read timeouts (seconds); the read timeout defaults to SERVICE_TIMEOUT
+SERVICE_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_CONNECT_TIMEOUT', 3))
+SERVICE_READ_TIMEOUT = float(os.environ.get('SERVICE_READ_TIMEOUT', SERVICE_TIMEOUT))
+
+# Per-route overrides: (upstream path regex, connect timeout, read timeout), first match wins
+GATEWAY_ROUTE_TIMEOUTS = [
+    (r'^api/bins/list/', 2, 10),
+    (r'^api/bins/qr/', 2, 5),
+    (r'^api/detections/(list|stats)/', 2, 10),
+    (r'^api/auth/(login|token/refresh|profile)/', 2, 10),
+]
+
+# Per-upstream circuit breaker: trips when, over the rolling window (at least MIN_REQUESTS calls),
+# ERROR_RATE of calls fail (timeouts, connection errors, 5xx) or SLOW_CALL_RATE take longer than
+# SLOW_CALL_SECONDS. While open, requests get an immediate 503; after OPEN_SECONDS, HALF_OPEN_PROBES
+# probe calls decide whether to close it again.
+CIRCUIT_BREAKER = {
+    'ENABLED': os.environ.get('CIRCUIT_BREAKER_ENABLED', 'True') == 'True',
+    'WINDOW_SECONDS': int(os.environ.get('CIRCUIT_BREAKER_WINDOW_SECONDS', 30)),
+    'MIN_REQUESTS': int(os.environ.get('CIRCUIT_BREAKER_MIN_REQUESTS', 10)),
+    'ERROR_RATE': float(os.environ.get('CIRCUIT_BREAKER_ERROR_RATE', 0.5)),
+    'SLOW_CALL_SECONDS': float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_SECONDS', 5)),
+    'SLOW_CALL_RATE': float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_RATE', 0.8)),
+    'OPEN_SECONDS': float(os.environ.get('CIRCUIT_BREAKER_OPEN_SECONDS', 15)),
+    'HALF_OPEN_PROBES': int(os.environ.get('CIRCUIT_BREAKER_HALF_OPEN_PROBES', 3)),
+}
+
+# Stream upstream bodies byte-for-byte instead of decoding/re-encoding them as JSON
+PROXY_PASSTHROUGH = os.environ.get('PROXY_PASSTHROUGH', 'True') == 'True'
+PROXY_CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))  # Bytes per streamed chunk
+
+# ASGI deployment mode: proxy views become async and share one httpx.AsyncClient
+# (gateway/asgi.py turns this on; WSGI/runserver keeps the sync proxy)
+GATEWAY_ASYNC = os.environ.get('GATEWAY_ASYNC', 'False') == 'True'
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', 1000))  # Upper bound on in-flight upstream calls
+ASYNC_CLIENT_SHARDS = int(os.environ.get('ASYNC_CLIENT_SHARDS', 64))  # Connection pools the shared client is split into
+
+# Gateway response cache for idempotent GETs
+# locmem: per-process memory, shared: file cache in /dev/shm (shared by all processes on the host),
+# redis: shared across hosts (needs the redis package and GATEWAY_CACHE_LOCATION)
+GATEWAY_CACHE_ENABLED = os.environ.get('GATEWAY_CACHE_ENABLED', 'True') == 'True'
+GATEWAY_CACHE_BACKEND = os.environ.get('GATEWAY_CACHE_BACKEND', 'locmem')
+GATEWAY_CACHE_ALIAS = 'gateway'
+
+_GATEWAY_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartbin-gateway',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('GATEWAY_CACHE_LOCATION', '/dev/shm/smartbin-gateway-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('GATEWAY_CACHE_LOCATION', 'redis://localhost:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    GATEWAY_CACHE_ALIAS: _GATEWAY_CACHE_BACKENDS[GATEWAY_CACHE_BACKEND],
+}
+
+# (upstream path regex, TTL seconds) - only GETs on these routes are cached
+GATEWAY_CACHE_ROUTES = [
+    (r'^api/bins/list/$', 10),
+    (r'^api/detections/list/summary/$', 30),
+    (r'^api/detections/stats/', 30),
+    (r'^api/reclamations/list/stats/$', 30),
+]
+
+# Writes to a service also invalidate services whose data they change: service -> [services].
+# Empty: detection writes only store the detection and its outbox entries; the relay awards
+# points and fills bins later, so cached bin lists expire through their TTL instead
+GATEWAY_CACHE_INVALIDATES = {}
+
+# Gateway-side JWT verification: verified tokens are forwarded with an HMAC-signed
+# X-Gateway-Identity header (shared secret with the services; empty disables it)
+GATEWAY_IDENTITY_SECRET = os.environ.get('GATEWAY_IDENTITY_SECRET', '')
+GATEWAY_IDENTITY_CACHE_SIZE = int(os.environ.get('GATEWAY_IDENTITY_CACHE_SIZE', 10000))  # Verified tokens kept (until exp)
+JWT_SIGNING_KEY = os.environ.get('JWT_SIGNING_KEY', SECRET_KEY)  # Auth service simplejwt key (its SECRET_KEY)
+CLERK_JWKS_URL = os.environ.get('CLERK_JWKS_URL', '')  # e.g. https://<instance>.clerk.accounts.dev/.well-known/jwks.json
+
+# Single-flight coalescing: identical concurrent GETs on these routes share one upstream call
+# (responses are buffered so every waiting client gets a copy; cached routes are always coalesced)
+GATEWAY_COALESCE_ENABLED = os.environ.get('GATEWAY_COALESCE_ENABLED', 'True') == 'True'
+GATEWAY_COALESCE_ROUTES = [
+    r'^api/bins/list/',
+    r'^api/bins/qr/',
+    r'^api/detections/list/',
+    r'^api/detections/stats/',
+    r'^api/reclamations/list/stats/$',
+]
+
+# Batch endpoint (/api/batch/)
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))  # Sub-requests allowed per batch
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 32))  # Threads running sub-requests (WSGI mode)
+
+# Tracing: finished spans are appended as JSON lines here (empty disables the span log)
+TRACE_SPAN_LOG = os.environ.get('TRACE_SPAN_LOG', '')
+TRACE_SERVICE_NAME = 'gateway'  # 'service' of every span the gateway writes
+
+# Upstream connection pooling (keep-alive sessions per service)
+UPSTREAM_POOL = {
+    'POOL_CONNECTIONS': int(os.environ.get('UPSTREAM_POOL_CONNECTIONS', 4)),  # Distinct hosts cached per service
+    'MAX_CONNECTIONS': int(os.environ.get('UPSTREAM_POOL_MAX_CONNECTIONS', 50)),  # Max connections per service
+    'POOL_BLOCK': os.environ.get('UPSTREAM_POOL_BLOCK', 'False') == 'True',  # Wait for a free connection instead of opening extra ones
+    'IDLE_TIMEOUT': float(os.environ.get('UPSTREAM_POOL_IDLE_TIMEOUT', 60)),  # Seconds before an idle pool is recycled
+}
+
+# Per-service overrides, e.g. DETECTION_POOL_MAX_CONNECTIONS=100
+UPSTREAM_POOL_OVERRIDES = {}
+for _service in ('auth', 'bin', 'detection', 'reclamation'):
+    _prefix = f"{_service.upper()}_POOL_"
+    _overrides = {}
+    if os.environ.get(f"{_prefix}MAX_CONNECTIONS"):
+        _overrides['MAX_CONNECTIONS'] = int(os.environ[f"{_prefix}MAX_CONNECTIONS"])
+    if os.environ.get(f"{_prefix}IDLE_TIMEOUT"):
+        _overrides['IDLE_TIMEOUT'] = float(os.environ[f"{_prefix}IDLE_TIMEOUT"])
+    if _overrides:
+        UPSTREAM_POOL_OVERRIDES[_service] = _overrides
+
+# MQTT Configuration (detection stream hub)
+MQTT_BROKER = os.environ.get('MQTT_BROKER', 'localhost')
+MQTT_PORT = int(os.environ.get('MQTT_PORT', 1883))
+MQTT_KEEPALIVE = 60
+
+# Detection SSE stream (fed by the detection service's stored detections, see its MQTT_STREAM_TOPIC)
+STREAM_MQTT_TOPIC = 'bin/+/stored'
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', 100))  # Pending events per client before the oldest is dropped
+STREAM_HEARTBEAT_SECONDS = int(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))  # Keepalive comment interval on idle streams
+STREAM_RETRY_MS = int(os.environ.get('STREAM_RETRY_MS', 3000))  # Reconnect delay suggested to EventSource clients
+STREAM_REPLAY_BUFFER_SIZE = int(os.environ.get('STREAM_REPLAY_BUFFER_SIZE', 50))  # Recent events kept per bin for Last-Event-ID replay
+STREAM_REPLAY_MAX_BINS = int(os.environ.get('STREAM_REPLAY_MAX_BINS', 10000))  # Least recently active bins are evicted beyond this
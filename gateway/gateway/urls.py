@@ -2,6 +2,7 @@
 URL configuration for gateway project.
 Routes to all microservices
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, re_path
 from apps.views import (
@@ -10,8 +11,25 @@ from apps.views import (
     BinProxyView,
     DetectionProxyView,
     ReclamationProxyView,
-    DetectionStreamView
+    AsyncAuthProxyView,
+    AsyncBinProxyView,
+    AsyncDetectionProxyView,
+    AsyncReclamationProxyView,
+    DetectionStreamView,
+    AsyncDetectionStreamView,
+    BatchView,
+    AsyncBatchView
 )
+from smartbin_common.metrics import metrics_view
+
+# ASGI deployment mode uses the async proxy views (shared httpx.AsyncClient)
+if settings.GATEWAY_ASYNC:
+    AuthProxyView = AsyncAuthProxyView
+    BinProxyView = AsyncBinProxyView
+    DetectionProxyView = AsyncDetectionProxyView
+    ReclamationProxyView = AsyncReclamationProxyView
+    DetectionStreamView = AsyncDetectionStreamView
+    BatchView = AsyncBatchView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -19,6 +37,9 @@ urlpatterns = [
     # Gateway health check
     path('health/', HealthCheckView.as_view(), name='health'),
     
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
+    
     # Proxy to Auth Service
     re_path(r'^api/auth/(?P<path>.*)$', AuthProxyView.as_view(), name='auth-proxy'),
     
@@ -31,6 +52,9 @@ urlpatterns = [
     # Proxy to Reclamation Service
     re_path(r'^api/reclamations/(?P<path>.*)$', ReclamationProxyView.as_view(), name='reclamation-proxy'),
     
+    # Batch of sub-requests executed in parallel
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    
     # Real-time detection stream (SSE)
     path('api/stream/detections/', DetectionStreamView.as_view(), name='detection-stream'),
 ]
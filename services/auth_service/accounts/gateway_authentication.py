@@ -0,0 +1,26 @@
+"""
+Gateway identity authentication for auth service
+The shared GatewayIdentityAuthentication, resolving the verified claims to a User
+"""
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed
+from smartbin_common.gateway_authentication import GatewayIdentityAuthentication as BaseGatewayIdentityAuthentication
+from .models import User
+
+
+class GatewayIdentityAuthentication(BaseGatewayIdentityAuthentication):
+    """Authenticate requests that came through the gateway as the User they belong to"""
+
+    def get_user(self, claims):
+        try:
+            # Auth service tokens carry the user's id, Clerk tokens its Clerk id
+            if claims.get('src') == 'clerk':
+                user = User.objects.get(clerk_id=claims['sub'])
+            else:
+                user = User.objects.get(id=claims['sub'])
+        except (User.DoesNotExist, ValidationError, ValueError):
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
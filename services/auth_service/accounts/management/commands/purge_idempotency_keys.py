@@ -0,0 +1,10 @@
+"""
+Management command to delete expired Idempotency-Key records
+Usage: python manage.py purge_idempotency_keys
+"""
+from smartbin_common.idempotency import PurgeIdempotencyKeysCommand
+from accounts.models import IdempotencyRecord
+
+
+class Command(PurgeIdempotencyKeysCommand):
+    model = IdempotencyRecord
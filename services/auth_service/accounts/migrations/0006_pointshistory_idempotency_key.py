@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_rename_qr_code_to_nfc_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointshistory',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Caller-supplied key; an award with a key already in the history is not applied again', max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='request_hash',
+            field=models.CharField(help_text='SHA-256 of the method, path, caller and body', max_length=64),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from smartbin_common.idempotency import IdempotencyRecordBase
 import uuid
 
 
@@ -78,6 +79,13 @@ class PointsHistory(models.Model):
     amount = models.IntegerField()
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     description = models.TextField(blank=True)
+    idempotency_key = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Caller-supplied key; an award with a key already in the history is not applied again"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -87,3 +95,13 @@ class PointsHistory(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.amount} points"
+
+
+class IdempotencyRecord(IdempotencyRecordBase):
+    """Stored response for a request sent with an Idempotency-Key header (see smartbin_common.idempotency)"""
+    
+    class Meta:
+        db_table = 'auth_idempotency_records'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='auth_idempotency_record_unique_key'),
+        ]
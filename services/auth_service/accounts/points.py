@@ -0,0 +1,125 @@
+"""
+Set-based points awards
+Resolves many user identifiers with a few IN queries and applies all awards of a batch
+in one transaction: F() increments for the balances and one bulk insert for the history.
+"""
+import uuid
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import PointsHistory
+
+User = get_user_model()
+
+
+def nfc_code_for(identifier):
+    return identifier if identifier.startswith('SB-') else f"SB-{identifier}"
+
+
+def username_for(identifier):
+    return identifier[3:] if identifier.startswith('SB-') else identifier
+
+
+def resolve_users(identifiers):
+    """
+    Find users for many identifiers, trying UUID, then NFC code, then username
+    (the same order as AddPointsView), with one query per kind of lookup
+
+    Returns:
+        dict: identifier -> User for the identifiers that matched
+    """
+    pending = set(identifiers)
+    resolved = {}
+
+    uuids = {}
+    for identifier in pending:
+        try:
+            uuids[uuid.UUID(str(identifier))] = identifier
+        except (ValueError, AttributeError, TypeError):
+            pass
+    if uuids:
+        for user in User.objects.filter(id__in=uuids):
+            resolved[uuids[user.id]] = user
+        pending -= resolved.keys()
+
+    if pending:
+        by_nfc_code = {nfc_code_for(identifier): identifier for identifier in pending}
+        for user in User.objects.filter(nfc_code__in=by_nfc_code):
+            resolved[by_nfc_code[user.nfc_code]] = user
+        pending -= resolved.keys()
+
+    if pending:
+        by_username = defaultdict(list)
+        for identifier in pending:
+            by_username[username_for(identifier)].append(identifier)
+        for user in User.objects.filter(username__in=by_username):
+            for identifier in by_username[user.username]:
+                resolved[identifier] = user
+
+    return resolved
+
+
+def add_points_batch(items):
+    """
+    Apply many awards at once
+
+    Args:
+        items: Validated dicts with user_id, amount and optional description / idempotency_key
+
+    Returns:
+        list: One result per item, in order, with a status of
+              'added', 'duplicate' (key already applied) or 'not_found'
+    """
+    users = resolve_users({item['user_id'] for item in items})
+
+    keys = {item['idempotency_key'] for item in items if item.get('idempotency_key')}
+    applied_keys = set(
+        PointsHistory.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True)
+    ) if keys else set()
+
+    results = []
+    history = []
+    totals = defaultdict(int)  # user pk -> points to add
+    for item in items:
+        key = item.get('idempotency_key') or None
+        user = users.get(item['user_id'])
+        result = {'user_id': item['user_id'], 'idempotency_key': key, 'points_added': 0}
+        if user is None:
+            result['status'] = 'not_found'
+        elif key in applied_keys:
+            result['status'] = 'duplicate'
+        else:
+            if key:
+                applied_keys.add(key)  # Repeated keys inside one batch count once as well
+            result['status'] = 'added'
+            result['points_added'] = item['amount']
+            totals[user.pk] += item['amount']
+            history.append(PointsHistory(
+                user=user,
+                amount=item['amount'],
+                transaction_type='earned',
+                description=item.get('description') or 'Points earned',
+                idempotency_key=key
+            ))
+        results.append(result)
+
+    if history:
+        # One UPDATE per distinct total (usually a handful), all in one transaction.
+        # The unique idempotency_key rolls the whole batch back if a concurrent batch applied a key first.
+        users_by_total = defaultdict(list)
+        for pk, total in totals.items():
+            users_by_total[total].append(pk)
+        now = timezone.now()
+        with transaction.atomic():
+            PointsHistory.objects.bulk_create(history)
+            for total, pks in users_by_total.items():
+                User.objects.filter(pk__in=pks).update(points=F('points') + total, updated_at=now)
+
+    balances = dict(User.objects.filter(pk__in=[user.pk for user in users.values()]).values_list('pk', 'points'))
+    for result in results:
+        user = users.get(result['user_id'])
+        if user is not None:
+            result['total_points'] = balances.get(user.pk)
+    return results
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from .models import PointsHistory
 
@@ -89,3 +90,23 @@ class AddPointsSerializer(serializers.Serializer):
         # Don't validate here - let the view handle all lookups
         # This allows flexibility for NFC codes and usernames
         return value
+
+
+class AddPointsBatchItemSerializer(AddPointsSerializer):
+    """One award in a batch"""
+    idempotency_key = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        max_length=100,
+        help_text="Awards whose key was already applied are skipped (e.g. the detection id)"
+    )
+
+
+class AddPointsBatchSerializer(serializers.Serializer):
+    """Serializer for adding points to many users at once"""
+    items = AddPointsBatchItemSerializer(many=True, allow_empty=False)
+    
+    def validate_items(self, value):
+        if len(value) > settings.POINTS_BATCH_MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {settings.POINTS_BATCH_MAX_ITEMS} items per batch")
+        return value
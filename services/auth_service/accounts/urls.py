@@ -7,6 +7,7 @@ from .views import (
     UserDetailView,
     UserByClerkIdView,
     AddPointsView,
+    AddPointsBatchView,
     PointsHistoryView,
     HealthCheckView,
     ClerkSyncView,
@@ -25,6 +26,7 @@ urlpatterns = [
     
     # Points Management
     path('points/add/', AddPointsView.as_view(), name='add_points'),
+    path('points/add-batch/', AddPointsBatchView.as_view(), name='add_points_batch'),
     path('points/history/', PointsHistoryView.as_view(), name='points_history'),
     
     # Clerk Integration
@@ -3,14 +3,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate, get_user_model
-from .models import PointsHistory
+from django.db import IntegrityError
+from .models import IdempotencyRecord, PointsHistory
 from .serializers import (
     UserSerializer, 
     UserRegistrationSerializer, 
     UserLoginSerializer,
     PointsHistorySerializer,
-    AddPointsSerializer
+    AddPointsSerializer,
+    AddPointsBatchSerializer
 )
+from .points import add_points_batch
+from smartbin_common.idempotency import idempotent
 
 User = get_user_model()
 
@@ -104,9 +108,16 @@ class UserByClerkIdView(APIView):
 
 
 class AddPointsView(APIView):
-    """Add points to a user (called by detection service)"""
+    """
+    Add points to a user (called by detection service)
+    Send an Idempotency-Key header (e.g. the detection id) to make retries safe
+    That header is the only dedup here; /points/add-batch/ items carry their own
+    idempotency_key (kept on PointsHistory) instead. The two are separate namespaces,
+    so an award has to be retried on the endpoint it was first sent to.
+    """
     permission_classes = [permissions.AllowAny]  # Allow microservice-to-microservice communication
     
+    @idempotent('add_points', IdempotencyRecord)
     def post(self, request):
         import logging
         logger = logging.getLogger(__name__)
@@ -210,6 +221,46 @@ class AddPointsView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AddPointsBatchView(APIView):
+    """
+    Add points to many users in one request (called by detection service)
+    POST /api/auth/points/add-batch/ {"items": [{user_id, amount, description, idempotency_key}, ...]}
+    Each item's idempotency_key is checked against PointsHistory, not against the
+    Idempotency-Key headers of /points/add/ (see AddPointsView)
+    """
+    permission_classes = [permissions.AllowAny]  # Allow microservice-to-microservice communication
+    
+    def post(self, request):
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        serializer = AddPointsBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"❌ Batch validation failed: {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = serializer.validated_data['items']
+        try:
+            results = add_points_batch(items)
+        except IntegrityError:
+            # Another request applied one of the idempotency keys meanwhile; nothing was applied here
+            logger.warning(f"⚠️  Points batch of {len(items)} items raced on an idempotency key, rolled back")
+            return Response({
+                'error': 'An idempotency key in this batch was applied concurrently, retry the batch'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        logger.info(f"💰 Points batch of {len(items)} items applied: {counts}")
+        
+        return Response({
+            'message': 'Points batch processed',
+            'counts': counts,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
 class PointsHistoryView(generics.ListAPIView):
     """Get points history for current user"""
     serializer_class = PointsHistorySerializer
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartbin_common.metrics.MetricsMiddleware',  # Prometheus request/DB metrics (first, to time everything)
+    'smartbin_common.tracing.TracingMiddleware',  # Continues the caller's trace (traceparent header)
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -123,7 +125,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.gateway_authentication.GatewayIdentityAuthentication',  # Identity verified by the gateway
+        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Direct calls
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -158,6 +161,20 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Shared secret for the gateway's signed X-Gateway-Identity header (empty disables it)
+GATEWAY_IDENTITY_SECRET = os.environ.get('GATEWAY_IDENTITY_SECRET', '')
+
+# Tracing: finished spans are appended as JSON lines here (empty disables the span log)
+TRACE_SPAN_LOG = os.environ.get('TRACE_SPAN_LOG', '')
+TRACE_SERVICE_NAME = 'auth_service'  # 'service' of every span this service writes
+
+# Idempotency-Key handling (points/add)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))  # How long a key's response is replayed
+IDEMPOTENCY_PURGE_PROBABILITY = float(os.environ.get('IDEMPOTENCY_PURGE_PROBABILITY', 0.01))  # Share of requests that also purge expired keys
+
+# Bulk points endpoint (/api/auth/points/add-batch/)
+POINTS_BATCH_MAX_ITEMS = int(os.environ.get('POINTS_BATCH_MAX_ITEMS', 500))  # Awards accepted per request
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 CORS_ALLOW_CREDENTIALS = True
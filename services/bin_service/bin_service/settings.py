@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartbin_common.metrics.MetricsMiddleware',  # Prometheus request/DB metrics (first, to time everything)
+    'smartbin_common.tracing.TracingMiddleware',  # Continues the caller's trace (traceparent header)
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,7 +114,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'bins.clerk_authentication.ClerkAuthentication',  # Try Clerk first
+        'smartbin_common.gateway_authentication.GatewayIdentityAuthentication',  # Identity verified by the gateway
+        'bins.clerk_authentication.ClerkAuthentication',  # Direct calls: try Clerk first
         'bins.authentication.BinServiceJWTAuthentication',  # Fallback to Django JWT
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -125,6 +128,20 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Shared secret for the gateway's signed X-Gateway-Identity header (empty disables it)
+GATEWAY_IDENTITY_SECRET = os.environ.get('GATEWAY_IDENTITY_SECRET', '')
+
+# Tracing: finished spans are appended as JSON lines here (empty disables the span log)
+TRACE_SPAN_LOG = os.environ.get('TRACE_SPAN_LOG', '')
+TRACE_SERVICE_NAME = 'bin_service'  # 'service' of every span this service writes
+
+# Idempotency-Key handling (add-trash)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))  # How long a key's response is replayed
+IDEMPOTENCY_PURGE_PROBABILITY = float(os.environ.get('IDEMPOTENCY_PURGE_PROBABILITY', 0.01))  # Share of requests that also purge expired keys
+
+# Bulk add-trash endpoint (/api/bins/list/add-trash-batch/)
+TRASH_BATCH_MAX_ITEMS = int(os.environ.get('TRASH_BATCH_MAX_ITEMS', 1000))  # Deposits accepted per request
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -133,3 +150,5 @@ CORS_ALLOW_CREDENTIALS = True
 MQTT_BROKER = os.environ.get('MQTT_BROKER', 'localhost')
 MQTT_PORT = int(os.environ.get('MQTT_PORT', 1883))
 MQTT_KEEPALIVE = 60
+# Publish bin commands in the compact binary format on bin/{id}/{command}/v2 (bins must subscribe there)
+MQTT_COMPACT_COMMANDS = os.environ.get('MQTT_COMPACT_COMMANDS', 'False') == 'True'
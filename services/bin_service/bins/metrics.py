@@ -0,0 +1,21 @@
+"""
+Prometheus metrics for bin service
+MQTT publish counters; the request and database metrics come from smartbin_common.metrics.
+Exposed at /metrics.
+"""
+from prometheus_client import Counter
+
+MQTT_MESSAGES_PUBLISHED = Counter(
+    'mqtt_messages_published_total',
+    'MQTT bin commands handed to the client (result: sent, failed, error)',
+    ['command', 'result']
+)
+MQTT_MESSAGES_ACKNOWLEDGED = Counter(
+    'mqtt_messages_acknowledged_total',
+    'MQTT publishes confirmed by the broker'
+)
+MQTT_CONNECTION_EVENTS = Counter(
+    'mqtt_connection_events_total',
+    'MQTT connection state changes (connected, connect_failed, disconnected)',
+    ['event']
+)
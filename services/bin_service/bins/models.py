@@ -1,4 +1,5 @@
 from django.db import models
+from smartbin_common.idempotency import IdempotencyRecordBase
 import uuid
 import random
 import string
@@ -68,25 +69,30 @@ class Bin(models.Model):
         # Handle status changes and fill_level synchronization
         if self.pk:  # Only for existing bins (updates)
             try:
-                old_bin = Bin.objects.get(pk=self.pk)
-                old_status = old_bin.status
-                
-                # If status changed FROM "full" to something else, reset fill_level to 0
-                if old_status == 'full' and self.status != 'full':
-                    self.fill_level = 0
-                # If status changed TO "full", set fill_level to 100
-                elif self.status == 'full' and old_status != 'full':
-                    self.fill_level = 100
+                old_status = Bin.objects.get(pk=self.pk).status
             except Bin.DoesNotExist:
                 # Shouldn't happen, but handle gracefully
-                pass
+                old_status = self.status
         else:
-            # For new bins, set fill_level based on initial status
-            if self.status == 'full':
-                self.fill_level = 100
+            old_status = None  # New bins: fill_level follows the initial status
+        self.fill_level = Bin.fill_level_for_status(self.fill_level, old_status, self.status)
         
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def fill_level_for_status(fill_level, old_status, new_status):
+        """
+        Fill level after a status change (old_status is None for a new bin)
+        - If status changes TO "full": set fill_level to 100%
+        - If status changes FROM "full" to anything else: reset fill_level to 0%
+        Used by save() and by fill_after_trash, so bulk updates follow the same rule
+        """
+        if old_status == 'full' and new_status != 'full':
+            return 0
+        if new_status == 'full' and old_status != 'full':
+            return 100
+        return fill_level
+    
     def __str__(self):
         return f"{self.name} ({self.location})"
     
@@ -116,6 +122,31 @@ class Bin(models.Model):
         
         self.save(update_fields=['fill_level', 'status', 'updated_at'])
     
+    @staticmethod
+    def fill_after_trash(fill_level, status, capacity, liters):
+        """
+        Fill level and status after adding liters of trash
+        Shared by add_trash and the batch add-trash endpoint
+        Returns (fill_level, status, has_room); has_room is False once the bin reaches 100%
+        """
+        # Calculate percentage increase
+        percentage_increase = int((liters / capacity) * 100)
+        new_fill_level = fill_level + percentage_increase
+        
+        # Check if bin would be full
+        if new_fill_level >= 100:
+            return 100, 'full', False
+        
+        # Update status based on fill level
+        new_status = status
+        if new_fill_level >= 90:
+            new_status = 'full'
+        elif status == 'full' and new_fill_level < 80:
+            new_status = 'active'
+        # The status change adjusts the fill level like save() does (e.g. becoming full -> 100%)
+        new_fill_level = Bin.fill_level_for_status(new_fill_level, status, new_status)
+        return new_fill_level, new_status, True
+    
     def add_trash(self, liters=5.0):
         """
         Add trash to the bin and update fill level
@@ -123,27 +154,48 @@ class Bin(models.Model):
         Calculates percentage based on liters and capacity
         Returns True if successful, False if bin is full
         """
-        # Calculate percentage increase
-        percentage_increase = int((liters / self.capacity) * 100)
-        new_fill_level = self.fill_level + percentage_increase
+        self.fill_level, self.status, has_room = Bin.fill_after_trash(
+            self.fill_level, self.status, self.capacity, liters
+        )
+        self.save(update_fields=['fill_level', 'status', 'updated_at'])
+        return has_room  # False: bin is now full
+    
+    @classmethod
+    def add_trash_batch(cls, liters_by_bin):
+        """
+        Add trash to many bins in one transaction (one locking SELECT and one bulk UPDATE)
+        Applies the same fill level and status transitions as add_trash to each bin's total
         
-        # Check if bin would be full
-        if new_fill_level >= 100:
-            self.fill_level = 100
-            self.status = 'full'
-            self.save(update_fields=['fill_level', 'status', 'updated_at'])
-            return False  # Bin is now full
-        else:
-            self.fill_level = new_fill_level
-            
-            # Update status based on fill level
-            if self.fill_level >= 90:
-                self.status = 'full'
-            elif self.status == 'full' and self.fill_level < 80:
-                self.status = 'active'
-            
-            self.save(update_fields=['fill_level', 'status', 'updated_at'])
-            return True
+        Args:
+            liters_by_bin: {bin UUID: total liters to add}
+        
+        Returns:
+            dict: bin UUID -> (bin, previous_fill_level, has_room) for the bins that exist
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        
+        results = {}
+        with transaction.atomic():
+            bins = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=liters_by_bin.keys())
+                .only('id', 'capacity', 'fill_level', 'status', 'updated_at')
+            )
+            now = timezone.now()
+            for bin_instance in bins:
+                previous_fill_level = bin_instance.fill_level
+                bin_instance.fill_level, bin_instance.status, has_room = cls.fill_after_trash(
+                    bin_instance.fill_level,
+                    bin_instance.status,
+                    bin_instance.capacity,
+                    float(liters_by_bin[bin_instance.pk])
+                )
+                bin_instance.updated_at = now  # bulk_update skips auto_now
+                results[bin_instance.pk] = (bin_instance, previous_fill_level, has_room)
+            if bins:
+                cls.objects.bulk_update(bins, ['fill_level', 'status', 'updated_at'])
+        return results
     
     def increase_capacity(self, additional_liters=10):
         """
@@ -200,3 +252,13 @@ class BinUsageLog(models.Model):
         self.closed_at = timezone.now()
         self.detection_completed = True
         self.save(update_fields=['closed_at', 'detection_completed'])
+
+
+class IdempotencyRecord(IdempotencyRecordBase):
+    """Stored response for a request sent with an Idempotency-Key header (see smartbin_common.idempotency)"""
+    
+    class Meta:
+        db_table = 'bin_idempotency_records'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='bin_idempotency_record_unique_key'),
+        ]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from .models import Bin, BinUsageLog
 
 
@@ -131,3 +132,18 @@ class AddTrashSerializer(serializers.Serializer):
         default=5.0,
         help_text="Liters of trash to add (default: 5.0L per deposit)"
     )
+
+
+class AddTrashBatchItemSerializer(AddTrashSerializer):
+    """One bin's deposit in a batch"""
+    bin_id = serializers.UUIDField()
+
+
+class AddTrashBatchSerializer(serializers.Serializer):
+    """Serializer for adding trash to many bins at once"""
+    items = AddTrashBatchItemSerializer(many=True, allow_empty=False)
+    
+    def validate_items(self, value):
+        if len(value) > settings.TRASH_BATCH_MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {settings.TRASH_BATCH_MAX_ITEMS} items per batch")
+        return value
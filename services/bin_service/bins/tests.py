@@ -0,0 +1,36 @@
+"""
+Tests for the bin service
+Run with: python manage.py test bins
+"""
+from django.test import TestCase
+from .models import Bin
+
+
+class AddTrashTests(TestCase):
+    """add_trash and add_trash_batch apply the same fill level and status transitions"""
+
+    def make_bin(self, fill_level, status='active'):
+        bin_instance = Bin.objects.create(name='Test bin', location='Test', capacity=100, status=status)
+        Bin.objects.filter(pk=bin_instance.pk).update(fill_level=fill_level)
+        return bin_instance.pk
+
+    def after_single(self, fill_level, liters, status='active'):
+        bin_instance = Bin.objects.get(pk=self.make_bin(fill_level, status))
+        has_room = bin_instance.add_trash(liters)
+        bin_instance = Bin.objects.get(pk=bin_instance.pk)
+        return bin_instance.fill_level, bin_instance.status, has_room
+
+    def after_batch(self, fill_level, liters, status='active'):
+        pk = self.make_bin(fill_level, status)
+        _, _, has_room = Bin.add_trash_batch({pk: liters})[pk]
+        bin_instance = Bin.objects.get(pk=pk)
+        return bin_instance.fill_level, bin_instance.status, has_room
+
+    def test_batch_matches_single_around_the_full_threshold(self):
+        for fill_level, liters in [(80, 5), (85, 4), (85, 5), (85, 7), (89, 1), (95, 10)]:
+            with self.subTest(fill_level=fill_level, liters=liters):
+                self.assertEqual(self.after_batch(fill_level, liters), self.after_single(fill_level, liters))
+
+    def test_bin_that_becomes_full_is_stored_at_100(self):
+        self.assertEqual(self.after_batch(85, 7), (100, 'full', True))
+        self.assertEqual(self.after_single(85, 7), (100, 'full', True))
@@ -3,7 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from .models import Bin, BinUsageLog
+from collections import defaultdict
+from decimal import Decimal
+from .models import Bin, BinUsageLog, IdempotencyRecord
 from .serializers import (
     BinSerializer,
     BinUsageLogSerializer,
@@ -11,9 +13,11 @@ from .serializers import (
     CloseBinSerializer,
     UpdateFillLevelSerializer,
     IncrementFillLevelSerializer,
-    AddTrashSerializer
+    AddTrashSerializer,
+    AddTrashBatchSerializer
 )
 from .permissions import IsAdminOrReadOnly
+from smartbin_common.idempotency import idempotent
 from mqtt.mqtt_client import mqtt_client
 import logging
 
@@ -258,11 +262,13 @@ class BinViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['post'], url_path='add-trash', permission_classes=[permissions.AllowAny])
+    @idempotent('add_trash', IdempotencyRecord)
     def add_trash(self, request, id=None, **kwargs):
         """
         Add trash to bin (converts liters to percentage)
         POST /api/bins/list/{id}/add-trash/
         Body: {"liters": 5.0}
+        Send an Idempotency-Key header (e.g. the detection id) to make retries safe
         Note: AllowAny for IoT sensors, Detection Service, and automated systems
         """
         bin_instance = self.get_object()
@@ -323,6 +329,55 @@ class BinViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    
+    @action(detail=False, methods=['post'], url_path='add-trash-batch', permission_classes=[permissions.AllowAny])
+    def add_trash_batch(self, request):
+        """
+        Add trash to many bins at once (liters are summed per bin)
+        POST /api/bins/list/add-trash-batch/
+        Body: {"items": [{"bin_id": "uuid", "liters": 5.0}, ...]}
+        Note: AllowAny for IoT sensors, Detection Service, and automated systems
+        """
+        serializer = AddTrashBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        liters_by_bin = defaultdict(Decimal)
+        deposits = defaultdict(int)
+        for item in serializer.validated_data['items']:
+            liters_by_bin[item['bin_id']] += item['liters']
+            deposits[item['bin_id']] += 1
+        
+        updated = Bin.add_trash_batch(liters_by_bin)
+        
+        results = []
+        for bin_id, liters in liters_by_bin.items():
+            if bin_id not in updated:
+                results.append({'bin_id': str(bin_id), 'result': 'not_found', 'liters_added': 0})
+                continue
+            bin_instance, previous_fill_level, has_room = updated[bin_id]
+            results.append({
+                'bin_id': str(bin_id),
+                'result': 'added' if has_room else 'full',
+                'deposits': deposits[bin_id],
+                'liters_added': float(liters),
+                'capacity': bin_instance.capacity,
+                'previous_fill_level': previous_fill_level,
+                'fill_level': bin_instance.fill_level,
+                'current_capacity_used': round((bin_instance.fill_level / 100) * bin_instance.capacity, 1),
+                'status': bin_instance.status,
+            })
+        
+        full = [result['bin_id'] for result in results if result['result'] == 'full']
+        logger.info(f"🗑️ Trash batch applied to {len(updated)} bins ({len(serializer.validated_data['items'])} deposits)")
+        if full:
+            logger.warning(f"⚠️ Bins now full: {', '.join(full)}")
+        
+        return Response({
+            'message': 'Trash batch processed',
+            'results': results
+        }, status=status.HTTP_200_OK)
+
 
 class BinUsageLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
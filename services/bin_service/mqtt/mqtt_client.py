@@ -7,6 +7,9 @@ import paho.mqtt.client as mqtt
 import json
 import logging
 from django.conf import settings
+from bins.metrics import MQTT_MESSAGES_PUBLISHED, MQTT_MESSAGES_ACKNOWLEDGED, MQTT_CONNECTION_EVENTS
+from smartbin_common.mqtt_codec import compact_topic, encode_command
+from smartbin_common.tracing import current_traceparent
 
 # Configure logger
 logging.basicConfig(level=logging.INFO)
@@ -31,19 +34,23 @@ class BinMQTTClient:
         """Callback when connected to MQTT broker"""
         if rc == 0:
             self.connected = True
+            MQTT_CONNECTION_EVENTS.labels('connected').inc()
             logger.info(f"Connected to MQTT broker at {self.broker}:{self.port}")
         else:
             self.connected = False
+            MQTT_CONNECTION_EVENTS.labels('connect_failed').inc()
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
     
     def _on_disconnect(self, client, userdata, rc):
         """Callback when disconnected from MQTT broker"""
         self.connected = False
+        MQTT_CONNECTION_EVENTS.labels('disconnected').inc()
         if rc != 0:
             logger.warning(f"Unexpected disconnection from MQTT broker. Return code: {rc}")
     
     def _on_publish(self, client, userdata, mid):
         """Callback when message is published"""
+        MQTT_MESSAGES_ACKNOWLEDGED.inc()
         logger.debug(f"Message published with mid: {mid}")
     
     def connect(self):
@@ -62,7 +69,7 @@ class BinMQTTClient:
         self.client.disconnect()
         self.connected = False
     
-    def publish_bin_command(self, bin_id, command, user_nfc_code=None):
+    def publish_bin_command(self, bin_id, command, user_nfc_code=None, compact=None):
         """
         Publish bin command to MQTT
         
@@ -70,7 +77,11 @@ class BinMQTTClient:
             bin_id: UUID of the bin
             command: 'open' or 'close'
             user_nfc_code: NFC code of user (for open command)
+            compact: Publish the compact binary payload on bin/{id}/{command}/v2
+                     (default: MQTT_COMPACT_COMMANDS)
         """
+        if compact is None:
+            compact = settings.MQTT_COMPACT_COMMANDS
         topic = f"bin/{bin_id}/{command}"
         
         payload = {
@@ -82,24 +93,37 @@ class BinMQTTClient:
         if user_nfc_code and command == 'open':
             payload["user_nfc_code"] = user_nfc_code
         
+        # Node-RED echoes this back in the detected event so the deposit joins the request's trace
+        traceparent = current_traceparent()
+        if traceparent:
+            payload["traceparent"] = traceparent
+        
         try:
             if not self.connected:
                 self.connect()
             
+            if compact:
+                topic = compact_topic(topic)
+                message = encode_command(payload)
+            else:
+                message = json.dumps(payload)
             result = self.client.publish(
                 topic,
-                json.dumps(payload),
+                message,
                 qos=1
             )
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                MQTT_MESSAGES_PUBLISHED.labels(command, 'sent').inc()
                 logger.info(f"Published {command} command for bin {bin_id} to topic: {topic}")
                 return True
             else:
+                MQTT_MESSAGES_PUBLISHED.labels(command, 'failed').inc()
                 logger.error(f"Failed to publish message. Error code: {result.rc}")
                 return False
         
         except Exception as e:
+            MQTT_MESSAGES_PUBLISHED.labels(command, 'error').inc()
             logger.error(f"Error publishing to MQTT: {e}")
             return False
     
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MaterialDetection, DetectionStats
+from .models import MaterialDetection, DetectionStats, DetectionRollup, OutboxEntry, DeadLetterMessage
 
 
 @admin.register(MaterialDetection)
@@ -29,3 +29,30 @@ class DetectionStatsAdmin(admin.ModelAdmin):
     list_filter = ['date']
     readonly_fields = ['updated_at']
     ordering = ['-date']
+
+
+@admin.register(DetectionRollup)
+class DetectionRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'bin_id', 'material_type', 'detections', 'points']
+    list_filter = ['material_type', 'hour']
+    search_fields = ['bin_id']
+    readonly_fields = ['updated_at']
+    ordering = ['-hour']
+
+
+@admin.register(OutboxEntry)
+class OutboxEntryAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'detection', 'status', 'attempts', 'next_attempt_at', 'created_at', 'delivered_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['id', 'detection__id', 'last_error']
+    readonly_fields = ['id', 'detection', 'created_at', 'delivered_at', 'traceparent']
+    ordering = ['-created_at']
+
+
+@admin.register(DeadLetterMessage)
+class DeadLetterMessageAdmin(admin.ModelAdmin):
+    list_display = ['message_key', 'topic', 'status', 'attempts', 'created_at', 'replayed_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['message_key', 'topic']
+    readonly_fields = ['id', 'message_key', 'topic', 'payload', 'attempts', 'created_at', 'replayed_at']
+    ordering = ['-created_at']
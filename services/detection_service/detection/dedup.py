@@ -0,0 +1,70 @@
+"""
+Bounded index of recently seen detection events
+Bins and Node-RED resend detections. Keeping the last DETECTION_DEDUP_CACHE_SIZE event
+keys of this process lets the consumer and the simulate endpoint drop a resend before
+any database or HTTP work. Keys it has forgotten (or that another process saw) are
+caught by the unique MaterialDetection.message_key instead.
+"""
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+PENDING = 'pending'  # Being stored
+STORED = 'stored'
+
+
+def event_key(bin_id, event_id):
+    """
+    Dedup key of a publisher-supplied event_id, scoped to its bin: event ids are only
+    unique per bin, so another bin reusing one must not have its deposit dropped.
+    A SHA-256 hex digest, so it fits MaterialDetection.message_key (64 characters).
+    """
+    try:
+        bin_id = uuid.UUID(str(bin_id).strip())
+    except ValueError:
+        pass  # Rejected later as an invalid detection; the key only has to be stable
+    return hashlib.sha256(f"{bin_id}:{event_id}".encode('utf-8')).hexdigest()
+
+
+class RecentKeys:
+    """Thread-safe LRU of event keys, each pending or stored"""
+
+    def __init__(self, size=100000):
+        self.size = size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """
+        Start handling an event
+
+        Returns:
+            None if the key is new (it is now pending), else its state: PENDING or STORED
+        """
+        with self._lock:
+            state = self._keys.get(key)
+            if state is not None:
+                self._keys.move_to_end(key)
+                return state
+            self._set(key, PENDING)
+            return None
+
+    def mark_stored(self, key):
+        with self._lock:
+            self._set(key, STORED)
+
+    def release(self, key):
+        """Forget a pending key whose event was not stored, so a resend is handled again"""
+        with self._lock:
+            if self._keys.get(key) == PENDING:
+                del self._keys[key]
+
+    def _set(self, key, state):
+        self._keys[key] = state
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,59 @@
+"""
+Management command to rebuild the hourly rollups from material_detections
+Usage: python manage.py backfill_rollups
+       python manage.py backfill_rollups --since 2025-01-01 [--until 2025-02-01]
+"""
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from detection.models import DetectionRollup, MaterialDetection
+from detection.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly detection rollups (per bin and material) from the detections table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD, default: the first detection)')
+        parser.add_argument(
+            '--until',
+            help='Day to stop before (YYYY-MM-DD, default: the start of the current hour, '
+                 'which the consumer is still counting)'
+        )
+
+    def handle(self, *args, **options):
+        end = self.parse_day(options['until']) if options['until'] else DetectionRollup.hour_of(timezone.now())
+        if options['since']:
+            start = self.parse_day(options['since'])
+        else:
+            first = MaterialDetection.objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                self.stdout.write(self.style.SUCCESS('\nNo detections, nothing to rebuild.\n'))
+                return
+            start = DetectionRollup.hour_of(first)
+        if start >= end:
+            raise CommandError('--since must be before --until')
+
+        self.stdout.write(self.style.WARNING(f'\nRebuilding rollups from {start} to {end}...'))
+        self.stdout.write('-' * 80)
+
+        # One day per transaction keeps each rebuild (and its locks) small
+        total = 0
+        day_start = start
+        while day_start < end:
+            day_end = min(day_start + timedelta(days=1), end)
+            buckets = rebuild(day_start, day_end)
+            total += buckets
+            self.stdout.write(self.style.SUCCESS(f'✅ {day_start:%Y-%m-%d %H:%M} → {day_end:%Y-%m-%d %H:%M}: {buckets} bucket(s)'))
+            day_start = day_end
+
+        self.stdout.write('-' * 80)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Backfill complete! Wrote {total} bucket(s).\n'))
+
+    def parse_day(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+        return timezone.make_aware(day)
@@ -0,0 +1,76 @@
+"""
+Management command to inspect and replay detection messages the MQTT consumer gave up on
+Usage: python manage.py dead_letters list [--status dead] [--limit 50]
+       python manage.py dead_letters replay <id> [<id> ...]
+       python manage.py dead_letters replay --all-dead
+Replaying publishes the original payload to its topic again, so the consumers store it
+like any other detection (a message that was stored meanwhile is dropped as a resend).
+"""
+import os
+import uuid
+import paho.mqtt.client as mqtt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from detection.models import DeadLetterMessage
+
+
+class Command(BaseCommand):
+    help = 'Inspect and replay detection messages the MQTT consumer gave up on'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        list_parser = subparsers.add_parser('list', help='Show dead letters, newest first')
+        list_parser.add_argument('--status', choices=['dead', 'replayed'])
+        list_parser.add_argument('--limit', type=int, default=50)
+
+        replay_parser = subparsers.add_parser('replay', help='Publish messages to their topic again')
+        replay_parser.add_argument('message_ids', nargs='*')
+        replay_parser.add_argument('--all-dead', action='store_true', help='Replay every dead letter')
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_list(self, options):
+        messages = DeadLetterMessage.objects.order_by('-created_at')
+        if options['status']:
+            messages = messages.filter(status=options['status'])
+
+        self.stdout.write('-' * 80)
+        for message in messages[:options['limit']]:
+            style = self.style.ERROR if message.status == 'dead' else self.style.SUCCESS
+            self.stdout.write(style(
+                f"{message.id}  {message.status:<9} attempts={message.attempts} "
+                f"created={message.created_at:%Y-%m-%d %H:%M:%S}"
+            ))
+            self.stdout.write(f"    key={message.message_key} topic={message.topic}")
+        self.stdout.write('-' * 80)
+
+    def handle_replay(self, options):
+        if options['all_dead']:
+            messages = DeadLetterMessage.objects.filter(status='dead')
+        elif options['message_ids']:
+            messages = DeadLetterMessage.objects.filter(pk__in=options['message_ids'])
+        else:
+            raise CommandError('Give message ids or --all-dead')
+
+        client_id = f"detection_replay-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        client.connect(settings.MQTT_BROKER, settings.MQTT_PORT, keepalive=settings.MQTT_KEEPALIVE)
+        client.loop_start()
+        count = 0
+        try:
+            for message in messages:
+                info = client.publish(message.topic, bytes(message.payload), qos=1)
+                info.wait_for_publish(timeout=10)
+                if not info.is_published():
+                    raise CommandError(f'Broker did not confirm message {message.id}, {count} replayed so far')
+                message.status = 'replayed'
+                message.replayed_at = timezone.now()
+                message.save(update_fields=['status', 'replayed_at'])
+                count += 1
+        finally:
+            client.loop_stop()
+            client.disconnect()
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {count} dead letter(s) published again\n'))
@@ -0,0 +1,73 @@
+"""
+Management command to inspect and replay outbox entries
+Usage: python manage.py outbox stats
+       python manage.py outbox list [--status dead] [--kind add_points] [--limit 50]
+       python manage.py outbox replay <entry_id> [<entry_id> ...]
+       python manage.py outbox replay --all-dead [--kind add_trash]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from detection.models import OutboxEntry
+from detection.outbox import replay
+
+
+class Command(BaseCommand):
+    help = 'Inspect outbox entries and replay failed (dead-letter) deliveries'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        subparsers.add_parser('stats', help='Entry counts per kind and status')
+
+        list_parser = subparsers.add_parser('list', help='Show entries, newest first')
+        list_parser.add_argument('--status', choices=['pending', 'delivered', 'dead'])
+        list_parser.add_argument('--kind', choices=['add_points', 'add_trash'])
+        list_parser.add_argument('--limit', type=int, default=50)
+
+        replay_parser = subparsers.add_parser('replay', help='Make entries due again with a fresh attempt budget')
+        replay_parser.add_argument('entry_ids', nargs='*')
+        replay_parser.add_argument('--all-dead', action='store_true', help='Replay every dead-letter entry')
+        replay_parser.add_argument('--kind', choices=['add_points', 'add_trash'])
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_stats(self, options):
+        counts = OutboxEntry.objects.values('kind', 'status').annotate(count=Count('id')).order_by('kind', 'status')
+        self.stdout.write('-' * 80)
+        for row in counts:
+            style = self.style.ERROR if row['status'] == 'dead' else self.style.SUCCESS
+            self.stdout.write(style(f"{row['kind']:<12} {row['status']:<10} {row['count']:>8}"))
+        self.stdout.write('-' * 80)
+
+    def handle_list(self, options):
+        entries = OutboxEntry.objects.order_by('-created_at')
+        if options['status']:
+            entries = entries.filter(status=options['status'])
+        if options['kind']:
+            entries = entries.filter(kind=options['kind'])
+
+        self.stdout.write('-' * 80)
+        for entry in entries[:options['limit']]:
+            style = self.style.ERROR if entry.status == 'dead' else self.style.SUCCESS
+            self.stdout.write(style(
+                f"{entry.id}  {entry.kind:<10} {entry.status:<9} attempts={entry.attempts} "
+                f"created={entry.created_at:%Y-%m-%d %H:%M:%S} next={entry.next_attempt_at:%H:%M:%S}"
+            ))
+            self.stdout.write(f"    detection={entry.detection_id} payload={entry.payload}")
+            if entry.last_error:
+                self.stdout.write(f"    last error: {entry.last_error}")
+        self.stdout.write('-' * 80)
+
+    def handle_replay(self, options):
+        if options['all_dead']:
+            entries = OutboxEntry.objects.filter(status='dead')
+        elif options['entry_ids']:
+            entries = OutboxEntry.objects.filter(pk__in=options['entry_ids'])
+        else:
+            raise CommandError('Give entry ids or --all-dead')
+        if options['kind']:
+            entries = entries.filter(kind=options['kind'])
+
+        count = replay(entries)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {count} outbox entr{"y" if count == 1 else "ies"} queued for delivery again\n'))
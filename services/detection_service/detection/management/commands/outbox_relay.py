@@ -0,0 +1,31 @@
+"""
+Management command to run the outbox relay (delivers queued points and bin updates)
+Usage: python manage.py outbox_relay [--workers 8] [--once]
+"""
+import signal
+from django.core.management.base import BaseCommand
+from detection.outbox import OutboxRelay
+
+
+class Command(BaseCommand):
+    help = 'Deliver outbox entries to the Auth and Bin services, with retries and dead-lettering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Concurrent deliveries (default: OUTBOX_RELAY_WORKERS)')
+        parser.add_argument('--batch-size', type=int, help='Entries claimed per poll (default: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--once', action='store_true', help='Deliver what is due now, then exit')
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(workers=options['workers'], batch_size=options['batch_size'])
+
+        if options['once']:
+            total = relay.drain()
+            self.stdout.write(self.style.SUCCESS(f'✅ Processed {total} outbox entries'))
+            return
+
+        # Finish the current batch on SIGTERM (docker stop) instead of abandoning it
+        signal.signal(signal.SIGTERM, lambda signum, frame: relay.stop())
+        try:
+            relay.run_forever()
+        except KeyboardInterrupt:
+            relay.stop()
@@ -0,0 +1,111 @@
+"""
+Management command to show the latency breakdown of one trace from the span log
+Usage: python manage.py show_trace <trace_id> [--log PATH ...]
+       python manage.py show_trace --recent 10
+"""
+import json
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Show the per-span latency breakdown of a trace (e.g. one deposit) from the span log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('trace_id', nargs='?', help='Trace id (X-Trace-Id response header)')
+        parser.add_argument(
+            '--log', action='append', dest='logs',
+            help='Span log file(s) to read (default: TRACE_SPAN_LOG)'
+        )
+        parser.add_argument(
+            '--recent', type=int, default=0,
+            help='List the N most recent traces instead of showing one'
+        )
+
+    def handle(self, *args, **options):
+        logs = options['logs'] or [settings.TRACE_SPAN_LOG]
+        if not any(logs):
+            raise CommandError('No span log configured (set TRACE_SPAN_LOG or pass --log)')
+
+        trace_id = options['trace_id']
+        if not trace_id and not options['recent']:
+            raise CommandError('Give a trace id or --recent N')
+
+        spans = list(self.read_spans(logs, trace_id))
+        if options['recent']:
+            self.show_recent(spans, options['recent'])
+        else:
+            self.show_trace(trace_id, spans)
+
+    def read_spans(self, logs, trace_id=None):
+        for path in logs:
+            try:
+                with open(path, encoding='utf-8') as span_log:
+                    for line in span_log:
+                        # Cheap substring check before parsing, the log holds every trace
+                        if trace_id and trace_id not in line:
+                            continue
+                        try:
+                            span = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if trace_id is None or span.get('trace_id') == trace_id:
+                            yield span
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'Span log not found: {path}'))
+
+    def show_recent(self, spans, count):
+        traces = defaultdict(list)
+        for span in spans:
+            traces[span['trace_id']].append(span)
+
+        recent = sorted(traces.items(), key=lambda item: min(s['start'] for s in item[1]), reverse=True)
+        self.stdout.write('-' * 80)
+        for trace_id, trace_spans in recent[:count]:
+            root = min(trace_spans, key=lambda s: s['start'])
+            self.stdout.write(
+                f"{trace_id}  {root['duration_ms']:>9.1f} ms  {len(trace_spans):>3} spans  "
+                f"{root['service']}: {root['name']}"
+            )
+        self.stdout.write('-' * 80)
+
+    def show_trace(self, trace_id, spans):
+        if not spans:
+            raise CommandError(f'No spans found for trace {trace_id}')
+
+        span_ids = {span['span_id'] for span in spans}
+        children = defaultdict(list)
+        roots = []
+        for span in sorted(spans, key=lambda s: s['start']):
+            if span['parent_id'] in span_ids:
+                children[span['parent_id']].append(span)
+            else:
+                roots.append(span)
+
+        trace_start = roots[0]['start']
+        trace_end = max(span['start'] + span['duration_ms'] / 1000 for span in spans)
+
+        self.stdout.write(self.style.WARNING(f'\nTrace {trace_id}'))
+        self.stdout.write(f"{len(spans)} spans, {(trace_end - trace_start) * 1000:.1f} ms end to end")
+        self.stdout.write('-' * 80)
+        self.stdout.write(f"{'offset':>9}  {'duration':>9}  {'self':>9}  span")
+
+        def write_span(span, depth):
+            own = span['duration_ms'] - sum(child['duration_ms'] for child in children[span['span_id']])
+            line = (
+                f"{(span['start'] - trace_start) * 1000:>7.1f}ms  "
+                f"{span['duration_ms']:>7.1f}ms  {max(own, 0):>7.1f}ms  "
+                f"{'  ' * depth}{span['service']}: {span['name']}"
+            )
+            status_code = span.get('attributes', {}).get('status_code')
+            if status_code:
+                line += f" [{status_code}]"
+            style = self.style.ERROR if span['status'] == 'error' else self.style.SUCCESS
+            self.stdout.write(style(line))
+            for child in children[span['span_id']]:
+                write_span(child, depth + 1)
+
+        for root in roots:
+            write_span(root, 0)
+        self.stdout.write('-' * 80)
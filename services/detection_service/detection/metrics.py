@@ -0,0 +1,64 @@
+"""
+Prometheus metrics for detection service
+MQTT consumer, stats flush and outbox counters; the request and database metrics come
+from smartbin_common.metrics. Exposed at /metrics.
+The MQTT consumers and the outbox relay run in their own processes, so start.sh sets
+PROMETHEUS_MULTIPROC_DIR and /metrics aggregates all of them.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+from smartbin_common.metrics import LATENCY_BUCKETS
+
+MQTT_MESSAGES_RECEIVED = Counter(
+    'mqtt_messages_received_total',
+    'Detection messages consumed (result: processed, duplicate, invalid, error, dropped)',
+    ['result']
+)
+MQTT_MESSAGE_SECONDS = Histogram(
+    'mqtt_message_processing_seconds',
+    'Time to process one detection message',
+    ['result'],
+    buckets=LATENCY_BUCKETS
+)
+MQTT_CONNECTION_EVENTS = Counter(
+    'mqtt_connection_events_total',
+    'MQTT connection state changes (connected, connect_failed, disconnected)',
+    ['event']
+)
+MQTT_QUEUE_DEPTH = Gauge(
+    'mqtt_queue_depth',
+    'Detection messages waiting for a worker',
+    ['worker'],
+    multiprocess_mode='livesum'
+)
+MQTT_QUEUE_WAIT_SECONDS = Histogram(
+    'mqtt_queue_wait_seconds',
+    'Time a detection message waited in the queue before a worker picked it up',
+    buckets=LATENCY_BUCKETS
+)
+MQTT_BATCH_SIZE = Histogram(
+    'mqtt_batch_size',
+    'Detection messages ingested together in one micro-batch',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+MQTT_QUEUE_FULL = Counter(
+    'mqtt_queue_full_total',
+    'Messages that found their worker queue full (action: blocked, dropped)',
+    ['action']
+)
+STATS_FLUSHES = Counter(
+    'detection_stats_flushes_total',
+    'Flushes of the buffered daily stats counters (result: ok, error)',
+    ['result']
+)
+
+OUTBOX_DELIVERIES = Counter(
+    'outbox_deliveries_total',
+    'Outbox delivery attempts (result: delivered, retry, dead)',
+    ['kind', 'result']
+)
+OUTBOX_DELIVERY_LAG = Histogram(
+    'outbox_delivery_lag_seconds',
+    'Time from the deposit to the successful delivery of its side effect',
+    ['kind'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+)
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0003_alter_materialdetection_user_nfc_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('add_points', 'Add points (Auth Service)'), ('add_trash', 'Add trash (Bin Service)')], max_length=20)),
+                ('payload', models.JSONField()),
+                ('traceparent', models.CharField(blank=True, help_text='Trace context of the deposit', max_length=55)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('dead', 'Dead letter')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Claimed by a relay until then', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('detection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='detection.materialdetection')),
+            ],
+            options={
+                'db_table': 'detection_outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
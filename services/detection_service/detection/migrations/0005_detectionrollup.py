@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_outboxentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('bin_id', models.UUIDField()),
+                ('material_type', models.CharField(choices=[('plastic', 'Plastic'), ('paper', 'Paper'), ('glass', 'Glass'), ('metal', 'Metal'), ('organic', 'Organic'), ('other', 'Other')], max_length=20)),
+                ('detections', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'detection_hourly_rollups',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['bin_id', 'hour'], name='rollup_bin_hour_idx')],
+                'unique_together': {('hour', 'bin_id', 'material_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0005_detectionrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialdetection',
+            name='message_key',
+            field=models.CharField(blank=True, help_text='Identifies the MQTT message it came from, so redeliveries are stored once', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:42
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0006_materialdetection_message_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadLetterMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('message_key', models.CharField(db_index=True, max_length=64)),
+                ('topic', models.CharField(max_length=255)),
+                ('payload', models.BinaryField(help_text='Message payload as received (JSON or compact)')),
+                ('attempts', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('dead', 'Dead letter'), ('replayed', 'Replayed')], default='dead', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('replayed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'detection_dead_letters',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -1,6 +1,14 @@
+from collections import Counter
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from datetime import timezone as dt_timezone
 import uuid
 
+# Every deposit earns the same reward and adds the same volume to the bin
+POINTS_PER_DEPOSIT = 5
+LITERS_PER_DEPOSIT = 5.0
+
 
 class MaterialDetection(models.Model):
     """
@@ -22,6 +30,10 @@ class MaterialDetection(models.Model):
     confidence = models.FloatField(default=0.0, help_text="Detection confidence (0-1)")
     points_awarded = models.IntegerField(default=0)
     points_added_to_user = models.BooleanField(default=False)
+    message_key = models.CharField(
+        max_length=64, unique=True, null=True, blank=True,
+        help_text="Identifies the MQTT message it came from, so redeliveries are stored once"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -33,46 +45,43 @@ class MaterialDetection(models.Model):
     
     def award_points(self):
         """
-        Award points to user via Auth Service and update bin capacity
+        Queue the deposit's side effects in the outbox: points for the user (Auth Service)
+        and trash for the bin (Bin Service). The outbox relay delivers them with retries.
+        Call inside the transaction that creates the detection, so both commit together.
         Always awards 5 points per trash deposit regardless of material type
-        Returns True if successful, False otherwise
+        Returns True if queued (or already awarded)
         """
         if self.points_added_to_user:
             return True  # Already awarded
         
-        from .utils import add_points_to_user, update_bin_capacity
+        from smartbin_common.tracing import current_traceparent
         
-        # Always award 5 points per trash deposit
-        points = 5
-        
-        # Add points via Auth Service
-        success = add_points_to_user(
-            user_nfc_code=self.user_nfc_code,
-            points=points,
-            description=f"Trash deposit - {self.material_type} waste"
-        )
-        
-        if success:
-            self.points_awarded = points
-            self.points_added_to_user = True
-            self.save(update_fields=['points_awarded', 'points_added_to_user'])
-            
-            # Update bin capacity - each trash deposit adds ~5 liters
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"🔄 About to call update_bin_capacity for bin {self.bin_id}")
-            try:
-                # Add 5 liters of trash to the bin
-                capacity_result = update_bin_capacity(self.bin_id, liters=5.0)
-                logger.info(f"🔄 update_bin_capacity returned: {capacity_result}")
-            except Exception as e:
-                logger.error(f"❌ Exception in update_bin_capacity: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            return True
-        
-        return False
+        OutboxEntry.objects.bulk_create(self.reward_entries(current_traceparent()))
+        return True
+    
+    def reward_entries(self, traceparent=None):
+        """Unsaved outbox entries for this deposit (bulk-created by the caller)"""
+        return [
+            OutboxEntry(
+                detection=self,
+                kind='add_points',
+                payload={
+                    'user_id': self.user_nfc_code,  # Can be UUID, NFC code (SB-...), or username
+                    'amount': POINTS_PER_DEPOSIT,
+                    'description': f"Trash deposit - {self.material_type} waste",
+                },
+                traceparent=traceparent or '',
+            ),
+            OutboxEntry(
+                detection=self,
+                kind='add_trash',
+                payload={
+                    'bin_id': str(self.bin_id),
+                    'liters': LITERS_PER_DEPOSIT,
+                },
+                traceparent=traceparent or '',
+            ),
+        ]
 
 
 class DetectionStats(models.Model):
@@ -97,3 +106,158 @@ class DetectionStats(models.Model):
     
     def __str__(self):
         return f"Stats for {self.date}"
+    
+    @classmethod
+    def increment(cls, day, detections, points, material_counts):
+        """
+        Add counts to a day's stats in a single UPDATE (no read-modify-write)
+        Safe to call from several processes at once: the increments happen in the database,
+        and a concurrent insert of a missing row is absorbed by get_or_create.
+        
+        Args:
+            day: Date of the stats row (created if missing)
+            detections: Number of detections to add
+            points: Points awarded to add
+            material_counts: {material_type: count}; unknown materials only count in the total
+        """
+        updates = {
+            'total_detections': F('total_detections') + detections,
+            'total_points_awarded': F('total_points_awarded') + points,
+            'updated_at': timezone.now(),  # update() skips auto_now
+        }
+        known_fields = {field.name for field in cls._meta.get_fields()}
+        for material, count in material_counts.items():
+            field = f"{material}_count"
+            if field in known_fields:
+                updates[field] = F(field) + count
+        if not cls.objects.filter(date=day).update(**updates):
+            # First counts of the day
+            cls.objects.get_or_create(date=day)
+            cls.objects.filter(date=day).update(**updates)
+
+
+class DetectionRollup(models.Model):
+    """
+    Hourly detection counts per bin and material
+    Kept up to date in the transaction that stores each detection (and by the outbox relay
+    for points) so dashboards
+    read a few buckets instead of scanning material_detections. Rebuild a range from the
+    detections with 'python manage.py backfill_rollups'.
+    """
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    bin_id = models.UUIDField()
+    material_type = models.CharField(max_length=20, choices=MaterialDetection.MATERIAL_CHOICES)
+    detections = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'detection_hourly_rollups'
+        ordering = ['-hour']
+        unique_together = [('hour', 'bin_id', 'material_type')]
+        indexes = [
+            models.Index(fields=['bin_id', 'hour'], name='rollup_bin_hour_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.material_type} in {self.bin_id} at {self.hour}"
+    
+    @staticmethod
+    def hour_of(moment):
+        """Bucket (start of the UTC hour) for a datetime"""
+        return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    
+    @classmethod
+    def increment(cls, hour, bin_id, material_type, detections=0, points=0):
+        """Add counts to one bucket in a single UPDATE, creating it if missing (see DetectionStats.increment)"""
+        bucket = cls.objects.filter(hour=hour, bin_id=bin_id, material_type=material_type)
+        updates = {
+            'detections': F('detections') + detections,
+            'points': F('points') + points,
+            'updated_at': timezone.now(),
+        }
+        if not bucket.update(**updates):
+            cls.objects.get_or_create(hour=hour, bin_id=bin_id, material_type=material_type)
+            bucket.update(**updates)
+    
+    @classmethod
+    def add_detections(cls, detections):
+        """
+        Count stored detections in their buckets, one increment per (hour, bin, material)
+        Call it in the transaction that stores them, so the counts commit (or roll back) with them
+        """
+        counts = Counter(
+            (cls.hour_of(detection.created_at), detection.bin_id, detection.material_type)
+            for detection in detections
+        )
+        for (hour, bin_id, material_type), count in counts.items():
+            cls.increment(hour, bin_id, material_type, detections=count)
+
+
+class OutboxEntry(models.Model):
+    """
+    A detection side effect waiting to be delivered to another service
+    Written in the same transaction as the detection and drained by the outbox relay
+    (python manage.py outbox_relay), which retries with exponential backoff and moves
+    entries that keep failing to the dead-letter state.
+    """
+    KIND_CHOICES = (
+        ('add_points', 'Add points (Auth Service)'),
+        ('add_trash', 'Add trash (Bin Service)'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead letter'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    detection = models.ForeignKey(MaterialDetection, on_delete=models.CASCADE, related_name='outbox_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    traceparent = models.CharField(max_length=55, blank=True, help_text="Trace context of the deposit")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Claimed by a relay until then")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'detection_outbox'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} for {self.detection_id} ({self.status})"
+
+
+class DeadLetterMessage(models.Model):
+    """
+    A detection message the MQTT consumer gave up storing after MQTT_MAX_DELIVERY_ATTEMPTS
+    Written before the message is acknowledged, so a long database outage parks deposits
+    here instead of dropping them. Replay them with 'python manage.py dead_letters replay'.
+    """
+    STATUS_CHOICES = (
+        ('dead', 'Dead letter'),
+        ('replayed', 'Replayed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    message_key = models.CharField(max_length=64, db_index=True)
+    topic = models.CharField(max_length=255)
+    payload = models.BinaryField(help_text="Message payload as received (JSON or compact)")
+    attempts = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='dead')
+    created_at = models.DateTimeField(auto_now_add=True)
+    replayed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'detection_dead_letters'
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.message_key} on {self.topic} ({self.status})"
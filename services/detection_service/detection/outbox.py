@@ -0,0 +1,206 @@
+"""
+Outbox relay for detection side effects
+Deposits write OutboxEntry rows in the same transaction as the detection (see
+MaterialDetection.award_points). The relay claims due entries, delivers them to the
+Auth and Bin services concurrently, and reschedules failures with exponential backoff.
+Entries that keep failing, or that a service rejects outright, end up in the
+dead-letter state until they are replayed (python manage.py outbox replay).
+"""
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from smartbin_common.tracing import start_span, inject_headers
+from .metrics import OUTBOX_DELIVERIES, OUTBOX_DELIVERY_LAG
+from .models import DetectionRollup, DetectionStats, MaterialDetection, OutboxEntry
+
+logger = logging.getLogger(__name__)
+
+# Client errors that won't change on retry go straight to the dead-letter state
+RETRYABLE_STATUS_CODES = (408, 425, 429)
+
+
+class DeliveryError(Exception):
+    """A failed delivery; retryable unless the service rejected the request itself"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def get_target_url(entry):
+    if entry.kind == 'add_points':
+        return f"{settings.AUTH_SERVICE_URL}/api/auth/points/add/"
+    if entry.kind == 'add_trash':
+        return f"{settings.BIN_SERVICE_URL}/api/bins/list/{entry.payload['bin_id']}/add-trash/"
+    raise DeliveryError(f"Unknown outbox entry kind: {entry.kind}", retryable=False)
+
+
+def deliver(entry):
+    """POST one entry to its service; raises DeliveryError unless it answered 2xx"""
+    url = get_target_url(entry)
+    body = {key: value for key, value in entry.payload.items() if key != 'bin_id'}
+    # The entry id makes redeliveries recognisable by the receiving service
+    headers = inject_headers({'Idempotency-Key': str(entry.id)})
+    try:
+        response = requests.post(url, json=body, headers=headers, timeout=settings.OUTBOX_DELIVERY_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        raise DeliveryError(f"{type(e).__name__}: {e}")
+
+    if response.status_code >= 300:
+        retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:500]}", retryable=retryable)
+
+
+def get_backoff(attempts):
+    """Seconds until the next attempt: exponential (with jitter), capped at OUTBOX_BACKOFF_MAX"""
+    ceiling = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def mark_delivered(entry):
+    now = timezone.now()
+    with transaction.atomic():
+        updated = OutboxEntry.objects.filter(pk=entry.pk, status='pending').update(
+            status='delivered',
+            attempts=entry.attempts + 1,
+            delivered_at=now,
+            locked_until=None,
+            last_error=''
+        )
+        if updated and entry.kind == 'add_points':
+            # The user got the points: reflect it on the detection, the day's stats and the hourly rollup
+            points = entry.payload['amount']
+            detection = MaterialDetection.objects.filter(pk=entry.detection_id)
+            detection.update(points_awarded=points, points_added_to_user=True)
+            DetectionStats.increment(timezone.localdate(entry.created_at), 0, points, {})
+            bucket = detection.values('bin_id', 'material_type', 'created_at').first()
+            if bucket:
+                DetectionRollup.increment(
+                    DetectionRollup.hour_of(bucket['created_at']),
+                    bucket['bin_id'],
+                    bucket['material_type'],
+                    points=points
+                )
+    OUTBOX_DELIVERIES.labels(entry.kind, 'delivered').inc()
+    OUTBOX_DELIVERY_LAG.labels(entry.kind).observe((now - entry.created_at).total_seconds())
+
+
+def mark_failed(entry, error):
+    attempts = entry.attempts + 1
+    if not error.retryable or attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        status, next_attempt_at, result = 'dead', timezone.now(), 'dead'
+        logger.error(f"💀 Outbox {entry.kind} {entry.id} dead after {attempts} attempt(s): {error}")
+    else:
+        delay = get_backoff(attempts)
+        status, next_attempt_at, result = 'pending', timezone.now() + timedelta(seconds=delay), 'retry'
+        logger.warning(f"⚠️  Outbox {entry.kind} {entry.id} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+    OutboxEntry.objects.filter(pk=entry.pk, status='pending').update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        locked_until=None,
+        last_error=str(error)
+    )
+    OUTBOX_DELIVERIES.labels(entry.kind, result).inc()
+
+
+def process_entry(entry):
+    """Deliver one claimed entry and record the outcome (runs on a relay thread)"""
+    close_old_connections()
+    try:
+        with start_span(f"outbox {entry.kind}", traceparent=entry.traceparent, attempt=entry.attempts + 1) as span:
+            try:
+                deliver(entry)
+            except DeliveryError as e:
+                span.status = 'error'
+                span.set('error', str(e))
+                mark_failed(entry, e)
+            else:
+                mark_delivered(entry)
+    except Exception as e:
+        # Leave the entry claimed; it becomes due again when the lease runs out
+        logger.error(f"❌ Error processing outbox entry {entry.id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def claim_due_entries(limit):
+    """
+    Lease up to limit due entries to this relay
+    SKIP LOCKED lets several relays poll the table without handing out the same entry twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            OutboxEntry.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by('next_attempt_at')[:limit]
+        )
+        if entries:
+            OutboxEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                locked_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            )
+    return entries
+
+
+def replay(queryset):
+    """Make entries (usually dead letters) due again with a fresh attempt budget; returns the count"""
+    return queryset.exclude(status='delivered').update(
+        status='pending',
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        locked_until=None
+    )
+
+
+class OutboxRelay:
+    """Polls the outbox and delivers due entries on a thread pool"""
+
+    def __init__(self, workers=None, batch_size=None, poll_interval=None):
+        self.workers = workers or settings.OUTBOX_RELAY_WORKERS
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.OUTBOX_POLL_INTERVAL
+        self._stop = threading.Event()
+
+    def run_once(self, executor):
+        """Claim and deliver one batch; returns the number of entries handled"""
+        entries = claim_due_entries(self.batch_size)
+        if entries:
+            list(executor.map(process_entry, entries))
+        return len(entries)
+
+    def drain(self):
+        """Deliver everything due now, then return the number of entries handled"""
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='outbox-relay') as executor:
+            while True:
+                handled = self.run_once(executor)
+                total += handled
+                if handled < self.batch_size:
+                    return total
+
+    def run_forever(self):
+        logger.info(f"📤 Outbox relay started ({self.workers} workers, batches of {self.batch_size})")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='outbox-relay') as executor:
+            while not self._stop.is_set():
+                try:
+                    handled = self.run_once(executor)
+                except Exception as e:
+                    logger.error(f"❌ Outbox relay error: {e}")
+                    handled = 0
+                    close_old_connections()
+                # A full batch means more is probably due, poll again right away
+                if handled < self.batch_size:
+                    self._stop.wait(self.poll_interval)
+        logger.info("🛑 Outbox relay stopped")
+
+    def stop(self):
+        self._stop.set()
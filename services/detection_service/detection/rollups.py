@@ -0,0 +1,157 @@
+"""
+Queries over the hourly rollups (DetectionRollup)
+Dashboard endpoints read these instead of aggregating material_detections, so their
+cost grows with the number of hour buckets asked for rather than with the detections.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from .models import DetectionRollup, MaterialDetection
+
+MATERIALS = [choice for choice, _ in MaterialDetection.MATERIAL_CHOICES]
+INTERVALS = ('hour', 'day')
+
+
+def material_summary(bin_id=None, material=None):
+    """Detections and points per material, most detected first (the shape of /list/summary/)"""
+    rollups = DetectionRollup.objects.all()
+    if bin_id:
+        rollups = rollups.filter(bin_id=bin_id)
+    if material:
+        rollups = rollups.filter(material_type=material)
+    rows = rollups.values('material_type').annotate(
+        count=Sum('detections'),
+        total_points=Sum('points')
+    ).order_by('-count')
+    return list(rows)
+
+
+def daily_stats(since):
+    """
+    Per-day totals from the given date on, newest first, in the shape of DetectionStatsSerializer
+    Reads one row per (hour, material) and groups the hours into local days here.
+    """
+    start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+    rows = DetectionRollup.objects.filter(hour__gte=start).values('hour', 'material_type').annotate(
+        detections=Sum('detections'),
+        points=Sum('points'),
+        updated_at=Max('updated_at')
+    ).order_by()
+
+    days = {}
+    for row in rows:
+        day = timezone.localdate(row['hour'])
+        if day not in days:
+            days[day] = {
+                'date': day,
+                'total_detections': 0,
+                **{f"{material}_count": 0 for material in MATERIALS},
+                'total_points_awarded': 0,
+                'updated_at': row['updated_at'],
+            }
+        stats = days[day]
+        stats['total_detections'] += row['detections']
+        stats[f"{row['material_type']}_count"] += row['detections']
+        stats['total_points_awarded'] += row['points']
+        stats['updated_at'] = max(stats['updated_at'], row['updated_at'])
+    return [days[day] for day in sorted(days, reverse=True)]
+
+
+def bucket_start(moment, interval):
+    moment = timezone.localtime(moment)
+    if interval == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def bin_chart(bin_id, days, interval):
+    """
+    Detections and points of one bin per hour or day over the last days, oldest first
+    Every bucket of the range is present (empty ones as zeros) so charts can plot it as is.
+    """
+    end = timezone.now()
+    start = bucket_start(end - timedelta(days=days), interval)
+    step = timedelta(days=1) if interval == 'day' else timedelta(hours=1)
+
+    buckets = {}
+    moment = start
+    while moment <= end:
+        buckets[moment] = {'start': moment, 'detections': 0, 'points': 0, 'materials': defaultdict(int)}
+        moment += step
+
+    rows = DetectionRollup.objects.filter(bin_id=bin_id, hour__gte=start).values(
+        'hour', 'material_type', 'detections', 'points'
+    ).order_by()
+    totals = {'detections': 0, 'points': 0, 'materials': defaultdict(int)}
+    for row in rows:
+        bucket = buckets.get(bucket_start(row['hour'], interval))
+        if bucket is None:
+            continue
+        for counts in (bucket, totals):
+            counts['detections'] += row['detections']
+            counts['points'] += row['points']
+            counts['materials'][row['material_type']] += row['detections']
+
+    return {
+        'bin_id': str(bin_id),
+        'interval': interval,
+        'start': start,
+        'end': end,
+        'totals': {**totals, 'materials': dict(totals['materials'])},
+        'buckets': [{**bucket, 'materials': dict(bucket['materials'])} for bucket in buckets.values()],
+    }
+
+
+def bin_totals(days, limit=None):
+    """Detections and points per bin over the last days, busiest bins first"""
+    start = DetectionRollup.hour_of(timezone.now() - timedelta(days=days))
+    rows = DetectionRollup.objects.filter(hour__gte=start).values('bin_id', 'material_type').annotate(
+        detections=Sum('detections'),
+        points=Sum('points')
+    ).order_by()
+
+    bins = {}
+    for row in rows:
+        totals = bins.setdefault(row['bin_id'], {
+            'bin_id': str(row['bin_id']),
+            'detections': 0,
+            'points': 0,
+            'materials': {},
+        })
+        totals['detections'] += row['detections']
+        totals['points'] += row['points']
+        totals['materials'][row['material_type']] = row['detections']
+    ranked = sorted(bins.values(), key=lambda totals: totals['detections'], reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+def rebuild(start, end):
+    """
+    Recompute the rollups of [start, end) from material_detections
+
+    Returns:
+        int: Number of buckets written
+    """
+    rows = MaterialDetection.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+        bucket=TruncHour('created_at', tzinfo=dt_timezone.utc)
+    ).values('bucket', 'bin_id', 'material_type').annotate(
+        detections=Count('id'),
+        points=Sum('points_awarded')
+    ).order_by()
+    rollups = [
+        DetectionRollup(
+            hour=row['bucket'],
+            bin_id=row['bin_id'],
+            material_type=row['material_type'],
+            detections=row['detections'],
+            points=row['points'] or 0
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        DetectionRollup.objects.filter(hour__gte=start, hour__lt=end).delete()
+        DetectionRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
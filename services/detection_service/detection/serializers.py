@@ -14,6 +14,18 @@ class MaterialDetectionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'points_awarded', 'points_added_to_user', 'created_at']
 
 
+class DetectionStreamSerializer(serializers.ModelSerializer):
+    """Stored detection as pushed to the live stream (anyone watching a bin sees it, so no NFC code)"""
+
+    class Meta:
+        model = MaterialDetection
+        fields = [
+            'id', 'bin_id', 'material_type', 'confidence',
+            'points_awarded', 'points_added_to_user', 'created_at'
+        ]
+        read_only_fields = fields
+
+
 class DetectionStatsSerializer(serializers.ModelSerializer):
     """Serializer for DetectionStats model"""
     
@@ -36,3 +48,7 @@ class SimulateDetectionSerializer(serializers.Serializer):
         default='plastic'
     )
     confidence = serializers.FloatField(min_value=0.0, max_value=1.0, default=0.95)
+    event_id = serializers.CharField(
+        required=False, max_length=64,
+        help_text="Same for every resend of a detection, so it is only counted once"
+    )
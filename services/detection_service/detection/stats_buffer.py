@@ -0,0 +1,104 @@
+"""
+Buffered daily detection stats
+Worker threads only bump in-memory counters per day and material; a background thread
+adds them to DetectionStats every DETECTION_STATS_FLUSH_INTERVAL seconds (and once more
+on shutdown) with one F() update per row. Nothing is read back, so any number of
+consumer processes can flush into the same rows without losing counts.
+The hourly rollups the dashboards read are not buffered: they are counted in the
+detection's own transaction (DetectionRollup.add_detections).
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from django.db import close_old_connections
+from django.utils import timezone
+from .metrics import STATS_FLUSHES
+from .models import DetectionStats
+
+logger = logging.getLogger(__name__)
+
+
+class DayCounts:
+    """Counts for one day waiting to be flushed"""
+
+    def __init__(self):
+        self.detections = 0
+        self.points = 0
+        self.materials = Counter()
+
+    def merge(self, other):
+        self.detections += other.detections
+        self.points += other.points
+        self.materials.update(other.materials)
+
+
+class StatsBuffer:
+    """Thread-safe per-day counters with a periodic flush to the database"""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._pending = defaultdict(DayCounts)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_detections(self, detections):
+        """Count saved detections in their day's stats"""
+        with self._lock:
+            for detection in detections:
+                counts = self._pending[timezone.localdate(detection.created_at)]
+                counts.detections += 1
+                counts.points += detection.points_awarded
+                counts.materials[detection.material_type] += 1
+
+    def flush(self):
+        """
+        Write everything counted so far
+
+        Returns:
+            int: Number of days written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(DayCounts)
+        if not pending:
+            return 0
+
+        written = 0
+        try:
+            for day, counts in list(pending.items()):
+                DetectionStats.increment(day, counts.detections, counts.points, counts.materials)
+                del pending[day]
+                written += 1
+        except Exception as e:
+            STATS_FLUSHES.labels('error').inc()
+            logger.error(
+                f"❌ Error flushing detection stats, keeping {len(pending)} day(s) for the next flush: {e}"
+            )
+            with self._lock:
+                for day, counts in pending.items():
+                    self._pending[day].merge(counts)
+        else:
+            STATS_FLUSHES.labels('ok').inc()
+        return written
+
+    def start(self):
+        """Start the flush thread (idempotent)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='detection-stats-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,73 @@
+"""
+Live stream of stored detections
+Once the transaction that stored a detection commits, it is published (serialized,
+without the user's NFC code) to MQTT_STREAM_TOPIC, where the gateway's SSE hub picks it
+up. Deposits that fail, are resent or are rejected never reach the stream, and
+detections from the consumer and from the simulate endpoint both do.
+Publishing is best effort (QoS 0): a stream event lost while the broker is unreachable
+is still in the detections API.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+import paho.mqtt.client as mqtt
+from django.conf import settings
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from .serializers import DetectionStreamSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamPublisher:
+    """Process-wide MQTT connection used only to publish stream events"""
+
+    def __init__(self):
+        self.client = None
+        self.published = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Connect once, in the background; paho's loop thread handles reconnects"""
+        with self._lock:
+            if self.client is not None:
+                return
+            client_id = f"detection_stream-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            try:
+                self.client.connect_async(settings.MQTT_BROKER, settings.MQTT_PORT, keepalive=settings.MQTT_KEEPALIVE)
+                self.client.loop_start()
+            except Exception as e:
+                logger.error(f"❌ Error starting detection stream publisher: {e}")
+
+    def publish(self, detections):
+        """Publish stored detections to their bin's stream topic"""
+        self.start()
+        for detection in detections:
+            payload = JSONRenderer().render(DetectionStreamSerializer(detection).data)
+            topic = settings.MQTT_STREAM_TOPIC.format(bin_id=detection.bin_id)
+            try:
+                info = self.client.publish(topic, payload, qos=0)
+            except Exception as e:
+                info = None
+                logger.warning(f"⚠️  Could not publish detection {detection.id} to the stream: {e}")
+            if info is not None and info.rc == mqtt.MQTT_ERR_SUCCESS:
+                self.published += 1
+            else:
+                self.failed += 1
+
+
+# Global publisher shared by the consumer workers / request threads of this process
+stream_publisher = StreamPublisher()
+
+
+def publish_on_commit(detections):
+    """Publish detections once the current transaction commits (right away outside one)"""
+    detections = list(detections)
+    if detections:
+        # robust: a publishing error must not turn the committed deposit into a failure
+        transaction.on_commit(lambda: stream_publisher.publish(detections), robust=True)
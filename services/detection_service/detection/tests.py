@@ -0,0 +1,213 @@
+"""
+Tests for the detection service
+Run with: python manage.py test detection
+"""
+import json
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+from django.test import TransactionTestCase, override_settings
+from mqtt.mqtt_client import DetectionMQTTClient, Delivery
+from detection.dedup import PENDING
+from .models import DeadLetterMessage, DetectionRollup, MaterialDetection, OutboxEntry
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+OPEN_SPAN_ID = '00f067aa0ba902b7'
+
+
+class DepositTraceTests(TransactionTestCase):
+    """A detected event that echoes the open command's traceparent joins that trace"""
+
+    def setUp(self):
+        span_log = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        span_log.close()
+        self.span_log = span_log.name
+        self.addCleanup(os.remove, self.span_log)
+
+        self.consumer = DetectionMQTTClient()
+        self.acked = []
+        self.consumer.client.ack = lambda mid, qos: self.acked.append(mid)
+        self.consumer.stats.add_detections = lambda detections: None
+        publish = mock.patch('detection.stream.stream_publisher.publish')
+        publish.start()
+        self.addCleanup(publish.stop)
+
+    def deliver(self, payload, mid=1):
+        raw = json.dumps(payload).encode('utf-8')
+        msg = SimpleNamespace(topic=f"bin/{payload['bin_id']}/detected", payload=raw, mid=mid, qos=1)
+        with override_settings(TRACE_SPAN_LOG=self.span_log):
+            self.consumer._handle_message(Delivery(msg, payload, payload['event_id']))
+
+    def spans(self):
+        with open(self.span_log, encoding='utf-8') as span_log:
+            return {span['name']: span for span in map(json.loads, span_log)}
+
+    def test_detected_event_joins_the_open_request_trace(self):
+        self.deliver({
+            'event_id': str(uuid.uuid4()),
+            'bin_id': str(uuid.uuid4()),
+            'user_nfc_code': 'SB-test',
+            'material': 'plastic',
+            'confidence': 0.93,
+            'traceparent': f"00-{TRACE_ID}-{OPEN_SPAN_ID}-01",
+        })
+
+        self.assertEqual(self.acked, [1])
+        spans = self.spans()
+        consumer = spans['mqtt bin/+/detected']
+        self.assertEqual(consumer['trace_id'], TRACE_ID)
+        self.assertEqual(consumer['parent_id'], OPEN_SPAN_ID)
+        insert = spans['detection insert']
+        self.assertEqual(insert['trace_id'], TRACE_ID)
+        self.assertEqual(insert['parent_id'], consumer['span_id'])
+
+        # The outbox relay continues the same trace when it awards the points
+        detection = MaterialDetection.objects.get()
+        for entry in OutboxEntry.objects.filter(detection=detection):
+            self.assertEqual(entry.traceparent.split('-')[1], TRACE_ID)
+
+    def test_detected_event_without_traceparent_starts_a_new_trace(self):
+        self.deliver({
+            'event_id': str(uuid.uuid4()),
+            'bin_id': str(uuid.uuid4()),
+            'user_nfc_code': 'SB-test',
+            'material': 'paper',
+        })
+
+        consumer = self.spans()['mqtt bin/+/detected']
+        self.assertNotEqual(consumer['trace_id'], TRACE_ID)
+        self.assertIsNone(consumer['parent_id'])
+
+
+class SettleTests(TransactionTestCase):
+    """Messages are acknowledged in receive order, and resends are settled by their first copy"""
+
+    def setUp(self):
+        self.consumer = DetectionMQTTClient()
+        self.acked = []
+        self.consumer.client.ack = lambda mid, qos: self.acked.append(mid)
+        self.consumer.stats.add_detections = lambda detections: None
+        self.queued = []
+        self.consumer.workers.submit = lambda key, delivery: self.queued.append(delivery) or True
+        publish = mock.patch('detection.stream.stream_publisher.publish')
+        publish.start()
+        self.addCleanup(publish.stop)
+
+    def message(self, payload, mid):
+        raw = json.dumps(payload).encode('utf-8')
+        return SimpleNamespace(topic=f"bin/{payload['bin_id']}/detected", payload=raw, mid=mid, qos=1)
+
+    def receive(self, payload, mid):
+        self.consumer._on_message(self.consumer.client, None, self.message(payload, mid))
+
+    def detection(self):
+        return {
+            'event_id': str(uuid.uuid4()),
+            'bin_id': str(uuid.uuid4()),
+            'user_nfc_code': 'SB-test',
+            'material': 'glass',
+        }
+
+    def test_acks_wait_for_earlier_messages(self):
+        self.receive(self.detection(), mid=1)
+        self.receive(self.detection(), mid=2)
+        first, second = self.queued
+
+        self.consumer._handle_message(second)
+        self.assertEqual(self.acked, [])
+        self.consumer._handle_message(first)
+        self.assertEqual(self.acked, [1, 2])
+
+    def test_resend_of_a_pending_event_is_acked_after_its_first_copy(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+        self.receive(payload, mid=2)
+        self.assertEqual(len(self.queued), 1)
+        self.assertEqual(self.acked, [])
+
+        self.consumer._handle_message(self.queued[0])
+        self.assertEqual(self.acked, [1, 2])
+        self.assertEqual(MaterialDetection.objects.count(), 1)
+
+    def test_redelivery_after_a_reconnect_waits_for_the_first_copy(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+        self.consumer.acks.reset()  # Reconnected: the first copy's packet id is stale
+        self.receive(payload, mid=7)
+        self.assertEqual(self.acked, [])
+
+        self.consumer._handle_message(self.queued[0])
+        self.assertEqual(self.acked, [7])
+        self.assertEqual(MaterialDetection.objects.count(), 1)
+
+    @override_settings(MQTT_RETRY_DELAY=0)
+    def test_batch_twin_of_a_failed_store_waits_for_the_retry(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+        first = self.queued.pop()
+        twin = Delivery(self.message(payload, mid=2), payload, first.key)
+        self.consumer.acks.received(twin.msg)
+
+        with mock.patch.object(MaterialDetection.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            self.consumer._handle_batch([first, twin])
+        self.assertEqual(self.acked, [])
+        self.assertEqual(self.consumer.recent.claim(first.key), PENDING)
+
+        self.consumer._submit_retries()
+        self.assertEqual(self.queued, [first])
+        self.consumer._handle_batch(self.queued)
+        self.assertEqual(self.acked, [1, 2])
+        self.assertEqual(MaterialDetection.objects.count(), 1)
+
+    @override_settings(MQTT_MAX_DELIVERY_ATTEMPTS=1)
+    def test_message_given_up_on_is_dead_lettered_before_the_ack(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+
+        with mock.patch.object(MaterialDetection.objects, 'create', side_effect=RuntimeError('db down')):
+            self.consumer._handle_message(self.queued[0])
+        self.assertEqual(self.acked, [1])
+        letter = DeadLetterMessage.objects.get()
+        self.assertEqual(letter.message_key, self.queued[0].key)
+        self.assertEqual(bytes(letter.payload), self.queued[0].msg.payload)
+
+    @override_settings(MQTT_MAX_DELIVERY_ATTEMPTS=1, MQTT_RETRY_DELAY=0)
+    def test_message_stays_unacked_while_it_cannot_be_dead_lettered(self):
+        self.receive(self.detection(), mid=1)
+        first = self.queued.pop()
+
+        with mock.patch.object(MaterialDetection.objects, 'create', side_effect=RuntimeError('db down')), \
+                mock.patch.object(DeadLetterMessage.objects, 'create', side_effect=RuntimeError('db down')):
+            self.consumer._handle_message(first)
+        self.assertEqual(self.acked, [])
+
+        self.consumer._submit_retries()
+        self.assertEqual(self.queued, [first])
+        self.consumer._handle_message(first)
+        self.assertEqual(self.acked, [1])
+        self.assertEqual(MaterialDetection.objects.count(), 1)
+
+    def test_event_ids_are_scoped_to_their_bin(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+        self.receive(dict(payload, bin_id=str(uuid.uuid4())), mid=2)
+        self.assertEqual(len(self.queued), 2)
+
+        for delivery in self.queued:
+            self.consumer._handle_message(delivery)
+        self.assertEqual(self.acked, [1, 2])
+        self.assertEqual(MaterialDetection.objects.count(), 2)
+
+    def test_rollups_are_counted_with_the_detection(self):
+        payload = self.detection()
+        self.receive(payload, mid=1)
+        self.receive(dict(self.detection(), bin_id=payload['bin_id']), mid=2)
+        self.receive(dict(self.detection(), bin_id=payload['bin_id'], material='paper'), mid=3)
+        first, *batch = self.queued
+
+        self.consumer._handle_message(first)
+        self.consumer._handle_batch(batch)
+        counts = dict(DetectionRollup.objects.values_list('material_type', 'detections'))
+        self.assertEqual(counts, {'glass': 2, 'paper': 1})
@@ -2,9 +2,15 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Count, Sum
 from datetime import date, timedelta
-from .models import MaterialDetection, DetectionStats
+from django.core.exceptions import ValidationError
+from .models import MaterialDetection, DetectionStats, DetectionRollup
+from . import rollups
+from .dedup import RecentKeys, STORED, event_key
+from .stream import publish_on_commit
 from .serializers import (
     MaterialDetectionSerializer,
     DetectionStatsSerializer,
@@ -14,6 +20,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Longest range the per-bin chart endpoints serve
+MAX_CHART_DAYS = 90
+
+# Event ids of recent simulated detections in this process (resends are answered without a DB write)
+recent_events = RecentKeys(size=settings.DETECTION_DEDUP_CACHE_SIZE)
+
 
 class MaterialDetectionViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -66,6 +78,17 @@ class MaterialDetectionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get detection summary by material type"""
+        if not request.query_params.get('user_nfc_code'):
+            # Rollups have no per-user breakdown, everything else is read from them
+            try:
+                summary = rollups.material_summary(
+                    bin_id=request.query_params.get('bin_id'),
+                    material=request.query_params.get('material')
+                )
+            except ValidationError:
+                return Response({'error': 'bin_id must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(summary)
+        
         summary = self.get_queryset().values('material_type').annotate(
             count=Count('id'),
             total_points=Sum('points_awarded')
@@ -97,11 +120,48 @@ class DetectionStatsViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def last_week(self, request):
-        """Get last 7 days statistics"""
+        """Get last 7 days statistics (from the hourly rollups)"""
         week_ago = date.today() - timedelta(days=7)
-        stats = self.get_queryset().filter(date__gte=week_ago)
+        stats = rollups.daily_stats(week_ago)
         serializer = self.get_serializer(stats, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def bins(self, request):
+        """
+        Detections per bin over the last days, busiest first
+        GET /api/detections/stats/bins/?days=7&limit=20
+        """
+        try:
+            days = get_days(request, default=7)
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rollups.bin_totals(days, limit=limit))
+    
+    @action(detail=False, methods=['get'], url_path=r'bins/(?P<bin_id>[0-9a-fA-F-]{36})')
+    def bin_chart(self, request, bin_id=None):
+        """
+        Chart data for one bin: detections and points per hour or per day
+        GET /api/detections/stats/bins/{bin_id}/?interval=hour&days=1
+        """
+        interval = request.query_params.get('interval', 'hour')
+        if interval not in rollups.INTERVALS:
+            return Response({'error': f"interval must be one of {', '.join(rollups.INTERVALS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = get_days(request, default=1 if interval == 'hour' else 30)
+            chart = rollups.bin_chart(bin_id, days, interval)
+        except (ValueError, ValidationError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(chart)
+
+
+def get_days(request, default):
+    """The 'days' query parameter, between 1 and MAX_CHART_DAYS"""
+    days = int(request.query_params.get('days', default))
+    if not 1 <= days <= MAX_CHART_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_CHART_DAYS}")
+    return days
 
 
 class SimulateDetectionView(APIView):
@@ -116,17 +176,45 @@ class SimulateDetectionView(APIView):
         
         if serializer.is_valid():
             data = serializer.validated_data
+            event_id = data.get('event_id')
+            # Same key as the MQTT consumer uses, so a simulated and a published resend match
+            key = event_key(data['bin_id'], event_id) if event_id else None
             
-            # Create detection
-            detection = MaterialDetection.objects.create(
-                bin_id=data['bin_id'],
-                user_nfc_code=data['user_nfc_code'],
-                material_type=data['material'],
-                confidence=data['confidence']
-            )
+            if event_id:
+                state = recent_events.claim(key)
+                if state == STORED:
+                    return self.duplicate_response(event_id)
+                if state is not None:
+                    return Response({
+                        'error': 'This detection is already being processed',
+                        'event_id': event_id
+                    }, status=status.HTTP_409_CONFLICT)
             
-            # Award points
-            success = detection.award_points()
+            # Create detection, queue its points in the outbox and count it in its rollup (one transaction)
+            try:
+                with transaction.atomic():
+                    detection = MaterialDetection.objects.create(
+                        bin_id=data['bin_id'],
+                        user_nfc_code=data['user_nfc_code'],
+                        material_type=data['material'],
+                        confidence=data['confidence'],
+                        message_key=key
+                    )
+                    success = detection.award_points()
+                    DetectionRollup.add_detections([detection])
+                    publish_on_commit([detection])
+            except IntegrityError:
+                if not event_id or not MaterialDetection.objects.filter(message_key=key).exists():
+                    recent_events.release(key)
+                    raise
+                # Stored before (by another process, or longer ago than this process remembers)
+                recent_events.mark_stored(key)
+                return self.duplicate_response(event_id)
+            except Exception:
+                recent_events.release(key)
+                raise
+            if event_id:
+                recent_events.mark_stored(key)
             
             return Response({
                 'message': 'Detection simulated successfully',
@@ -135,6 +223,14 @@ class SimulateDetectionView(APIView):
             }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def duplicate_response(self, event_id):
+        logger.info(f"🔁 Simulated detection {event_id} was already stored, ignoring the resend")
+        return Response({
+            'message': 'Duplicate detection ignored',
+            'event_id': event_id,
+            'points_awarded': False
+        }, status=status.HTTP_200_OK)
 
 
 class HealthCheckView(APIView):
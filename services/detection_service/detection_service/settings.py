@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartbin_common.metrics.MetricsMiddleware',  # Prometheus request/DB metrics (first, to time everything)
+    'smartbin_common.tracing.TracingMiddleware',  # Continues the caller's trace (traceparent header)
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -110,7 +112,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'detection.authentication.BinServiceJWTAuthentication',
+        'smartbin_common.gateway_authentication.GatewayIdentityAuthentication',  # Identity verified by the gateway
+        'detection.authentication.BinServiceJWTAuthentication',  # Direct calls
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -122,6 +125,13 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Shared secret for the gateway's signed X-Gateway-Identity header (empty disables it)
+GATEWAY_IDENTITY_SECRET = os.environ.get('GATEWAY_IDENTITY_SECRET', '')
+
+# Tracing: finished spans are appended as JSON lines here (empty disables the span log)
+TRACE_SPAN_LOG = os.environ.get('TRACE_SPAN_LOG', '')
+TRACE_SERVICE_NAME = 'detection_service'  # 'service' of every span this service writes
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -131,6 +141,44 @@ MQTT_BROKER = os.environ.get('MQTT_BROKER', 'localhost')
 MQTT_PORT = int(os.environ.get('MQTT_PORT', 1883))
 MQTT_KEEPALIVE = 60
 
+# Detection consumers: every consumer process joins the same shared subscription
+# ($share/<group>/bin/+/detected), so the broker spreads detections across them
+MQTT_DETECTION_TOPIC = 'bin/+/detected'
+MQTT_SHARED_GROUP = os.environ.get('MQTT_SHARED_GROUP', 'detection')  # Empty subscribes every consumer to every message
+MQTT_CLIENT_ID_PREFIX = os.environ.get('MQTT_CLIENT_ID_PREFIX', 'detection_service')  # Client id is <prefix>-<hostname>-<consumer index>
+MQTT_CONSUMERS = int(os.environ.get('MQTT_CONSUMERS', 1))  # Consumer processes started by mqtt/supervisor.py
+# Stored detections are published here after commit for the gateway's live SSE stream
+MQTT_STREAM_TOPIC = 'bin/{bin_id}/stored'
+# At-least-once delivery: messages are acknowledged only after their detection is committed
+MQTT_QOS = int(os.environ.get('MQTT_QOS', 1))
+MQTT_PERSISTENT_SESSION = os.environ.get('MQTT_PERSISTENT_SESSION', 'True') == 'True'  # clean_session=False, the broker keeps unacknowledged messages
+MQTT_MAX_DELIVERY_ATTEMPTS = int(os.environ.get('MQTT_MAX_DELIVERY_ATTEMPTS', 5))  # Attempts at storing a message before it is acknowledged and given up
+MQTT_RETRY_DELAY = float(os.environ.get('MQTT_RETRY_DELAY', 10))  # Seconds before a failed store is tried again
+# Resent detections (same event_id) are dropped using the last keys seen by each process,
+# the unique MaterialDetection.message_key catches the rest
+DETECTION_DEDUP_CACHE_SIZE = int(os.environ.get('DETECTION_DEDUP_CACHE_SIZE', 100000))
+
+# Detection consumer worker pool (messages of one bin always go to the same worker, in order)
+MQTT_WORKERS = int(os.environ.get('MQTT_WORKERS', 4))  # Threads storing detections and awarding points
+MQTT_QUEUE_SIZE = int(os.environ.get('MQTT_QUEUE_SIZE', 1000))  # Messages buffered per worker
+MQTT_QUEUE_FULL_POLICY = os.environ.get('MQTT_QUEUE_FULL_POLICY', 'block')  # 'block' (broker holds messages) or 'drop'
+MQTT_QUEUE_BLOCK_TIMEOUT = float(os.environ.get('MQTT_QUEUE_BLOCK_TIMEOUT', 5))  # Seconds to wait for room before dropping (keep well under MQTT_KEEPALIVE)
+# Micro-batching: each worker inserts up to MQTT_BATCH_SIZE detections at once (1 = one message at a time)
+MQTT_BATCH_SIZE = int(os.environ.get('MQTT_BATCH_SIZE', 1))
+MQTT_BATCH_WINDOW_MS = int(os.environ.get('MQTT_BATCH_WINDOW_MS', 50))  # Max wait after the first message for the batch to fill
+# Daily stats are counted in memory by the consumer and added to DetectionStats with F() updates
+DETECTION_STATS_FLUSH_INTERVAL = float(os.environ.get('DETECTION_STATS_FLUSH_INTERVAL', 5))  # Seconds between flushes
+
+# Outbox relay (delivers points and bin capacity updates for deposits, python manage.py outbox_relay)
+OUTBOX_RELAY_WORKERS = int(os.environ.get('OUTBOX_RELAY_WORKERS', 8))  # Concurrent deliveries
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))  # Entries claimed per poll
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1))  # Seconds between polls when idle
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 60))  # Claimed entries are retried by any relay after this
+OUTBOX_DELIVERY_TIMEOUT = float(os.environ.get('OUTBOX_DELIVERY_TIMEOUT', 10))  # Seconds per HTTP call
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 10))  # Then the entry becomes a dead letter
+OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE', 2))  # Seconds before the first retry, doubled each attempt
+OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX', 600))  # Longest wait between attempts
+
 # Auth Service URL (for adding points)
 AUTH_SERVICE_URL = os.environ.get('AUTH_SERVICE_URL', 'http://localhost:8001')
 
@@ -3,8 +3,10 @@ URL configuration for detection_service project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from smartbin_common.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/detections/', include('detection.urls')),
 ]
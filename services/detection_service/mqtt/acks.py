@@ -0,0 +1,60 @@
+"""
+In-order acknowledgements for the detection MQTT consumer
+Workers finish messages in any order, but MQTT 3.1.1 (4.6) expects a client to send
+PUBACKs in the order it received the PUBLISH packets. Settled messages wait here until
+every message received before them is settled too, then they are acknowledged together.
+A message waiting for a retry therefore holds back the acknowledgements after it
+(the broker's in-flight window, max_inflight_messages, bounds how many).
+"""
+import threading
+from collections import OrderedDict
+
+
+class OrderedAcks:
+    """Acknowledges settled messages in the order they were received"""
+
+    def __init__(self, client):
+        self.client = client
+        self._pending = OrderedDict()  # id(msg) -> [msg, settled]
+        self._stale = set()  # ids of messages received before the last reset
+        self._lock = threading.Lock()
+
+    def received(self, msg):
+        """Track a message as it arrives (on paho's network thread, so in receive order)"""
+        with self._lock:
+            self._pending[id(msg)] = [msg, False]
+
+    def settle(self, msg):
+        """Mark a message as done and send every PUBACK that is no longer held back"""
+        with self._lock:
+            entry = self._pending.get(id(msg))
+            if entry is None:
+                if id(msg) in self._stale:
+                    # Its packet id belongs to a previous connection, the broker redelivers it
+                    self._stale.discard(id(msg))
+                    return
+                ready = [msg]  # Not tracked (handled outside _on_message), nothing to wait for
+            else:
+                entry[1] = True
+                ready = []
+                while self._pending:
+                    head, settled = next(iter(self._pending.values()))
+                    if not settled:
+                        break
+                    self._pending.popitem(last=False)
+                    ready.append(head)
+            # Still under the lock, so concurrent settles can't reorder the PUBACKs
+            for ready_msg in ready:
+                self.client.ack(ready_msg.mid, ready_msg.qos)
+
+    def reset(self):
+        """
+        Forget the messages of a lost connection (call on connect): their packet ids
+        mean nothing on the new one, and the broker resends whatever was not acknowledged
+        """
+        with self._lock:
+            self._stale.update(self._pending)
+            self._pending.clear()
+
+    def __len__(self):
+        return len(self._pending)
@@ -4,9 +4,13 @@ Subscribes to bin detection events from Node-RED
 """
 
 import paho.mqtt.client as mqtt
-import json
+import hashlib
 import logging
 import os
+import signal
+import socket
+import threading
+import time
 import django
 
 # Setup Django
@@ -14,51 +18,271 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'detection_service.settings')
 django.setup()
 
 from django.conf import settings
-from detection.models import MaterialDetection
-from datetime import date
+from django.db import IntegrityError, transaction
+from detection.dedup import RecentKeys, PENDING, STORED, event_key
+from detection.models import DeadLetterMessage, DetectionRollup, MaterialDetection, OutboxEntry
+from smartbin_common.mqtt_codec import base_topic, compact_topic, decode
+from detection.metrics import MQTT_MESSAGES_RECEIVED, MQTT_MESSAGE_SECONDS, MQTT_CONNECTION_EVENTS, MQTT_BATCH_SIZE
+from detection.stats_buffer import StatsBuffer
+from detection.stream import publish_on_commit
+from smartbin_common.tracing import start_span, current_traceparent
+from mqtt.acks import OrderedAcks
+from mqtt.worker_pool import WorkerPool
+from collections import OrderedDict, namedtuple
 
 logger = logging.getLogger(__name__)
 
+# Failed messages whose delivery attempts are counted (oldest forgotten first)
+MAX_TRACKED_FAILURES = 10000
+# Seconds before a message the worker queues had no room for is offered again
+REQUEUE_DELAY = 1
+# Longer event ids are ignored (the message is keyed by its content instead)
+MAX_EVENT_ID_LENGTH = 64
+
+# A received message with its decoded payload and dedup key, as queued for the workers
+Delivery = namedtuple('Delivery', ['msg', 'payload', 'key'])
+
+
+def get_client_id():
+    """
+    Client id for this consumer, unique per process: the broker disconnects a client
+    when another one connects with the same id. The supervisor numbers its consumers
+    (MQTT_CONSUMER_INDEX) so a restarted consumer gets its predecessor's id back.
+    """
+    instance = os.environ.get('MQTT_CONSUMER_INDEX') or str(os.getpid())
+    return f"{settings.MQTT_CLIENT_ID_PREFIX}-{socket.gethostname()}-{instance}"
+
+
+def get_subscriptions():
+    """
+    Detection topics (JSON and compact v2), as shared subscriptions unless
+    MQTT_SHARED_GROUP is empty
+    """
+    topics = [settings.MQTT_DETECTION_TOPIC, compact_topic(settings.MQTT_DETECTION_TOPIC)]
+    if settings.MQTT_SHARED_GROUP:
+        return [f"$share/{settings.MQTT_SHARED_GROUP}/{topic}" for topic in topics]
+    return topics
+
+
+def decode_payload(msg):
+    """Detection payload of a message (JSON or compact) as a dict, or None if it is malformed"""
+    try:
+        payload = decode(msg.payload)
+    except ValueError as e:
+        logger.error(f"❌ Invalid payload in MQTT message on {msg.topic}: {e}")
+        return None
+    if not isinstance(payload, dict):
+        logger.error(f"❌ MQTT message on {msg.topic} is not a JSON object")
+        return None
+    return payload
+
+
+def get_message_key(msg, payload):
+    """
+    Key that identifies a detection across resends: the payload's event_id scoped to
+    its bin (see event_key), or for publishers that don't send one, a hash of the topic
+    and payload bytes (which only matches exact redeliveries)
+    """
+    event_id = payload.get('event_id')
+    if isinstance(event_id, str) and 0 < len(event_id) <= MAX_EVENT_ID_LENGTH:
+        return event_key(payload.get('bin_id'), event_id)
+    return hashlib.sha256(msg.topic.encode('utf-8') + b'\n' + msg.payload).hexdigest()
+
 
 class DetectionMQTTClient:
     """MQTT client for subscribing to detection events"""
     
     def __init__(self):
-        self.client = mqtt.Client(client_id="detection_service_subscriber")
+        self.client_id = get_client_id()
+        self.subscriptions = get_subscriptions()
+        # QoS 1 on a persistent session: the broker keeps every message until we acknowledge it,
+        # which only happens once its detection is committed (see _settle). paho's loop thread
+        # reconnects on its own, and the session brings back whatever was not acknowledged.
+        self.client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=self.client_id,
+            clean_session=not settings.MQTT_PERSISTENT_SESSION,
+            manual_ack=True
+        )
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.acks = OrderedAcks(self.client)
         self.broker = settings.MQTT_BROKER
         self.port = settings.MQTT_PORT
         self.connected = False
+        batching = settings.MQTT_BATCH_SIZE > 1
+        self.workers = WorkerPool(
+            self._handle_batch if batching else self._handle_message,
+            workers=settings.MQTT_WORKERS,
+            queue_size=settings.MQTT_QUEUE_SIZE,
+            full_policy=settings.MQTT_QUEUE_FULL_POLICY,
+            block_timeout=settings.MQTT_QUEUE_BLOCK_TIMEOUT,
+            batch_size=settings.MQTT_BATCH_SIZE,
+            batch_window=settings.MQTT_BATCH_WINDOW_MS / 1000
+        )
+        self.stats = StatsBuffer(interval=settings.DETECTION_STATS_FLUSH_INTERVAL)
+        self._failures = OrderedDict()  # message key -> failed attempts
+        self._failures_lock = threading.Lock()
+        self._retries = []  # (due, delivery), resubmitted to the workers by run_forever
+        self._retries_lock = threading.Lock()
+        self.recent = RecentKeys(size=settings.DETECTION_DEDUP_CACHE_SIZE)
+        # Resends received while their key is pending, acknowledged once the first copy is settled
+        self._resends = {}  # message key -> [msg, ...]
+        self._resends_lock = threading.Lock()
         
         # Set up callbacks
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
     
-    def _on_connect(self, client, userdata, flags, rc):
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
         """Callback when connected to MQTT broker"""
-        if rc == 0:
+        if not reason_code.is_failure:
             self.connected = True
-            logger.info(f"✅ Connected to MQTT broker at {self.broker}:{self.port}")
+            MQTT_CONNECTION_EVENTS.labels('connected').inc()
+            logger.info(f"✅ Connected to MQTT broker at {self.broker}:{self.port} as {self.client_id}")
+            # Packet ids of the previous connection can't be acknowledged on this one
+            self.acks.reset()
+            if flags.session_present:
+                logger.info("📬 Resumed persistent session, unacknowledged messages will be redelivered")
             
             # Subscribe to all bin detection topics
-            self.client.subscribe("bin/+/detected")
-            logger.info("📡 Subscribed to: bin/+/detected")
+            self.client.subscribe([(topic, settings.MQTT_QOS) for topic in self.subscriptions])
+            logger.info(f"📡 Subscribed to: {', '.join(self.subscriptions)} (QoS {settings.MQTT_QOS})")
         else:
             self.connected = False
-            logger.error(f"❌ Failed to connect to MQTT broker. Return code: {rc}")
+            MQTT_CONNECTION_EVENTS.labels('connect_failed').inc()
+            logger.error(f"❌ Failed to connect to MQTT broker. Reason: {reason_code}")
     
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
         """Callback when disconnected from MQTT broker"""
         self.connected = False
-        if rc != 0:
-            logger.warning(f"⚠️  Unexpected disconnection from MQTT broker. Return code: {rc}")
+        MQTT_CONNECTION_EVENTS.labels('disconnected').inc()
+        if reason_code.is_failure:
+            logger.warning(f"⚠️  Unexpected disconnection from MQTT broker. Reason: {reason_code}")
             logger.info("🔄 Attempting to reconnect...")
     
     def _on_message(self, client, userdata, msg):
         """
         Callback when message is received
+        Runs on paho's network thread, so it only decodes the message, drops resent
+        events and queues the rest for a worker. The topic (bin/<bin_id>/detected, without
+        the compact /v2 suffix) is the shard key, keeping each bin's messages in order.
+        """
+        self.acks.received(msg)
+        payload = decode_payload(msg)
+        if payload is None:
+            MQTT_MESSAGES_RECEIVED.labels('invalid').inc()
+            self.acks.settle(msg)
+            return
+        
+        key = get_message_key(msg, payload)
+        with self._resends_lock:
+            state = self.recent.claim(key)
+            if state == PENDING:
+                self._resends.setdefault(key, []).append(msg)
+        if state == STORED:
+            logger.info(f"🔁 Detection {key} on {msg.topic} was already stored, dropping the resend")
+            MQTT_MESSAGES_RECEIVED.labels('duplicate').inc()
+            self.acks.settle(msg)
+            return
+        if state == PENDING:
+            # The first copy carries the outcome (it is retried here if its store fails), so
+            # this one is only acknowledged once that outcome is final (see _settle)
+            logger.info(f"🔁 Detection {key} on {msg.topic} is already being stored, dropping the resend")
+            MQTT_MESSAGES_RECEIVED.labels('duplicate').inc()
+            return
+        
+        delivery = Delivery(msg, payload, key)
+        if not self.workers.submit(base_topic(msg.topic), delivery):
+            # Still unacknowledged and pending: offer it to the workers again shortly
+            MQTT_MESSAGES_RECEIVED.labels('dropped').inc()
+            self._retry_later(delivery, REQUEUE_DELAY)
+    
+    def _handle_message(self, delivery):
+        """Process one queued message on a worker thread (records consumer metrics)"""
+        started = time.perf_counter()
+        result = self._process_message(delivery)
+        self._settle(delivery, result)
+        MQTT_MESSAGES_RECEIVED.labels(result).inc()
+        MQTT_MESSAGE_SECONDS.labels(result).observe(time.perf_counter() - started)
+    
+    def _settle(self, delivery, result):
+        """
+        Acknowledge a message once its outcome is final: committed ('processed'), stored
+        by an earlier delivery ('duplicate') or unusable ('invalid'), along with the resends
+        that arrived while it was pending. A failed store stays
+        unacknowledged and pending, and is retried after MQTT_RETRY_DELAY seconds, up to
+        MQTT_MAX_DELIVERY_ATTEMPTS attempts in all; then it is written to DeadLetterMessage
+        before being acknowledged (or retried again if that write fails too). If the consumer
+        stops meanwhile, the persistent session delivers it again.
+        """
+        msg, key = delivery.msg, delivery.key
+        if result == 'error':
+            with self._failures_lock:
+                attempts = self._failures.pop(key, 0) + 1
+                if attempts < settings.MQTT_MAX_DELIVERY_ATTEMPTS:
+                    self._failures[key] = attempts
+                    while len(self._failures) > MAX_TRACKED_FAILURES:
+                        self._failures.popitem(last=False)
+            if attempts < settings.MQTT_MAX_DELIVERY_ATTEMPTS:
+                self._retry_later(delivery, settings.MQTT_RETRY_DELAY)
+                return
+            if not self._dead_letter(delivery, attempts):
+                # Not parked anywhere yet: keep it unacknowledged, the next failure tries again
+                with self._failures_lock:
+                    self._failures[key] = attempts - 1
+                self._retry_later(delivery, settings.MQTT_RETRY_DELAY)
+                return
+        
+        with self._resends_lock:
+            if result in ('processed', 'duplicate'):
+                self.recent.mark_stored(key)
+            else:
+                self.recent.release(key)
+            resends = self._resends.pop(key, [])
+        self.acks.settle(msg)
+        for resend in resends:
+            self.acks.settle(resend)
+    
+    def _dead_letter(self, delivery, attempts):
+        """Park a message that keeps failing in DeadLetterMessage; returns False if that failed too"""
+        msg = delivery.msg
+        try:
+            DeadLetterMessage.objects.create(
+                message_key=delivery.key,
+                topic=msg.topic,
+                payload=bytes(msg.payload),
+                attempts=attempts
+            )
+        except Exception as e:
+            logger.error(f"❌ Could not dead-letter message {delivery.key} on {msg.topic}: {e}")
+            return False
+        logger.error(f"💀 Giving up on message {delivery.key} on {msg.topic} after {attempts} failed attempts, dead-lettered")
+        return True
+    
+    def _retry_later(self, delivery, delay):
+        """Hand a still pending message to the workers again after delay seconds (see run_forever)"""
+        with self._retries_lock:
+            self._retries.append((time.monotonic() + delay, delivery))
+    
+    def _submit_retries(self):
+        """Resubmit the retries that are due; the ones the queues have no room for wait again"""
+        now = time.monotonic()
+        with self._retries_lock:
+            due = [delivery for due_at, delivery in self._retries if due_at <= now]
+            self._retries = [item for item in self._retries if item[0] > now]
+        for delivery in due:
+            logger.info(f"🔁 Retrying message {delivery.key} on {delivery.msg.topic}")
+            if not self.workers.submit(base_topic(delivery.msg.topic), delivery):
+                self._retry_later(delivery, REQUEUE_DELAY)
+    
+    def _process_message(self, delivery):
+        """
+        Store a detection message, award points and update stats
+        Returns 'processed', 'duplicate', 'invalid' or 'error'
         Expected message format:
         {
+            "event_id": "uuid",  (optional, the same for every resend of a detection)
             "bin_id": "uuid",
             "user_nfc_code": "SB-uuid",
             "material": "plastic",
@@ -66,110 +290,202 @@ class DetectionMQTTClient:
         }
         """
         try:
-            topic = msg.topic
-            payload_str = msg.payload.decode('utf-8')
-            logger.info(f"📩 RAW MQTT message received!")
-            logger.info(f"   Topic: {topic}")
-            logger.info(f"   Raw payload: {payload_str}")
-            
-            payload = json.loads(payload_str)
+            topic = delivery.msg.topic
+            payload = delivery.payload
             
             logger.info(f"📩 Received message on {topic}")
             logger.info(f"   Parsed payload: {payload}")
             
-            # Extract data - try both 'material' and 'material_type'
-            # Support both old 'user_qr_code' and new 'user_nfc_code' for backward compatibility
-            bin_id = payload.get('bin_id')
-            user_nfc_code = payload.get('user_nfc_code') or payload.get('user_qr_code')  # Backward compatibility
-            material = payload.get('material') or payload.get('material_type', 'other')
-            confidence = payload.get('confidence', 0.0)
-            
-            logger.info(f"   Extracted: bin_id={bin_id} (type: {type(bin_id)}), user_nfc_code={user_nfc_code}, material={material}, confidence={confidence}")
-            
-            # Validate data
-            if not bin_id or not user_nfc_code:
-                logger.error("❌ Missing required fields in MQTT message")
-                logger.error(f"   bin_id: {bin_id}, user_nfc_code: {user_nfc_code}")
-                return
+            # Continue the publisher's trace when the payload carries a traceparent, else start one here
+            with start_span(
+                'mqtt bin/+/detected',
+                traceparent=payload.get('traceparent'),
+                kind='consumer',
+                topic=topic
+            ) as span:
+                result = self._store_detection(payload, delivery.key)
+                span.set('result', result)
+                if result != 'processed':
+                    span.status = 'error'
+                return result
             
-            # Ensure bin_id is a string (UUID field expects string)
-            bin_id_str = str(bin_id).strip()
-            
-            # Validate UUID format
-            try:
-                import uuid
-                uuid.UUID(bin_id_str)  # This will raise ValueError if not a valid UUID
-            except (ValueError, AttributeError) as e:
-                logger.error(f"❌ Invalid bin_id format (must be UUID): {bin_id_str}")
-                logger.error(f"   Error: {e}")
-                return
-            
-            logger.info(f"   Creating detection with bin_id: {bin_id_str}")
-            
-            # Create detection record IMMEDIATELY
-            try:
-                detection = MaterialDetection.objects.create(
-                    bin_id=bin_id_str,
-                    user_nfc_code=user_nfc_code,
-                    material_type=material,
-                    confidence=confidence
-                )
-            except Exception as e:
-                logger.error(f"❌ Error creating detection record: {e}")
-                import traceback
-                traceback.print_exc()
-                return
-            
-            logger.info(f"✅ Detection saved IMMEDIATELY: {detection.id} for bin {bin_id}")
-            logger.info(f"   Material: {material}, Confidence: {confidence}")
-            logger.info(f"   Created at: {detection.created_at}")
-            
-            # Award points to user
-            logger.info(f"💰 Awarding points for {material}...")
-            success = detection.award_points()
-            
-            if success:
-                logger.info(f"✅ Points awarded successfully: {detection.points_awarded} points to {user_nfc_code}")
-            else:
-                logger.warning(f"⚠️ Failed to award points (detection still created: {detection.id})")
-            
-            # Update daily stats
-            self._update_stats(material, detection.points_awarded)
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Invalid JSON in MQTT message: {e}")
         except Exception as e:
             logger.error(f"❌ Error processing MQTT message: {e}")
             import traceback
             traceback.print_exc()
+            return 'error'
     
-    def _update_stats(self, material, points):
-        """Update daily detection statistics"""
+    def _parse_detection(self, payload):
+        """Validate a parsed detection payload; returns the detection fields, or None if invalid"""
+        # Extract data - try both 'material' and 'material_type'
+        # Support both old 'user_qr_code' and new 'user_nfc_code' for backward compatibility
+        bin_id = payload.get('bin_id')
+        user_nfc_code = payload.get('user_nfc_code') or payload.get('user_qr_code')  # Backward compatibility
+        material = payload.get('material') or payload.get('material_type', 'other')
+        confidence = payload.get('confidence', 0.0)
+        
+        logger.info(f"   Extracted: bin_id={bin_id} (type: {type(bin_id)}), user_nfc_code={user_nfc_code}, material={material}, confidence={confidence}")
+        
+        # Validate data
+        if not bin_id or not user_nfc_code:
+            logger.error("❌ Missing required fields in MQTT message")
+            logger.error(f"   bin_id: {bin_id}, user_nfc_code: {user_nfc_code}")
+            return None
+        
+        # Ensure bin_id is a string (UUID field expects string)
+        bin_id_str = str(bin_id).strip()
+        
+        # Validate UUID format
         try:
-            from detection.models import DetectionStats
-            today = date.today()
-            
-            stats, created = DetectionStats.objects.get_or_create(date=today)
-            
-            stats.total_detections += 1
-            stats.total_points_awarded += points
-            
-            # Update material-specific count
-            material_count_field = f"{material}_count"
-            if hasattr(stats, material_count_field):
-                current_count = getattr(stats, material_count_field)
-                setattr(stats, material_count_field, current_count + 1)
-            
-            stats.save()
-            logger.info(f"📊 Stats updated for {today}")
+            import uuid
+            uuid.UUID(bin_id_str)  # This will raise ValueError if not a valid UUID
+        except (ValueError, AttributeError) as e:
+            logger.error(f"❌ Invalid bin_id format (must be UUID): {bin_id_str}")
+            logger.error(f"   Error: {e}")
+            return None
+        
+        return {
+            'bin_id': bin_id_str,
+            'user_nfc_code': user_nfc_code,
+            'material_type': material,
+            'confidence': confidence,
+        }
+    
+    def _store_detection(self, payload, message_key=None):
+        """Validate a parsed detection payload, store it, award points and update stats"""
+        fields = self._parse_detection(payload)
+        if fields is None:
+            return 'invalid'
+        material = fields['material_type']
+        
+        logger.info(f"   Creating detection with bin_id: {fields['bin_id']}")
         
+        # Create detection record IMMEDIATELY, with its points and bin update queued in the outbox
+        try:
+            with start_span('detection insert', bin_id=fields['bin_id'], material=material):
+                with transaction.atomic():
+                    detection = MaterialDetection.objects.create(message_key=message_key, **fields)
+                    detection.award_points()
+                    DetectionRollup.add_detections([detection])
+                    publish_on_commit([detection])
+        except IntegrityError as e:
+            if message_key and MaterialDetection.objects.filter(message_key=message_key).exists():
+                logger.info(f"🔁 Message {message_key} was already stored (redelivery), skipping")
+                return 'duplicate'
+            logger.error(f"❌ Error creating detection record: {e}")
+            return 'error'
         except Exception as e:
-            logger.error(f"❌ Error updating stats: {e}")
+            logger.error(f"❌ Error creating detection record: {e}")
+            import traceback
+            traceback.print_exc()
+            return 'error'
+        
+        logger.info(f"✅ Detection saved IMMEDIATELY: {detection.id} for bin {fields['bin_id']}")
+        logger.info(f"   Material: {material}, Confidence: {fields['confidence']}")
+        logger.info(f"   Created at: {detection.created_at}")
+        logger.info(f"💰 Points for {fields['user_nfc_code']} queued for the outbox relay")
+        
+        # Count it in the daily stats (points are added when the relay delivers them)
+        self.stats.add_detections([detection])
+        return 'processed'
+    
+    def _handle_batch(self, deliveries):
+        """
+        Process a micro-batch of queued messages on a worker thread (MQTT_BATCH_SIZE > 1)
+        All new detections and their outbox entries are inserted with one bulk_create
+        each (in one transaction); events that were already stored are skipped.
+        """
+        started = time.perf_counter()
+        results = [None] * len(deliveries)
+        pending = []  # (index, detection, traceparent)
+        keys = set()
+        twins = set()  # indexes of resends queued in the same batch as their first copy
+        for index, delivery in enumerate(deliveries):
+            try:
+                fields = self._parse_detection(delivery.payload)
+            except AttributeError as e:
+                logger.error(f"❌ Invalid MQTT message on {delivery.msg.topic}: {e}")
+                fields = None
+            if fields is None:
+                results[index] = 'invalid'
+            elif delivery.key in keys:
+                twins.add(index)  # Resent while the first copy was still queued
+            else:
+                keys.add(delivery.key)
+                pending.append((
+                    index,
+                    MaterialDetection(message_key=delivery.key, **fields),
+                    delivery.payload.get('traceparent')
+                ))
+        
+        MQTT_BATCH_SIZE.observe(len(deliveries))
+        detections = []
+        if pending:
+            try:
+                with start_span('detection batch insert', size=len(pending)):
+                    stored = set(
+                        MaterialDetection.objects.filter(message_key__in=keys).values_list('message_key', flat=True)
+                    )
+                    for index, detection, _ in pending:
+                        if detection.message_key in stored:
+                            results[index] = 'duplicate'
+                    pending = [item for item in pending if results[item[0]] is None]
+                    detections = [detection for _, detection, _ in pending]
+                    # Messages without a trace of their own join the batch's trace
+                    batch_traceparent = current_traceparent()
+                    entries = [
+                        entry
+                        for _, detection, traceparent in pending
+                        for entry in detection.reward_entries(traceparent or batch_traceparent)
+                    ]
+                    with transaction.atomic():
+                        MaterialDetection.objects.bulk_create(detections)
+                        OutboxEntry.objects.bulk_create(entries)
+                        DetectionRollup.add_detections(detections)
+                        publish_on_commit(detections)
+            except IntegrityError:
+                # Another consumer stored one of them meanwhile: sort them out one by one
+                logger.warning(f"⚠️  Batch of {len(detections)} detections hit a stored message, inserting one by one")
+                detections = []
+                for index, _, _ in pending:
+                    results[index] = self._process_message(deliveries[index])
+            except Exception as e:
+                logger.error(f"❌ Error inserting {len(pending)} detections: {e}")
+                import traceback
+                traceback.print_exc()
+                detections = []
+                for index, _, _ in pending:
+                    results[index] = 'error'
+            else:
+                if detections:
+                    logger.info(f"✅ Saved {len(detections)} detections in one batch, points queued for the outbox relay")
+                for index, _, _ in pending:
+                    results[index] = 'processed'
+        
+        if detections:
+            self.stats.add_detections(detections)
+        
+        # Twins are settled by their first copy, like a resend that arrives while it is pending
+        with self._resends_lock:
+            for index in twins:
+                self._resends.setdefault(deliveries[index].key, []).append(deliveries[index].msg)
+        
+        # Acknowledge after the commit; per-message metrics, each message is charged the batch's time
+        duration = time.perf_counter() - started
+        for index, (delivery, result) in enumerate(zip(deliveries, results)):
+            if index in twins:
+                result = 'duplicate'
+            else:
+                self._settle(delivery, result)
+            MQTT_MESSAGES_RECEIVED.labels(result).inc()
+            MQTT_MESSAGE_SECONDS.labels(result).observe(duration)
     
     def connect(self):
         """Connect to MQTT broker"""
         try:
             if not self.connected:
+                self.workers.start()
+                self.stats.start()
                 self.client.connect(self.broker, self.port, keepalive=settings.MQTT_KEEPALIVE)
                 self.client.loop_start()
                 logger.info("🚀 MQTT client started")
@@ -187,6 +503,10 @@ class DetectionMQTTClient:
             if self.connected:
                 self.client.disconnect()
             self.connected = False
+            # No new messages arrive now, finish the ones already queued
+            self.workers.stop()
+            # Then write the stats they counted
+            self.stats.stop()
             logger.info("🛑 MQTT client stopped")
         except Exception as e:
             logger.error(f"Error disconnecting: {e}")
@@ -194,6 +514,10 @@ class DetectionMQTTClient:
     def run_forever(self):
         """Keep the MQTT client running"""
         try:
+            # Workers first, so nothing is delivered before they can take it
+            self.workers.start()
+            self.stats.start()
+            
             # Connect first
             if not self.connected:
                 self.client.connect(self.broker, self.port, keepalive=settings.MQTT_KEEPALIVE)
@@ -202,18 +526,10 @@ class DetectionMQTTClient:
             self.client.loop_start()
             logger.info("🚀 MQTT client loop started")
             
-            # Keep running - loop_start() runs in background thread
-            import time
+            # Keep running - loop_start() runs in background thread and reconnects by itself
             while True:
                 time.sleep(1)
-                # Check connection status periodically
-                if not self.connected:
-                    logger.warning("⚠️  MQTT client disconnected, attempting reconnect...")
-                    try:
-                        self.client.reconnect()
-                    except Exception as e:
-                        logger.error(f"Reconnect error: {e}")
-                        time.sleep(5)  # Wait before retry
+                self._submit_retries()
         except KeyboardInterrupt:
             logger.info("⏹️  Stopping MQTT client...")
             self.disconnect()
@@ -224,6 +540,10 @@ class DetectionMQTTClient:
             self.disconnect()
 
 
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
 if __name__ == "__main__":
     # Configure logging
     logging.basicConfig(
@@ -231,6 +551,9 @@ if __name__ == "__main__":
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
+    # docker stop sends SIGTERM: shut down like Ctrl+C so queued work and stats are flushed
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    
     # Start MQTT client
     mqtt_client = DetectionMQTTClient()
     mqtt_client.run_forever()
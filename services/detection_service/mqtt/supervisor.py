@@ -0,0 +1,134 @@
+"""
+Supervisor for the detection MQTT consumers
+Runs MQTT_CONSUMERS (or --consumers) processes of mqtt/mqtt_client.py. They share one
+subscription, so the broker spreads detections across them. A consumer that exits is
+restarted with the same index (and so the same client id), waiting longer after each
+quick crash, and its live gauges are dropped from PROMETHEUS_MULTIPROC_DIR.
+SIGTERM/SIGINT stop every consumer gracefully, so they flush their work and stats
+before the supervisor exits.
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import django
+from prometheus_client import multiprocess
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'detection_service.settings')
+django.setup()
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mqtt_client.py')
+# A consumer that ran at least this long before exiting is restarted right away
+STABLE_SECONDS = 60
+MAX_RESTART_DELAY = 30
+
+
+def mark_dead(process):
+    """Drop an exited consumer's live gauges from the shared metrics directory"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(process.pid)
+
+
+class Consumer:
+    """One supervised consumer process"""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.started_at = None
+        self.restart_delay = 0
+        self.restart_at = 0
+
+    def start(self):
+        env = dict(os.environ, MQTT_CONSUMER_INDEX=str(self.index))
+        self.process = subprocess.Popen([sys.executable, CONSUMER_SCRIPT], env=env)
+        self.started_at = time.monotonic()
+        logger.info(f"🚀 Started detection consumer {self.index} (pid {self.process.pid})")
+
+
+class ConsumerSupervisor:
+    """Keeps a fixed number of consumer processes running"""
+
+    def __init__(self, consumers):
+        self.consumers = [Consumer(index) for index in range(max(1, consumers))]
+        self._stop = threading.Event()
+
+    def run(self):
+        for consumer in self.consumers:
+            consumer.start()
+        logger.info(f"👷 Supervising {len(self.consumers)} detection consumers")
+
+        while not self._stop.wait(1):
+            for consumer in self.consumers:
+                self._check(consumer)
+        self._shutdown()
+
+    def _check(self, consumer):
+        """Restart a consumer that exited, backing off while it keeps crashing"""
+        if consumer.process is None:
+            if time.monotonic() >= consumer.restart_at:
+                consumer.start()
+            return
+        returncode = consumer.process.poll()
+        if returncode is None:
+            return
+
+        uptime = time.monotonic() - consumer.started_at
+        if uptime >= STABLE_SECONDS:
+            consumer.restart_delay = 0
+        else:
+            consumer.restart_delay = min(MAX_RESTART_DELAY, max(1, consumer.restart_delay * 2))
+        logger.warning(
+            f"⚠️  Detection consumer {consumer.index} exited with code {returncode} after {uptime:.0f}s, "
+            f"restarting in {consumer.restart_delay}s"
+        )
+        mark_dead(consumer.process)
+        consumer.process = None
+        consumer.restart_at = time.monotonic() + consumer.restart_delay
+
+    def _shutdown(self, timeout=30):
+        """SIGTERM every consumer, then kill the ones still running after timeout"""
+        running = [consumer.process for consumer in self.consumers if consumer.process is not None]
+        for process in running:
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            try:
+                process.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"⚠️  Detection consumer pid {process.pid} still running after {timeout}s, killing it")
+                process.kill()
+                process.wait()
+            mark_dead(process)
+        logger.info("🛑 Detection consumers stopped")
+
+    def stop(self, signum=None, frame=None):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description='Run several detection MQTT consumers')
+    parser.add_argument('--consumers', type=int, default=settings.MQTT_CONSUMERS,
+                        help='Number of consumer processes (default: MQTT_CONSUMERS)')
+    args = parser.parse_args()
+
+    supervisor = ConsumerSupervisor(args.consumers)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    signal.signal(signal.SIGINT, supervisor.stop)
+    supervisor.run()
@@ -0,0 +1,144 @@
+"""
+Bounded worker pool for the detection MQTT consumer
+paho delivers every message on its single network thread. The consumer only hands
+messages to this pool, and worker threads do the database and HTTP work.
+Messages are sharded by key (the topic, so one bin always goes to the same worker)
+which keeps each bin's deposits in order while different bins run in parallel.
+
+Every worker has a bounded queue. When it is full, the pool either blocks the caller
+for up to MQTT_QUEUE_BLOCK_TIMEOUT seconds (the network thread stops reading, so
+messages back up at the broker instead of in memory) and drops if there's still no
+room, or drops right away (MQTT_QUEUE_FULL_POLICY = 'drop').
+
+With batch_size > 1 a worker collects up to batch_size queued items, waiting at most
+batch_window seconds after the first one, and passes them to the handler as one list.
+"""
+import logging
+import queue
+import threading
+import time
+import zlib
+from django.db import close_old_connections
+from detection.metrics import MQTT_QUEUE_DEPTH, MQTT_QUEUE_FULL, MQTT_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+FULL_POLICIES = ('block', 'drop')
+
+_STOP = object()
+
+
+class WorkerPool:
+    """Fixed set of worker threads, each draining its own bounded queue"""
+
+    def __init__(self, handler, workers=4, queue_size=1000, full_policy='block', block_timeout=5.0,
+                 batch_size=1, batch_window=0.05):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"MQTT_QUEUE_FULL_POLICY must be one of {FULL_POLICIES}, got {full_policy!r}")
+        self.handler = handler
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self.threads = []
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        if self.threads:
+            return
+        for index, work_queue in enumerate(self.queues):
+            thread = threading.Thread(
+                target=self._run,
+                args=(index, work_queue),
+                name=f"detection-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"👷 Started {len(self.threads)} detection workers ({self.queues[0].maxsize} messages queued each)")
+
+    def submit(self, key, item):
+        """
+        Queue an item on the worker that owns its key
+
+        Returns:
+            bool: True if queued, False if it was dropped because the queue stayed full
+        """
+        index = zlib.crc32(key.encode('utf-8')) % len(self.queues)
+        work_queue = self.queues[index]
+        entry = (time.perf_counter(), item)
+        depth = MQTT_QUEUE_DEPTH.labels(str(index))
+        depth.inc()  # Counted before the put so a fast worker never sees it go negative
+        try:
+            work_queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+
+        if self.full_policy == 'block':
+            MQTT_QUEUE_FULL.labels('blocked').inc()
+            try:
+                work_queue.put(entry, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                logger.error(f"❌ Detection worker {index} still full after {self.block_timeout}s, dropping message ({key})")
+        depth.dec()
+        MQTT_QUEUE_FULL.labels('dropped').inc()
+        return False
+
+    def _next_batch(self, work_queue):
+        """Wait for one entry, then take more until batch_size or the batch window is reached"""
+        entries = [work_queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(entries) < self.batch_size and entries[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entries.append(work_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return entries
+
+    def _run(self, index, work_queue):
+        depth = MQTT_QUEUE_DEPTH.labels(str(index))
+        while True:
+            entries = self._next_batch(work_queue)
+            stopping = entries[-1] is _STOP
+            if stopping:
+                entries.pop()
+
+            if entries:
+                now = time.perf_counter()
+                for queued_at, _ in entries:
+                    depth.dec()
+                    MQTT_QUEUE_WAIT_SECONDS.observe(now - queued_at)
+                items = [item for _, item in entries]
+                # Worker threads hold their own DB connections, recycle them like a request would
+                close_old_connections()
+                try:
+                    self.handler(items if self.batch_size > 1 else items[0])
+                except Exception as e:
+                    logger.error(f"❌ Unhandled error in detection worker {index}: {e}")
+                finally:
+                    close_old_connections()
+
+            if stopping:
+                break
+
+    def stop(self, timeout=30):
+        """Let the workers finish what is already queued, then stop them"""
+        for work_queue in self.queues:
+            work_queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        still_running = sum(1 for thread in self.threads if thread.is_alive())
+        if still_running:
+            logger.warning(f"⚠️  {still_running} detection workers still busy after {timeout}s")
+        self.threads = []
+
+    def depth(self):
+        """Messages waiting in all queues"""
+        return sum(work_queue.qsize() for work_queue in self.queues)
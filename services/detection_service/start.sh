@@ -4,8 +4,18 @@ set -e
 echo "Running migrations..."
 python manage.py migrate --fake-initial || python manage.py migrate
 
-echo "Starting MQTT client in background..."
-PYTHONPATH=/app python mqtt/mqtt_client.py &
+# Django, the MQTT consumers and the outbox relay share metrics files so /metrics covers all processes
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
-echo "Starting Django server..."
-python manage.py runserver 0.0.0.0:8000
+echo "Starting outbox relay in background..."
+python manage.py outbox_relay &
+
+echo "Starting Django server in background..."
+python manage.py runserver 0.0.0.0:8000 &
+
+# exec: the supervisor replaces this shell, so the container's SIGTERM reaches it and
+# the consumers get to flush their work and stats before the container stops
+echo "Starting MQTT consumers..."
+export PYTHONPATH=/app
+exec python mqtt/supervisor.py
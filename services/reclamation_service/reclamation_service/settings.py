@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartbin_common.metrics.MetricsMiddleware',  # Prometheus request/DB metrics (first, to time everything)
+    'smartbin_common.tracing.TracingMiddleware',  # Continues the caller's trace (traceparent header)
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -110,7 +112,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'reclamations.gateway_authentication.GatewayIdentityAuthentication',  # Identity verified by the gateway
+        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Direct calls
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -122,6 +125,13 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Shared secret for the gateway's signed X-Gateway-Identity header (empty disables it)
+GATEWAY_IDENTITY_SECRET = os.environ.get('GATEWAY_IDENTITY_SECRET', '')
+
+# Tracing: finished spans are appended as JSON lines here (empty disables the span log)
+TRACE_SPAN_LOG = os.environ.get('TRACE_SPAN_LOG', '')
+TRACE_SERVICE_NAME = 'reclamation_service'  # 'service' of every span this service writes
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -0,0 +1,20 @@
+"""
+Gateway identity authentication for reclamation service
+The shared GatewayIdentityAuthentication, where only admins count as staff
+"""
+from smartbin_common.gateway_authentication import (
+    GatewayIdentityAuthentication as BaseGatewayIdentityAuthentication,
+    GatewayUser as BaseGatewayUser,
+)
+
+
+class GatewayUser(BaseGatewayUser):
+    """Minimal user built from gateway identity claims (reclamation service only needs the user id)"""
+
+    def __init__(self, claims):
+        super().__init__(claims)
+        self.is_staff = bool(claims.get('adm'))
+
+
+class GatewayIdentityAuthentication(BaseGatewayIdentityAuthentication):
+    user_class = GatewayUser
@@ -0,0 +1,9 @@
+"""
+Code shared by the SmartBin gateway and every service
+Installed into each image from the shared/ directory (pip install -e shared):
+    metrics                 Prometheus request/DB metrics middleware and /metrics view
+    tracing                 W3C traceparent propagation and the JSON-lines span log
+    gateway_authentication  DRF authentication trusting the gateway's signed identity
+    idempotency             Idempotency-Key decorator, record base model and purge command
+    mqtt_codec              Compact binary (v2) bin MQTT payloads, shared by publishers and consumers
+"""
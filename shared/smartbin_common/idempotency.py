@@ -0,0 +1,147 @@
+"""
+Idempotency-Key support for retried service-to-service calls
+The first response for a key is stored (a service's IdempotencyRecord) in the same
+transaction as the view's writes; a repeat of the key gets the stored response without
+running the view again. Records expire after IDEMPOTENCY_TTL_SECONDS and are purged by
+'python manage.py purge_idempotency_keys' (and, opportunistically, while serving).
+Each service defines its record model on IdempotencyRecordBase (its own table) and
+passes it to idempotent() and PurgeIdempotencyKeysCommand.
+"""
+import functools
+import hashlib
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 100
+
+
+class IdempotencyRecordBase(models.Model):
+    """
+    Stored response for a request sent with an Idempotency-Key header;
+    status_code is 0 while the first request is still running
+    Concrete models set db_table and a unique constraint on (scope, key).
+    """
+    scope = models.CharField(max_length=50, help_text="Endpoint the key applies to")
+    key = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 of the method, path, caller and body")
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        abstract = True
+    
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status_code})"
+
+
+def purge_expired(model, limit=None):
+    """Delete expired records of model (at most limit of them); returns the number deleted"""
+    expired = model.objects.filter(expires_at__lte=timezone.now())
+    if limit is not None:
+        expired = model.objects.filter(pk__in=list(expired.values_list('pk', flat=True)[:limit]))
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def request_fingerprint(request):
+    """
+    SHA-256 of what the key stands for: method, path, caller and body
+    A key reused for another endpoint or object (e.g. another bin), by another caller
+    or with another body is rejected instead of replaying someone else's response.
+    """
+    user = getattr(request, 'user', None)
+    principal = str(user.pk) if user is not None and user.is_authenticated else ''
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, principal):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response({
+            'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(record.response_body, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(scope, model):
+    """
+    Decorator for APIView handlers: requests with an Idempotency-Key header run at most
+    once per (scope, key), recorded in model; 5xx responses are not stored so they can be retried
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({
+                    'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            request_hash = request_fingerprint(request)
+            now = timezone.now()
+            record = model.objects.filter(scope=scope, key=key, expires_at__gt=now).first()
+            if record is not None:
+                return replay(record, request_hash)
+
+            try:
+                with transaction.atomic():
+                    model.objects.filter(scope=scope, key=key, expires_at__lte=now).delete()
+                    # Claim the key first: a concurrent request with the same key waits on this
+                    # row and then fails the insert instead of running the view a second time
+                    record = model.objects.create(
+                        scope=scope,
+                        key=key,
+                        request_hash=request_hash,
+                        status_code=0,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+                    )
+                    response = handler(view, request, *args, **kwargs)
+                    if response.status_code >= 500:
+                        # Nothing is kept (neither the key nor the view's writes), a retry runs again
+                        transaction.set_rollback(True)
+                        return response
+                    record.status_code = response.status_code
+                    record.response_body = response.data
+                    record.save(update_fields=['status_code', 'response_body'])
+            except IntegrityError:
+                record = model.objects.filter(scope=scope, key=key).first()
+                if record is None:
+                    raise
+                logger.info(f"🔁 Concurrent request for {scope} key {key}, replaying its response")
+                return replay(record, request_hash)
+
+            if random.random() < settings.IDEMPOTENCY_PURGE_PROBABILITY:
+                purge_expired(model, limit=1000)
+            return response
+        return wrapper
+    return decorator
+
+
+class PurgeIdempotencyKeysCommand(BaseCommand):
+    """Base for each service's purge_idempotency_keys command (set model)"""
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL_SECONDS'
+    model = None
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(self.model)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Deleted {deleted} expired idempotency record(s)\n'))
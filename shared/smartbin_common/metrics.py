@@ -0,0 +1,151 @@
+"""
+Prometheus metrics shared by the gateway and every service
+HTTP request count, in-flight requests and latency per route and status, and the
+database queries each request runs. Exposed at /metrics (metrics_view).
+Each service adds its own metrics (MQTT, outbox, upstream calls) in its app's metrics module.
+Set PROMETHEUS_MULTIPROC_DIR to aggregate metrics from several processes.
+"""
+import os
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total',
+    'HTTP requests handled',
+    ['method', 'route', 'status']
+)
+HTTP_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being handled',
+    multiprocess_mode='livesum'
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response (streamed responses: time to headers)',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request',
+    'Database queries run while handling one request',
+    ['route'],
+    buckets=QUERY_COUNT_BUCKETS
+)
+DB_QUERY_TIME = Histogram(
+    'db_query_seconds_per_request',
+    'Time spent in database queries while handling one request',
+    ['route'],
+    buckets=LATENCY_BUCKETS
+)
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook counting queries and their duration"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def get_route(request):
+    """URL pattern that handled the request (keeps label cardinality bounded)"""
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    Record request and database metrics for every request except /metrics itself (WSGI and ASGI)
+    Queries are only counted for sync requests: async views run theirs on other threads.
+    """
+    sync_capable = True
+    async_capable = True
+    count_queries = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _record(self, request, status, started, queries=None):
+        duration = time.perf_counter() - started
+        HTTP_IN_FLIGHT.dec()
+        route = get_route(request)
+        HTTP_REQUESTS.labels(request.method, route, status).inc()
+        HTTP_LATENCY.labels(request.method, route, status).observe(duration)
+        if queries is not None:
+            DB_QUERIES.labels(route).observe(queries.count)
+            DB_QUERY_TIME.labels(route).observe(queries.duration)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        queries = QueryCounter() if self.count_queries else None
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            if queries is not None:
+                with connection.execute_wrapper(queries):
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            self._record(request, status, started, queries)
+
+    async def __acall__(self, request):
+        if request.path == '/metrics':
+            return await self.get_response(request)
+
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            self._record(request, status, started)
+
+
+class HTTPMetricsMiddleware(MetricsMiddleware):
+    """MetricsMiddleware without the database metrics (the gateway has no database work)"""
+    count_queries = False
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,199 @@
+"""
+Compact binary codec for bin MQTT payloads
+Payloads are JSON by default. Publishers can opt into the compact format (version 2)
+per topic by publishing to the topic with a '/v2' suffix (bin/{id}/detected/v2,
+bin/{id}/open/v2, ...). The first byte tells the formats apart (JSON starts with '{'),
+so decode() accepts either on any topic and returns the same dict as the JSON payload
+(for the fields the compact format carries, see encode_detection / encode_command).
+
+Version 2 layout (big-endian):
+    header    version (B) = 2, kind (B): 1 = detection, 2 = command, flags (B)
+    detection event_id (16s, zeros if none), bin_id (16s), timestamp ms (Q),
+              material (B, index in MATERIALS), confidence (H, x 10000)
+    command   bin_id (16s), timestamp ms (Q), command (B, index in COMMANDS)
+    then      user_nfc_code if FLAG_USER: 16-byte UUID if FLAG_USER_UUID (an 'SB-<uuid>'
+              code), else length (B) + UTF-8; traceparent if FLAG_TRACE: trace_id (16s),
+              span_id (8s), trace flags (B)
+"""
+import json
+import struct
+import uuid
+from datetime import datetime, timezone
+
+VERSION_COMPACT = 2
+COMPACT_TOPIC_SUFFIX = '/v2'
+
+KIND_DETECTION = 1
+KIND_COMMAND = 2
+
+FLAG_USER = 0x01
+FLAG_USER_UUID = 0x02
+FLAG_TRACE = 0x04
+
+MATERIALS = ('plastic', 'paper', 'glass', 'metal', 'organic', 'other')
+COMMANDS = ('open', 'close')
+CONFIDENCE_SCALE = 10000
+
+HEADER = struct.Struct('>BBB')
+DETECTION = struct.Struct('>16s16sQBH')
+COMMAND = struct.Struct('>16sQB')
+TRACE = struct.Struct('>16s8sB')
+NO_EVENT_ID = bytes(16)
+
+
+def compact_topic(topic):
+    """Topic a compact payload is published on"""
+    return topic + COMPACT_TOPIC_SUFFIX
+
+
+def base_topic(topic):
+    """Topic without the compact suffix (the same bin/{id}/... for both formats)"""
+    return topic[:-len(COMPACT_TOPIC_SUFFIX)] if topic.endswith(COMPACT_TOPIC_SUFFIX) else topic
+
+
+def is_compact(data):
+    return bool(data) and data[0] == VERSION_COMPACT
+
+
+def _timestamp_ms(value):
+    """Milliseconds since the epoch for a Unix timestamp or an ISO 8601 string with an offset"""
+    if not value:
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        raise ValueError(f"timestamp {value!r} has no UTC offset")
+    return int(moment.timestamp() * 1000)
+
+
+def _iso_timestamp(milliseconds):
+    moment = datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _encode_tail(payload):
+    """Flags and trailing bytes for the optional user and traceparent fields"""
+    flags = 0
+    tail = b''
+    user = payload.get('user_nfc_code')
+    if user:
+        flags |= FLAG_USER
+        try:
+            if not user.startswith('SB-'):
+                raise ValueError
+            user_uuid = uuid.UUID(user[3:])
+            if f"SB-{user_uuid}" != user:
+                raise ValueError  # Only canonical codes round-trip through 16 bytes
+            flags |= FLAG_USER_UUID
+            tail += user_uuid.bytes
+        except ValueError:
+            encoded = user.encode('utf-8')
+            if len(encoded) > 255:
+                raise ValueError('user_nfc_code is longer than 255 bytes')
+            tail += bytes([len(encoded)]) + encoded
+    traceparent = payload.get('traceparent')
+    if traceparent:
+        _, trace_id, span_id, trace_flags = traceparent.split('-')
+        flags |= FLAG_TRACE
+        tail += TRACE.pack(bytes.fromhex(trace_id), bytes.fromhex(span_id), int(trace_flags, 16))
+    return flags, tail
+
+
+def _decode_tail(flags, data, offset, payload):
+    if flags & FLAG_USER:
+        if flags & FLAG_USER_UUID:
+            payload['user_nfc_code'] = f"SB-{uuid.UUID(bytes=data[offset:offset + 16])}"
+            offset += 16
+        else:
+            length = data[offset]
+            payload['user_nfc_code'] = data[offset + 1:offset + 1 + length].decode('utf-8')
+            offset += 1 + length
+    if flags & FLAG_TRACE:
+        trace_id, span_id, trace_flags = TRACE.unpack_from(data, offset)
+        payload['traceparent'] = f"00-{trace_id.hex()}-{span_id.hex()}-{trace_flags:02x}"
+        offset += TRACE.size
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} unexpected trailing bytes")
+    return payload
+
+
+def encode_detection(payload):
+    """
+    Compact bytes for a detection payload (the dict Node-RED publishes as JSON)
+    Only event_id, bin_id, timestamp, material (or material_type, decoded as material),
+    confidence (to 4 decimals), user_nfc_code and traceparent are carried; anything else,
+    such as Node-RED's points_expected and event fields, is dropped.
+
+    Raises:
+        ValueError: a field can't be represented: an event_id that isn't a UUID, a material
+                    outside MATERIALS, a confidence outside 0..1 or a timestamp without offset
+    """
+    material = payload.get('material') or payload.get('material_type') or 'other'
+    if material not in MATERIALS:
+        raise ValueError(f"material {material!r} is not one of {', '.join(MATERIALS)}")
+    confidence = float(payload.get('confidence', 0.0))
+    if not 0.0 <= confidence <= 1.0:
+        raise ValueError(f"confidence {confidence} is outside 0..1")
+    event_id = payload.get('event_id')
+    flags, tail = _encode_tail(payload)
+    return HEADER.pack(VERSION_COMPACT, KIND_DETECTION, flags) + DETECTION.pack(
+        uuid.UUID(event_id).bytes if event_id else NO_EVENT_ID,
+        uuid.UUID(str(payload['bin_id'])).bytes,
+        _timestamp_ms(payload.get('timestamp')),
+        MATERIALS.index(material),
+        round(confidence * CONFIDENCE_SCALE)
+    ) + tail
+
+
+def encode_command(payload):
+    """
+    Compact bytes for a bin command payload (see BinMQTTClient.publish_bin_command)
+    Carries bin_id, timestamp, command, user_nfc_code and traceparent; raises ValueError
+    for a command outside COMMANDS or a timestamp without offset
+    """
+    if payload['command'] not in COMMANDS:
+        raise ValueError(f"command {payload['command']!r} is not one of {', '.join(COMMANDS)}")
+    flags, tail = _encode_tail(payload)
+    return HEADER.pack(VERSION_COMPACT, KIND_COMMAND, flags) + COMMAND.pack(
+        uuid.UUID(str(payload['bin_id'])).bytes,
+        _timestamp_ms(payload.get('timestamp')),
+        COMMANDS.index(payload['command'])
+    ) + tail
+
+
+def decode(data):
+    """
+    Payload dict from either format
+
+    Raises:
+        ValueError: malformed JSON or compact payload
+    """
+    if not is_compact(data):
+        return json.loads(data.decode('utf-8'))
+    try:
+        _, kind, flags = HEADER.unpack_from(data)
+        if kind == KIND_DETECTION:
+            event_id, bin_id, timestamp, material, confidence = DETECTION.unpack_from(data, HEADER.size)
+            payload = {
+                'bin_id': str(uuid.UUID(bytes=bin_id)),
+                'material': MATERIALS[material],
+                'confidence': confidence / CONFIDENCE_SCALE,
+                'timestamp': _iso_timestamp(timestamp),
+            }
+            if event_id != NO_EVENT_ID:
+                payload['event_id'] = str(uuid.UUID(bytes=event_id))
+            offset = HEADER.size + DETECTION.size
+        elif kind == KIND_COMMAND:
+            bin_id, timestamp, command = COMMAND.unpack_from(data, HEADER.size)
+            payload = {
+                'bin_id': str(uuid.UUID(bytes=bin_id)),
+                'command': COMMANDS[command],
+                'timestamp': _iso_timestamp(timestamp),
+            }
+            offset = HEADER.size + COMMAND.size
+        else:
+            raise ValueError(f"Unknown compact payload kind {kind}")
+        return _decode_tail(flags, data, offset, payload)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed compact payload: {e}")
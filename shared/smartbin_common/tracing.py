@@ -0,0 +1,168 @@
+"""
+Request tracing shared by the gateway and every service
+Trace context travels in the W3C traceparent header on HTTP calls and in a
+"traceparent" field of MQTT payloads. TracingMiddleware starts a server span for every
+request (continuing the caller's trace when it sent one) and calls made while it is
+active become child spans. Finished spans are appended as JSON lines to the local span
+log (TRACE_SPAN_LOG), one record per span with its timing, tagged with TRACE_SERVICE_NAME.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_write_lock = threading.Lock()
+
+
+def parse_traceparent(value):
+    """(trace_id, parent span_id) from a traceparent value, or None if absent/invalid"""
+    match = TRACEPARENT_RE.match((value or '').strip().lower())
+    return match.groups() if match else None
+
+
+class Span:
+    """One timed operation; use as a context manager"""
+
+    def __init__(self, name, trace_id, parent_id=None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = 'ok'
+        self.started_at = None
+        self._started = None
+        self._token = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = 'error'
+            self.attributes.setdefault('error', repr(exc))
+        write_span(self, duration_ms)
+        return False
+
+
+def start_span(name, traceparent=None, **attributes):
+    """
+    Span that continues the current trace
+    Parent is the active span, else the given traceparent; without either a new trace starts here
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, **attributes)
+    parsed = parse_traceparent(traceparent)
+    if parsed:
+        return Span(name, parsed[0], parsed[1], **attributes)
+    return Span(name, secrets.token_hex(16), **attributes)
+
+
+def current_traceparent():
+    """traceparent of the active span (to put in outgoing requests and MQTT payloads)"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+def inject_headers(headers=None):
+    """Add the active trace context to outgoing HTTP headers"""
+    headers = dict(headers or {})
+    traceparent = current_traceparent()
+    if traceparent:
+        headers['traceparent'] = traceparent
+    return headers
+
+
+def write_span(span, duration_ms):
+    """Append a finished span to the local span log"""
+    path = settings.TRACE_SPAN_LOG
+    if not path:
+        return
+    record = {
+        'trace_id': span.trace_id,
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'service': settings.TRACE_SERVICE_NAME,
+        'pid': os.getpid(),
+        'name': span.name,
+        'start': round(span.started_at, 6),
+        'duration_ms': round(duration_ms, 3),
+        'status': span.status,
+        'attributes': span.attributes,
+    }
+    line = json.dumps(record, default=str) + '\n'
+    try:
+        with _write_lock:
+            with open(path, 'a', encoding='utf-8') as span_log:
+                span_log.write(line)
+    except OSError as e:
+        logger.warning(f"Could not write span log {path}: {e}")
+
+
+class TracingMiddleware:
+    """Server span for every request except /metrics, continuing the caller's trace (WSGI and ASGI)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        return start_span(
+            f"{request.method} {request.path}",
+            traceparent=request.headers.get('traceparent'),
+            kind='server'
+        )
+
+    def _finish(self, request, span, response):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            span.name = f"{request.method} {match.route}"
+        span.set('path', request.path)
+        span.set('status_code', response.status_code)
+        if response.status_code >= 500:
+            span.status = 'error'
+        response['X-Trace-Id'] = span.trace_id
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        with self._start(request) as span:
+            return self._finish(request, span, self.get_response(request))
+
+    async def __acall__(self, request):
+        if request.path == '/metrics':
+            return await self.get_response(request)
+
+        with self._start(request) as span:
+            return self._finish(request, span, await self.get_response(request))